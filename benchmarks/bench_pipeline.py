@@ -0,0 +1,182 @@
+"""Pipeline benchmark: per-stage latency, throughput and peak memory for single and batch runs.
+
+    python benchmarks/bench_pipeline.py [--articles 36] [--pages 1,5,20,60] [--workers 1,4]
+                                        [--latency 0] [--corpus DIR] [--record history.jsonl]
+
+A corpus (``corpus.py``) is generated and its site served by the local
+stand-in (``server.py``). The single run times each stage on its own over
+every article, with the HTTP and PDF caches off except for ``pdf_history_cached``:
+
+    scrape, pdf_history, pdf_history_cached, record, render, splice
+
+and repeats the stages under ``tracemalloc`` for their peak Python memory. The
+batch runs go through ``batch.run_batch`` with each ``--workers`` count and
+report wall time, articles per second and peak RSS. The result is printed as
+JSON; ``--record`` appends it to a JSONL file to track it over time.
+"""
+import argparse
+import io
+import json
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import corpus  # noqa: E402
+import server  # noqa: E402
+from xmlgen import batch, fetch, pdfcache, pipeline, record, scrape, template  # noqa: E402
+
+STAGES = ("scrape", "pdf_history", "pdf_history_cached", "record", "render", "splice")
+
+
+def summarize(durations, peak=None):
+    durations = sorted(durations)
+    total = sum(durations)
+    summary = {
+        "count": len(durations),
+        "total_s": round(total, 4),
+        "mean_ms": round(total / len(durations) * 1000, 3),
+        "p50_ms": round(statistics.median(durations) * 1000, 3),
+        "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 3),
+        "per_s": round(len(durations) / total, 1) if total else None,
+    }
+    if peak is not None:
+        summary["peak_kib"] = round(peak / 1024, 1)
+    return summary
+
+
+def run_stages(rows, template_path, cache_dir, trace):
+    """{stage: [seconds per article]} and {stage: peak traced bytes}; stages run one after another"""
+    times = {stage: [] for stage in STAGES}
+    peaks = {stage: 0 for stage in STAGES}
+
+    def timed(stage, func, *args):
+        if trace:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        result = func(*args)
+        times[stage].append(time.perf_counter() - start)
+        if trace:
+            peaks[stage] = max(peaks[stage], tracemalloc.get_traced_memory()[1] - before)
+        return result
+
+    fetch.configure(cache_dir=cache_dir, use_cache=False, memory_entries=0)
+    pdfcache.configure(cache_dir=cache_dir, enabled=False)
+    pages = [timed("scrape", scrape.scrape_article_page, row["article_url"]) for row in rows]
+    scans = [timed("pdf_history", pipeline.scan_pdf_history, row["pdf"])[1] for row in rows]
+
+    pdfcache.configure(enabled=True)
+    pdfcache.clear()
+    for row in rows:
+        pipeline.scan_pdf_history(row["pdf"])  # Warm the cache; only hits are timed
+    for row in rows:
+        timed("pdf_history_cached", pipeline.scan_pdf_history, row["pdf"])
+
+    records = []
+    for row, page, scan in zip(rows, pages, scans):
+        xml = Path(row["xml"]).read_bytes()
+        article_record = timed("record", record.extract_record, xml, row["article_url"], row["pdf_link"], None, page)
+        article_record.dates = (pipeline.parse_date(scan.received or row["received"]),
+                                pipeline.parse_date(scan.accepted or row["accepted"]))
+        records.append(article_record)
+    for article_record in records:
+        timed("render", record.render_article_xml, article_record)
+    for article_record in records:
+        front = record.render_front(article_record)
+        timed("splice", template.write_spliced, template_path, front, io.BytesIO())
+    return times, peaks, scans
+
+
+def check_history(scans, expected):
+    """Articles whose detected history layout or page differs from the line the corpus wrote first"""
+    wrong = []
+    for n, scan in enumerate(scans, start=1):
+        want = (expected[n]["layout"], expected[n]["page"])
+        got = (scan.pattern or "none", scan.page)
+        if got != want:
+            wrong.append({"article": n, "expected": list(want), "found": list(got)})
+    return wrong
+
+
+def run_batches(rows, template_path, cache_dir, out_root, workers_list, stand_in):
+    runs = []
+    for workers in workers_list:
+        requests_before, bytes_before = stand_in.stats["requests"], stand_in.stats["bytes_sent"]
+        start = time.perf_counter()
+        results = batch.run_batch(
+            rows, out_root / f"workers-{workers}", workers=workers, template_path=str(template_path),
+            fetch_options={"cache_dir": cache_dir, "use_cache": False},
+            pdf_cache_options={"cache_dir": cache_dir, "enabled": False},
+        )
+        wall = time.perf_counter() - start
+        runs.append({
+            "workers": workers,
+            "articles": len(results),
+            "failed": sum(1 for r in results if not r["ok"]),
+            "wall_s": round(wall, 3),
+            "per_s": round(len(results) / wall, 2),
+            "http_requests": stand_in.stats["requests"] - requests_before,
+            "http_bytes": stand_in.stats["bytes_sent"] - bytes_before,
+            # ru_maxrss is KiB on Linux and only ever grows, so this is the peak over all runs so far
+            "peak_worker_rss_mib": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        })
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=36)
+    parser.add_argument("--pages", default="1,5,20,60", help="Comma-separated PDF page counts to cycle through")
+    parser.add_argument("--workers", default="1,4", help="Comma-separated worker counts for the batch runs")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the stand-in server waits per response")
+    parser.add_argument("--template-kib", type=int, default=256)
+    parser.add_argument("--corpus", default=None, help="Directory for the generated corpus (default: a temporary one)")
+    parser.add_argument("--record", default=None, help="Append the result to this JSONL file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="xmlgen-bench-") as tmp:
+        tmp = Path(tmp)
+        corpus_dir = Path(args.corpus) if args.corpus else tmp / "corpus"
+        (corpus_dir / "site").mkdir(parents=True, exist_ok=True)
+        cache_dir = str(tmp / "cache")
+        with server.serve(corpus_dir / "site", latency=args.latency) as stand_in:
+            expected = corpus.generate(corpus_dir, args.articles, tuple(int(p) for p in args.pages.split(",")),
+                                       stand_in.base_url, args.template_kib)
+            rows = batch.read_manifest(corpus_dir / "manifest.csv")
+            template_path = corpus_dir / "template.xml"
+
+            times, _, scans = run_stages(rows, template_path, cache_dir, trace=False)
+            tracemalloc.start()
+            try:
+                _, peaks, _ = run_stages(rows, template_path, cache_dir, trace=True)
+            finally:
+                tracemalloc.stop()
+            batches = run_batches(rows, template_path, cache_dir, tmp / "out", [int(w) for w in args.workers.split(",")],
+                                  stand_in)
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "corpus": {"articles": args.articles, "pages": args.pages, "latency_s": args.latency,
+                   "template_kib": args.template_kib},
+        "single": {stage: summarize(times[stage], peaks[stage]) for stage in STAGES},
+        "single_peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "batch": batches,
+        "history_mismatches": check_history(scans, expected),
+    }
+    print(json.dumps(result, indent=2))
+    if args.record:
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return 1 if result["history_mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
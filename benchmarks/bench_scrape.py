@@ -0,0 +1,137 @@
+"""Article page extraction benchmark: full BeautifulSoup parse vs the streaming scanner.
+
+    python benchmarks/bench_scrape.py [--pages DIR] [--count 50] [--record history.jsonl]
+
+``--pages`` points at saved OJS article pages (``*.html``); without it,
+synthetic pages shaped like the OJS bootstrap theme are generated: a long head
+of meta/link/script tags, the date block in the article details and a large
+body of abstract, references and footer after it. For each page the old approach
+(parse the whole body with ``html.parser``) and ``scrape.PageScanner`` fed in
+``fetch.CHUNK_SIZE`` chunks are timed. The scanner's bytes are what it read
+before stopping, which is what ``fetch.fetch_until`` downloads. Both must
+agree on every page.
+"""
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from xmlgen import fetch, pipeline, scrape  # noqa: E402
+
+
+def bs4_page(url, content):
+    """The extraction as it was before the scanner: a full tree of the page"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, "html.parser")
+    published = ("null", "null", "null")
+    published_div = soup.find("div", class_="list-group-item date-published")
+    if published_div:
+        text = published_div.get_text(strip=True).replace("Published:", "").strip()
+        published = pipeline.parse_date(text)
+    keywords = []
+    for meta in soup.find_all("meta", {"name": "citation_keywords"}):
+        for kw in re.split(r'[;,]\s*', meta.get("content", "")):
+            if kw.strip():
+                keywords.append(kw.strip())
+    return scrape.ArticlePage(url, published, keywords, None)
+
+
+def scanner_page(url, content, chunk_size=fetch.CHUNK_SIZE):
+    """(ArticlePage, bytes read) for the streaming scanner"""
+    scanner = scrape.PageScanner()
+    read = 0
+    for offset in range(0, len(content), chunk_size):
+        chunk = content[offset:offset + chunk_size]
+        read += len(chunk)
+        if scanner.feed(chunk):
+            break
+    scanner.close()
+    return scanner.page(url), read
+
+
+def synthetic_page(rng, references=120):
+    head = ['<meta charset="utf-8">', "<title>An Article | Journal</title>"]
+    head += [f'<link rel="stylesheet" href="/plugins/themes/bootstrap3/styles/{i}.css">' for i in range(12)]
+    head += [f'<meta name="citation_author" content="Author {i}">' for i in range(rng.randint(2, 8))]
+    head += ['<meta name="citation_keywords" content="%s">' % kw for kw in ("machine learning", "image; retrieval", "deep, networks")]
+    head += ["<script>" + "var ojs = {};" * 200 + "</script>"]
+    nav = "<nav>" + "".join(f'<a href="/issue/{i}">Issue {i}</a>' for i in range(80)) + "</nav>"
+    details = (
+        '<div class="list-group">'
+        '<div class="list-group-item doi"><strong>DOI:</strong> https://doi.org/10.33093/jiwe.2023.2.2.1</div>'
+        '<div class="list-group-item date-published"><strong>Published:</strong> 1 October 2023</div>'
+        "</div>"
+    )
+    abstract = '<div class="article-abstract"><p>' + "Lorem ipsum dolor sit amet. " * 150 + "</p></div>"
+    refs = '<div class="article-references"><ol>' + "".join(
+        f"<li>Author {i}. A cited work, volume {i}. https://doi.org/10.1000/{i}</li>" for i in range(references)
+    ) + "</ol></div>"
+    footer = "<footer>" + "<p>Journal footer text.</p>" * 100 + "</footer>"
+    body = nav + '<div class="row"><div class="col-md-4">' + details + '</div><div class="col-md-8">' + abstract + refs + "</div></div>" + footer
+    return ("<!DOCTYPE html><html><head>" + "".join(head) + "</head><body>" + body + "</body></html>").encode("utf-8")
+
+
+def load_pages(args):
+    if args.pages:
+        return [(p.name, p.read_bytes()) for p in sorted(Path(args.pages).glob("*.html"))]
+    rng = random.Random(0)
+    return [(f"synthetic-{i}", synthetic_page(rng, rng.randint(40, 250))) for i in range(args.count)]
+
+
+def time_it(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", default=None, help="Directory of saved article pages (*.html)")
+    parser.add_argument("--count", type=int, default=50, help="Synthetic pages to generate without --pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repeats per page (best is kept)")
+    parser.add_argument("--record", default=None, help="Append the result to this JSONL file")
+    args = parser.parse_args(argv)
+
+    pages = load_pages(args)
+    if not pages:
+        parser.error("no pages to benchmark")
+    old_times, new_times, full_bytes, read_bytes, mismatches = [], [], 0, 0, []
+    for name, content in pages:
+        old_time, old = time_it(lambda: bs4_page(name, content), args.repeat)
+        new_time, (new, read) = time_it(lambda: scanner_page(name, content), args.repeat)
+        old_times.append(old_time)
+        new_times.append(new_time)
+        full_bytes += len(content)
+        read_bytes += read
+        if old != new:
+            mismatches.append(name)
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "pages": len(pages),
+        "bs4_full_parse": {"median_ms": round(statistics.median(old_times) * 1000, 3), "bytes": full_bytes},
+        "streaming_scanner": {"median_ms": round(statistics.median(new_times) * 1000, 3), "bytes": read_bytes},
+        "speedup": round(sum(old_times) / sum(new_times), 1),
+        "bytes_saved": round(1 - read_bytes / full_bytes, 3),
+        "mismatches": mismatches,
+    }
+    print(json.dumps(result, indent=2))
+    if args.record:
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Start-up benchmark: cold import time of the app modules and per-rerun overhead.
+
+    python benchmarks/bench_startup.py [--runs 5] [--reruns 20] [--record history.jsonl]
+
+Cold start runs each import in a fresh interpreter (what a batch worker pays
+at spawn); per-rerun overhead runs ``test.py`` through Streamlit's ``AppTest``
+repeatedly (what every widget interaction pays). The result is printed as
+JSON; ``--record`` appends it to a JSONL file so runs can be compared over time.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must stay cheap to import; the heavy libraries are listed so a
+# regression that pulls them back in at import time shows up in the report
+TARGETS = {
+    "xmlgen.pipeline": "import xmlgen.pipeline",
+    "xmlgen.batch": "import xmlgen.batch",
+    "xmlgen.articleset": "import xmlgen.articleset",
+}
+HEAVY = ("fitz", "bs4", "requests")
+
+PROBE = """
+import sys, time
+t = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - t
+print(elapsed, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def cold_import(statement, runs):
+    """Median seconds for ``statement`` in a fresh interpreter, plus heavy modules it loaded"""
+    times = []
+    loaded = ""
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(statement=statement, heavy=HEAVY)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        times.append(float(out[0]))
+        loaded = out[1] if len(out) > 1 else ""
+    return {"median_ms": round(statistics.median(times) * 1000, 1), "heavy_loaded": loaded.split(",") if loaded else []}
+
+
+def rerun_overhead(reruns):
+    """Mean seconds per script run of the idle app, after a warm-up run"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(ROOT / "test.py"), default_timeout=60)
+    app.run()
+    start = time.perf_counter()
+    for _ in range(reruns):
+        app.run()
+    return {"mean_ms": round((time.perf_counter() - start) / reruns * 1000, 1), "reruns": reruns}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per import target")
+    parser.add_argument("--reruns", type=int, default=20, help="App reruns to average (0 to skip)")
+    parser.add_argument("--record", default=None, help="Append the result to this JSONL file")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(ROOT))
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "cold_import": {name: cold_import(stmt, args.runs) for name, stmt in TARGETS.items()},
+    }
+    if args.reruns:
+        result["rerun"] = rerun_overhead(args.reruns)
+
+    print(json.dumps(result, indent=2))
+    if args.record:
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""Synthetic, reproducible benchmark corpus.
+
+    python benchmarks/corpus.py OUT_DIR [--articles 36] [--pages 1,5,20,60] [--base-url URL]
+
+Writes, for ``--articles`` articles:
+
+- ``pdfs/<n>.pdf``: PyMuPDF documents with the history line in every layout of
+  ``history.HISTORY_PATTERNS`` (plus PDFs without one), at each page count of
+  ``--pages``, with the line on the first, a middle or the last page; a PDF
+  of five or more pages with the line in the middle also has another paper's
+  line, in another layout, on its last page (the earlier line is the one to find)
+- ``xml/<n>.xml``: input XML cycling through the Volume/Issue/FirstPage/DOI
+  variants the pipeline handles (tags present, volume and issue only in the
+  DOI, page ranges with hyphens or en dashes, no DOI, no LastPage)
+- ``site/``: OJS-style article pages with ``date-published`` and
+  ``citation_keywords`` markup, an issue TOC and PDF galleys, for ``server.py``
+- ``manifest.csv`` (``batch``), ``articleset.xml`` with ``mapping.csv`` (``issue``),
+  ``template.xml``, ``expected.json`` (the history layout and page of each PDF)
+  and ``works.json`` (Crossref metadata for the articles with a DOI, for
+  ``server.py --works``)
+
+The same arguments always produce the same corpus.
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+from pathlib import Path
+
+import fitz
+
+BASE_URL = "http://127.0.0.1:8765"
+JOURNAL = "Journal of Informatics and Web Engineering"
+
+# layout -> history line, keyed like history.HISTORY_PATTERNS; None writes no line
+LAYOUTS = {
+    "comma": "Received: {r}, Accepted: {a}",
+    "space": "Received {r} Accepted {a}",
+    "on-semicolon": "Received on {r}; Accepted on {a}",
+    "pipe": "Received: {r} | Revised: {v} | Accepted: {a}",
+    "semicolon": "Received: {r}; Accepted: {a}",
+    "none": None,
+}
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+          "October", "November", "December"]
+POSITIONS = ("first", "middle", "last")
+
+# name -> (Volume/Issue tags, FirstPage text, LastPage text or None, has DOI)
+XML_VARIANTS = {
+    "volume-issue": ("<Volume>{vol}</Volume><Issue>{iss}</Issue>", "{fp}", "{lp}", True),
+    "doi-only": ("", "{fp}", "{lp}", True),
+    "volume-only": ("<Volume>{vol}</Volume>", "{fp}", "{lp}", True),
+    "hyphen-range": ("<Volume>{vol}</Volume><Issue>{iss}</Issue>", "{fp}-{lp}", "{fp}-{lp}", True),
+    "en-dash-range": ("<Volume>{vol}</Volume><Issue>{iss}</Issue>", "{fp}–{lp}", "{fp}–{lp}", True),
+    "no-doi": ("<Volume>{vol}</Volume><Issue>{iss}</Issue>", "{fp}", "{lp}", False),
+    "no-last-page": ("<Volume>{vol}</Volume><Issue>{iss}</Issue>", "{fp}", None, True),
+}
+
+ARTICLE_XML = """<Article><Journal><PublisherName>MMU Press</PublisherName><JournalTitle>{journal}</JournalTitle><Issn>2821-370X</Issn>{volume_issue}<PubDate PubStatus="epublish"><Year>2023</Year><Month>10</Month><Day>1</Day></PubDate></Journal>
+<ArticleTitle>Benchmark article {n}</ArticleTitle><FirstPage>{first_page}</FirstPage>{last_page}
+{doi}<Language>EN</Language>
+<AuthorList>{authors}</AuthorList>
+<Abstract>{abstract}</Abstract></Article>"""
+
+ARTICLE_PAGE = """<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Benchmark article {n}</title>
+{links}<meta name="citation_title" content="Benchmark article {n}">{doi_meta}<meta name="citation_firstpage" content="{fp}">
+<meta name="citation_pdf_url" content="{base}/article/download/{id}/1">
+<meta name="citation_keywords" content="{keywords1}"><meta name="citation_keywords" content="{keywords2}">
+<script>{script}</script></head>
+<body><nav>{nav}</nav><div class="row"><div class="col-md-4"><div class="list-group">
+<div class="list-group-item doi"><strong>DOI:</strong> {doi_text}</div>
+<div class="list-group-item date-published"><strong>Published:</strong> {published}</div></div></div>
+<div class="col-md-8"><div class="article-abstract"><p>{abstract}</p></div>
+<div class="article-references"><ol>{references}</ol></div></div></div><footer>{footer}</footer></body></html>"""
+
+TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<article xmlns:xlink="http://www.w3.org/1999/xlink" article-type="research-article">
+<front>
+<article-meta><title-group><article-title>Placeholder</article-title></title-group></article-meta>
+</front>
+<body>{body}</body>
+<back><ref-list>{refs}</ref-list></back>
+</article>
+"""
+
+
+def date_text(rng, style):
+    day, month, year = rng.randint(1, 28), rng.choice(MONTHS), rng.randint(2019, 2024)
+    return f"{day} {month} {year}" if style == 0 else f"{month} {day}, {year}"
+
+
+def line_page(page_count, position):
+    return {"first": 0, "middle": page_count // 2, "last": page_count - 1}[position]
+
+
+def write_pdf(path, line, page_count, position, rng, later_line=None):
+    doc = fitz.open()
+    target = line_page(page_count, position)
+    for i in range(page_count):
+        page = doc.new_page()
+        y = 72
+        for _ in range(rng.randint(20, 40)):
+            page.insert_text((72, y), "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod.", fontsize=9)
+            y += 11
+        if line is not None and i == target:
+            page.insert_text((72, y + 20), line, fontsize=9)
+        if later_line is not None and i == page_count - 1:
+            page.insert_text((72, y + 40), later_line, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def article_xml(n, variant, rng):
+    volume_issue, first_page, last_page, has_doi = XML_VARIANTS[variant]
+    fp = 10 * n + 1
+    lp = fp + rng.randint(5, 20)
+    fields = {"vol": 2, "iss": 2, "fp": fp, "lp": lp}
+    authors = "".join(
+        f"<Author><FirstName>First{i}</FirstName><LastName>Last{i}</LastName></Author>" for i in range(rng.randint(1, 6))
+    )
+    return ARTICLE_XML.format(
+        journal=JOURNAL,
+        volume_issue=volume_issue.format(**fields),
+        n=n,
+        first_page=first_page.format(**fields),
+        last_page=f"<LastPage>{last_page.format(**fields)}</LastPage>" if last_page else "",
+        doi=f'<ELocationID EIdType="doi">{doi_for(n)}</ELocationID>' if has_doi else "",
+        authors=authors,
+        abstract="Abstract text. " * rng.randint(20, 80),
+    ), fp
+
+
+def doi_for(n):
+    return f"10.33093/jiwe.2023.2.2.{n}"
+
+
+def article_page(n, article_id, fp, has_doi, rng, base_url):
+    return ARTICLE_PAGE.format(
+        n=n,
+        id=article_id,
+        fp=fp,
+        base=base_url,
+        links="".join(f'<link rel="stylesheet" href="/styles/{i}.css">' for i in range(12)),
+        doi_meta=f'<meta name="citation_doi" content="{doi_for(n)}">' if has_doi else "",
+        doi_text=f"https://doi.org/{doi_for(n)}" if has_doi else "",
+        keywords1="; ".join(rng.sample(["informatics", "web engineering", "retrieval", "learning", "vision"], 3)),
+        keywords2="benchmark",
+        script="var ojs = {};" * 200,
+        nav="".join(f'<a href="/issue/view/{i}">Issue {i}</a>' for i in range(60)),
+        published=f"{rng.randint(1, 28)} {rng.choice(MONTHS)} 2023",
+        abstract="Lorem ipsum dolor sit amet. " * 150,
+        references="".join(f"<li>Author {i}. A cited work, vol. {i}. https://doi.org/10.1000/{i}</li>" for i in range(rng.randint(40, 200))),
+        footer="<p>Journal footer text.</p>" * 80,
+    )
+
+
+def generate(out_dir, articles=36, page_counts=(1, 5, 20, 60), base_url=BASE_URL, template_kib=256, seed=0):
+    """Write the corpus into ``out_dir``; returns the expected history layout and page per article number"""
+    out = Path(out_dir)
+    rng = random.Random(seed)
+    for sub in ("pdfs", "xml", "site/article/view", "site/issue/view"):
+        (out / sub).mkdir(parents=True, exist_ok=True)
+
+    layouts = list(LAYOUTS)
+    lined = [name for name in layouts if LAYOUTS[name]]
+    variants = list(XML_VARIANTS)
+    expected, manifest, mapping, articles_xml, toc, works = {}, [], [], [], [], []
+    for n in range(1, articles + 1):
+        layout = layouts[(n - 1) % len(layouts)]
+        page_count = page_counts[((n - 1) // len(layouts)) % len(page_counts)]
+        position = POSITIONS[(n - 1) % len(POSITIONS)]
+        variant = variants[(n - 1) % len(variants)]
+        article_id = 1000 + n
+
+        line = LAYOUTS[layout]
+        if line is not None:
+            style = n % 2
+            line = line.format(r=date_text(rng, style), v=date_text(rng, style), a=date_text(rng, style))
+        later_line = None
+        if line is not None and position == "middle" and page_count >= 5:
+            # A proceedings PDF with the next paper's line; own generator, so the rest of the corpus is unchanged
+            later = random.Random(f"{seed}-{n}")
+            later_line = LAYOUTS[lined[(lined.index(layout) + 1) % len(lined)]].format(
+                r=date_text(later, 0), v=date_text(later, 0), a=date_text(later, 0))
+        pdf_path = out / "pdfs" / f"{n}.pdf"
+        write_pdf(pdf_path, line, page_count, position, rng, later_line)
+        galley = out / "site" / "article" / "download" / str(article_id)
+        galley.mkdir(parents=True, exist_ok=True)
+        (galley / "1").write_bytes(pdf_path.read_bytes())
+
+        xml, fp = article_xml(n, variant, rng)
+        (out / "xml" / f"{n}.xml").write_text(f'<?xml version="1.0" encoding="UTF-8"?>\n<ArticleSet>{xml}</ArticleSet>', encoding="utf-8")
+        articles_xml.append(xml)
+        has_doi = XML_VARIANTS[variant][3]
+        if has_doi:
+            works.append({"DOI": doi_for(n).upper(), "published-online": {"date-parts": [[2023, 9, n % 28 + 1]]},
+                          "volume": "2", "issue": "2", "page": str(fp)})
+        (out / "site" / "article" / "view" / str(article_id)).write_text(
+            article_page(n, article_id, fp, has_doi, rng, base_url), encoding="utf-8")
+
+        url = f"{base_url}/article/view/{article_id}"
+        pdf_link = f"{base_url}/article/download/{article_id}/1"
+        # PDFs without a history line get the dates from the manifest instead
+        dates = ("1 January 2023", "2 February 2023") if line is None else ("", "")
+        manifest.append({"pdf": f"pdfs/{n}.pdf", "xml": f"xml/{n}.xml", "article_url": url, "pdf_link": pdf_link,
+                         "received": dates[0], "accepted": dates[1]})
+        mapping.append({"doi": doi_for(n) if has_doi else "", "first_page": "" if has_doi else str(fp),
+                        "pdf": f"pdfs/{n}.pdf", "article_url": url, "pdf_link": pdf_link,
+                        "received": dates[0], "accepted": dates[1]})
+        toc.append(f'<li><h3 class="title"><a href="/article/view/{article_id}">Benchmark article {n}</a></h3>'
+                   f'<a class="obj_galley_link pdf" href="/article/view/{article_id}/1">PDF</a></li>')
+        expected[n] = {"layout": layout, "page": line_page(page_count, position) + 1 if line else None,
+                       "pages": page_count, "position": position, "later_line": later_line is not None,
+                       "xml_variant": variant}
+
+    for name, rows in (("manifest.csv", manifest), ("mapping.csv", mapping)):
+        with open(out / name, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    (out / "articleset.xml").write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n<ArticleSet>\n' + "\n".join(articles_xml) + "\n</ArticleSet>\n", encoding="utf-8")
+    (out / "site" / "issue" / "view" / "1").write_text(
+        '<html><body><ul class="cmp_article_list articles">' + "".join(toc) + "</ul></body></html>", encoding="utf-8")
+    paragraph = "<p>" + "Body text of the article. " * 40 + "</p>\n"
+    ref = '<ref><mixed-citation>Author. A cited work. <ext-link xlink:href="https://doi.org/10.1000/1">doi</ext-link></mixed-citation></ref>\n'
+    body_count = max(1, template_kib * 1024 // 2 // len(paragraph))
+    (out / "template.xml").write_text(
+        TEMPLATE.format(body=paragraph * body_count, refs=ref * max(1, template_kib * 1024 // 2 // len(ref))), encoding="utf-8")
+    (out / "expected.json").write_text(json.dumps(expected, indent=1), encoding="utf-8")
+    (out / "works.json").write_text(json.dumps(works, indent=1), encoding="utf-8")
+    return expected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--articles", type=int, default=36)
+    parser.add_argument("--pages", default="1,5,20,60", help="Comma-separated PDF page counts to cycle through")
+    parser.add_argument("--base-url", default=BASE_URL, help="Where server.py will serve the site directory")
+    parser.add_argument("--template-kib", type=int, default=256, help="Approximate template size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.out_dir, args.articles, tuple(int(p) for p in args.pages.split(",")), args.base_url.rstrip("/"),
+             args.template_kib, args.seed)
+    print(f"Corpus of {args.articles} articles written to {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
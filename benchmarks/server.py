@@ -0,0 +1,141 @@
+"""Local HTTP stand-in for the journal site, serving a corpus ``site`` directory.
+
+    python benchmarks/server.py SITE_DIR [--port 8765] [--latency 0.05] [--works works.json]
+
+``serve(directory)`` runs the same server in a background thread for the
+benchmarks. ``--latency`` adds a fixed delay before every response, to mimic a
+remote site; ``stats`` counts requests and body bytes sent. Files carry an
+``ETag`` as well as ``Last-Modified`` and answer a matching ``If-None-Match``
+with ``304``, like a real journal site; ``etags=False`` leaves only
+``Last-Modified``.
+
+With ``works`` (a list of Crossref ``message`` items, such as the corpus's
+``works.json``) it also stands in for a Crossref-compatible REST endpoint:
+``/works?filter=doi:A,doi:B`` and ``/works/<doi>``, as ``crossref`` queries them.
+"""
+import argparse
+import functools
+import io
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+class StandInHandler(SimpleHTTPRequestHandler):
+    latency = 0.0
+    etags = True
+    etag = None  # Of the file being answered
+
+    def send_head(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+        self.etag = None
+        if self.server.works is not None and urlsplit(self.path).path.startswith("/works"):
+            return self.send_works()
+        path = self.translate_path(self.path)
+        if self.etags and os.path.isfile(path):
+            stat = os.stat(path)
+            self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if self.headers.get("If-None-Match") == self.etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def send_works(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/works":
+            filters = parse_qs(parts.query).get("filter", [""])[0].split(",")
+            dois = [f[len("doi:"):].lower() for f in filters if f.startswith("doi:")]
+            message = {"items": [self.server.works[doi] for doi in dois if doi in self.server.works]}
+        else:
+            message = self.server.works.get(unquote(parts.path[len("/works/"):]).lower())
+        if message is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return None
+        body = json.dumps({"status": "ok", "message": message}).encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def end_headers(self):
+        if self.etag is not None:
+            self.send_header("ETag", self.etag)
+        super().end_headers()
+
+    def copyfile(self, source, outputfile):
+        # Counted chunk by chunk, so a client that hangs up early is only charged what it got
+        while chunk := source.read(16 * 1024):
+            try:
+                outputfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                break
+            with self.server.stats_lock:
+                self.server.stats["bytes_sent"] += len(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def works_by_doi(items):
+    """The ``works`` a server answers from: Crossref items by lower-cased DOI"""
+    return {item["DOI"].lower(): item for item in items}
+
+
+def make_server(directory, port=0, latency=0.0, etags=True, works=None):
+    handler = type("Handler", (StandInHandler,), {"latency": latency, "etags": etags})
+    handler = functools.partial(handler, directory=str(directory))
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.works = None if works is None else works_by_doi(works)
+    server.stats = {"requests": 0, "bytes_sent": 0}
+    server.stats_lock = threading.Lock()
+    return server
+
+
+@contextmanager
+def serve(directory, port=0, latency=0.0, etags=True, works=None):
+    """Serve ``directory`` in a background thread; yields the server (``server.base_url``, ``server.stats``)"""
+    server = make_server(directory, port, latency, etags, works)
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("site_dir")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--works", help="JSON list of Crossref items to answer /works queries from")
+    args = parser.parse_args(argv)
+    works = None
+    if args.works:
+        with open(args.works, encoding="utf-8") as f:
+            works = json.load(f)
+    server = make_server(args.site_dir, args.port, args.latency, works=works)
+    print(f"Serving {args.site_dir} at http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,642 +1,704 @@
-import xml.etree.ElementTree as ET
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
-import fitz  # PyMuPDF
-import re
-import streamlit as st
-import os
-import subprocess
-import sys
-from pathlib import Path
-
-# Ensure packages are installed
-required = {
-    'beautifulsoup4==4.12.3',
-    'soupsieve==2.5'
-}
-installed = {pkg.key for pkg in __import__('pkg_resources').working_set}
-missing = required - installed
-
-if missing:
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', *missing], 
-                         stdout=subprocess.DEVNULL, 
-                         stderr=subprocess.DEVNULL)
-
-if 'reset_counter' not in st.session_state:
-    st.session_state.reset_counter = 0
-if 'show_success' not in st.session_state:
-    st.session_state.show_success = False
-if 'xml_data' not in st.session_state:
-    st.session_state.xml_data = None
-if 'filename' not in st.session_state:
-    st.session_state.filename = "formatted_article_set.xml"
-if 'processed_xml' not in st.session_state:
-    st.session_state.processed_xml = None
-if 'show_combine_section' not in st.session_state:
-    st.session_state.show_combine_section = False
-if 'final_combined_xml' not in st.session_state:
-    st.session_state.final_combined_xml = None
-
-def parse_date(date_str):
-    for fmt in ["%d %B %Y", "%B %d, %Y", "%d %b %Y", "%b %d, %Y"]:
-        try:
-            dt = datetime.strptime(date_str, fmt)
-            return str(dt.year), f"{dt.month:02d}", f"{dt.day:02d}"
-        except:
-            continue
-    return "null", "null", "null"
-
-def extract_history_from_pdf(pdf_path):
-    try:
-        doc = fitz.open(pdf_path)
-        combined_date = r"(?:[A-Za-z]{3,9}\s+\d{1,2},?\s*\d{4}|\d{1,2}\s+[A-Za-z]{3,9},?\s*\d{4})"
-
-        patterns = [
-            re.compile(rf"(?i)Received\s*[:\-]?\s*({combined_date}),\s*Accepted\s*[:\-]?\s*({combined_date})"),
-            re.compile(rf"(?i)Received\s+({combined_date})\s+Accepted\s+({combined_date})"),
-            re.compile(rf"(?i)Received\s+on\s+({combined_date})\s*;\s*Accepted\s+on\s+({combined_date})"),
-            re.compile(rf"(?i)Received[:\-]?\s*({combined_date})\s*\|\s*(?:Revised[:\-]?\s*{combined_date}\s*\|\s*)?Accepted[:\-]?\s*({combined_date})"),
-            re.compile(rf"(?i)Received\s*[:\-]?\s*({combined_date})\s*;\s*Accepted\s*[:\-]?\s*({combined_date})"),
-        ]
-
-        for page in doc:
-            text = page.get_text()
-            for pattern in patterns:
-                match = pattern.search(text)
-                if match:
-                    r, a = match.group(1).strip(), match.group(2).strip()
-                    return parse_date(r), parse_date(a)
-        return None  # Return None when dates aren't found
-    except Exception as e:
-        st.error(f"Error processing PDF: {str(e)}")
-        return None
-
-def clear_form():
-    st.session_state.reset_counter += 1
-    st.session_state.show_success = True
-    st.session_state.xml_data = None
-    st.session_state.processed_xml = None
-    st.session_state.filename = "formatted_article_set.xml"
-    st.session_state.show_combine_section = False
-    st.session_state.final_combined_xml = None
-
-def extract_journal_abbreviation(doi):
-    """Extract journal abbreviation from DOI"""
-    if not doi:
-        return "null"
-    
-    # Split DOI by both '/' and '.'
-    parts = re.split(r'[/.]', doi)
-    
-    # Find the abbreviation part (usually the part before the year)
-    for i, part in enumerate(parts):
-        if part.isdigit() and len(part) == 4:  # Year found
-            if i > 0:
-                return parts[i-1].upper()  # Return the part before the year
-    return "null"
-
-def generate_filename(article_url, xml_content):
-    try:
-        root = ET.fromstring(xml_content)
-        
-        # Extract DOI components
-        doi_elem = root.find(".//ELocationID[@EIdType='doi']")
-        last_doi_digit = ""
-        if doi_elem is not None and doi_elem.text:
-            doi = doi_elem.text.strip()
-            parts = doi.split(".")
-            last_part = parts[-1]
-            last_doi_digit = last_part if last_part.isdigit() else ""
-
-        # Extract number from URL
-        numbers = re.findall(r'\d+', article_url)
-        last_url_num = numbers[-1] if numbers else "-"
-        
-        # Initialize volume and issue
-        volume = root.findtext(".//Volume", "").strip()
-        issue = root.findtext(".//Issue", "").strip()
-
-        # If not found in standard tags, try to extract from DOI
-        if not volume or not issue:
-            if doi_elem is not None and doi_elem.text:
-                doi = doi_elem.text.strip()
-                parts = doi.split('.')
-                
-                # Find the position of the 4-digit year
-                year_pos = -1
-                for i, part in enumerate(parts):
-                    if len(part) == 4 and part.isdigit():
-                        year_pos = i
-                        break
-                
-                # Extract volume and issue if pattern matches
-                if year_pos != -1 and len(parts) > year_pos + 2:
-                    volume = parts[year_pos + 1] if not volume else volume
-                    issue = parts[year_pos + 2] if not issue else issue
-
-        # Set defaults if still not found
-        vol_num = volume if volume else "-"
-        issue_num = issue if issue else "-"
-        
-        # Extract year
-        year = "null"
-        try:
-            response = requests.get(article_url)
-            soup = BeautifulSoup(response.content, "html.parser")
-            published_div = soup.find("div", class_="list-group-item date-published")
-            if published_div:
-                text = published_div.get_text(strip=True).replace("Published:", "").strip()
-                year, _, _ = parse_date(text)
-        except Exception as e:
-            st.warning(f"Could not extract year from article URL: {str(e)}")
-            pub_date = root.find(".//PubDate[@PubStatus='pub']")
-            if pub_date is not None:
-                year_elem = pub_date.find("Year")
-                if year_elem is not None and year_elem.text:
-                    year = year_elem.text.strip()
-        
-        # Construct filename parts
-        parts = [
-            last_doi_digit,
-            last_url_num,
-            f"Vol.{vol_num}",
-            f"No.{issue_num}",
-            year
-        ]
-        return "_".join(filter(None, parts)) + ".xml"  # filter removes empty parts
-    except Exception as e:
-        st.warning(f"Could not generate filename: {str(e)}")
-        return "formatted_article_set.xml"
-    
-def indent(elem, level=0):
-    indent_str = "  "
-    newline = "\n"
-    
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = newline + indent_str * (level + 1)
-        
-        for i, child in enumerate(elem):
-            indent(child, level + 1)
-            
-            if i < len(elem) - 1:
-                if not child.tail or not child.tail.strip():
-                    child.tail = newline + indent_str * (level + 1)
-            else:
-                if not child.tail or not child.tail.strip():
-                    child.tail = newline + indent_str * level
-    
-    else:
-        if level > 0 and (not elem.tail or not elem.tail.strip()):
-            elem.tail = newline + indent_str * level
-
-def process_files(pdf_file, input_xml, article_url, pdf_link):
-    try:
-        temp_pdf = "temp_uploaded.pdf"
-        temp_xml = "temp_uploaded.xml"
-        
-        with st.spinner("Processing files..."):
-            # Save uploaded files temporarily
-            with open(temp_pdf, "wb") as f:
-                f.write(pdf_file.getbuffer())
-            with open(temp_xml, "wb") as f:
-                f.write(input_xml.getbuffer())
-
-            # Read XML content
-            with open(temp_xml, "r", encoding="utf-8") as f:
-                xml_content = f.read()
-            
-            st.session_state.filename = generate_filename(article_url, xml_content)
-            
-            tree = ET.parse(temp_xml)
-            root = tree.getroot()
-            article = root.find(".//Article")
-            
-            if article is None:
-                raise ValueError("No Article element found in the input XML")
-
-            # Journal metadata processing
-            journal = article.find("Journal")
-            jt_elem = journal.find("JournalTitle") if journal is not None else None
-            issn_elem = journal.find("Issn") if journal is not None else None
-            doi_elem = article.find(".//ELocationID[@EIdType='doi']")
-            
-            if jt_elem is None or issn_elem is None:
-                raise ValueError("Journal title or ISSN not found")
-
-            journal_title = jt_elem.text.strip()
-            shortcode = extract_journal_abbreviation(doi_elem.text if doi_elem is not None else "")
-            pmc_id = shortcode.lower()
-            
-            # Create XML structure
-            article_out = ET.Element("Article")
-            journal_meta = ET.SubElement(article_out, "Journal-meta")
-            
-            # Add journal identifiers
-            for id_type, val in [("pmc", pmc_id), ("pubmed", journal_title), ("publisher", shortcode)]:
-                ET.SubElement(journal_meta, "journal-id", {"journal-id-type": id_type}).text = val
-            
-            ET.SubElement(journal_meta, "Issn").text = issn_elem.text.strip()
-            publisher = ET.SubElement(journal_meta, "Publisher")
-            ET.SubElement(publisher, "PublisherName").text = "MMU Press, Multimedia University"
-            ET.SubElement(journal_meta, "JournalTitle").text = journal_title
-
-            # Article metadata
-            article_meta = ET.SubElement(article_out, "article-meta")
-
-            # DOI and custom ID
-            doi_elem = article.find(".//ELocationID[@EIdType='doi']")
-            ET.SubElement(article_meta, "article-id", {"pub-id-type": "doi"}).text = doi_elem.text.strip() if doi_elem is not None else "null"
-            
-            volume = article.findtext(".//Volume", "").strip()
-            issue = article.findtext(".//Issue", "").strip()
-
-            # If not found, try to extract from DOI
-            if not volume or not issue:
-                doi_elem = article.find(".//ELocationID[@EIdType='doi']")
-                if doi_elem is not None and doi_elem.text:
-                    doi = doi_elem.text.strip()
-                    # Extract the parts after the year (assuming format like 10.xxx/xxx.YYYY.V.I...)
-                    parts = doi.split('.')
-                    
-                    # Find the position of the 4-digit year
-                    year_pos = -1
-                    for i, part in enumerate(parts):
-                        if len(part) == 4 and part.isdigit():
-                            year_pos = i
-                            break
-                    
-                    # If year found and there are at least 2 parts after it
-                    if year_pos != -1 and len(parts) > year_pos + 2:
-                        volume = parts[year_pos + 1]  # Part after year is volume
-                        issue = parts[year_pos + 2]  # Next part is issue
-
-            # For handle page number
-            try:
-                fp_text = article.findtext(".//FirstPage", "0").strip()
-                lp_text = article.findtext(".//LastPage", "0").strip()
-
-                # Initialize default values
-                fp = 0
-                lp = 0
-
-                # Extract first page number (split on en dash '–' or hyphen '-')
-                if fp_text and '–' in fp_text:
-                    fp = int(fp_text.split('–')[0])
-                elif fp_text and '-' in fp_text:
-                    fp = int(fp_text.split('-')[0])
-                else:
-                    fp = int(fp_text) if fp_text.isdigit() else 0
-
-                # Extract last page number (split on en dash '–' or hyphen '-')
-                if lp_text and '–' in lp_text:
-                    lp = int(lp_text.split('–')[1])
-                elif lp_text and '-' in lp_text:
-                    lp = int(lp_text.split('-')[1])
-                else:
-                    lp = int(lp_text) if lp_text.isdigit() else 0
-
-                # Calculate page count (ensure lp >= fp to avoid negative values)
-                page_count = str(max(0, lp - fp + 1)) if lp >= fp else "0"
-            except:
-                page_count = "null"
-
-            custom_id = f"{shortcode[0].lower()}{shortcode}.v{volume}.i{issue}.pg{str(fp)}"
-            ET.SubElement(article_meta, "article-id", {"pub-id-type": "other"}).text = custom_id
-
-            # Title
-            title_elem = article.find("ArticleTitle")
-            ET.SubElement(article_meta, "ArticleTitle").text = title_elem.text.strip() if title_elem is not None else "null"
-
-            # Authors
-            author_list = article.find("AuthorList")
-            if author_list is not None:
-                article_meta.append(author_list)
-            else:
-                ET.SubElement(article_meta, "AuthorList")
-
-            # Publication dates from webpage
-            try:
-                response = requests.get(article_url)
-                soup = BeautifulSoup(response.content, "html.parser")
-                year, month, day = "null", "null", "null"
-                
-                published_div = soup.find("div", class_="list-group-item date-published")
-                if published_div:
-                    text = published_div.get_text(strip=True).replace("Published:", "").strip()
-                    year, month, day = parse_date(text)
-
-                # Add publication dates
-                epublish_date = article.find(".//PubDate[@PubStatus='epublish']")
-                if epublish_date is not None:
-                    article_meta.append(epublish_date)
-
-                for pub_type in ['pub', 'cover']:
-                    pd_elem = ET.Element("PubDate", {"PubStatus": pub_type})
-                    for tag, val in zip(["Year", "Month", "Day"], [year, month, day]):
-                        ET.SubElement(pd_elem, tag).text = val
-                    article_meta.append(pd_elem)
-
-                # Keywords
-                keywords_elem = ET.SubElement(article_meta, "Keywords")
-                for meta in soup.find_all("meta", {"name": "citation_keywords"}):
-                    keywords_content = meta.get("content", "")
-                    for kw in re.split(r'[;,]\s*', keywords_content):
-                        kw = kw.strip()
-                        if kw:
-                            kw_elem = ET.SubElement(keywords_elem, "Keyword")
-                            ET.SubElement(kw_elem, "italic").text = kw
-            except Exception as e:
-                st.warning(f"Could not scrape article URL: {str(e)}")
-
-            # Volume/Issue/Pages
-            ET.SubElement(article_meta, "Volume").text = volume
-            ET.SubElement(article_meta, "Issue").text = issue
-
-            # Create tagging for first page, last page and page count
-            ET.SubElement(article_meta, "FirstPage").text = str(fp)
-            ET.SubElement(article_meta, "LastPage").text = str(lp)
-            ET.SubElement(article_meta, "PageCount").text = page_count
-
-            # Date extraction with strict validation
-            dates = extract_history_from_pdf(temp_pdf)
-            
-            # If dates not found in PDF or invalid, show dropdown selectors
-            if dates is None or dates == (("null", "null", "null"), ("null", "null", "null")):
-                st.warning("Could not automatically extract valid dates from PDF. Please select them below:")
-                
-                # Date input section with dropdowns
-                with st.container():
-                    st.markdown("### Required Date Information")
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        # Received date dropdowns
-                        st.markdown("**Received Date**")
-                        r_col1, r_col2, r_col3 = st.columns(3)
-                        r_day = r_col1.selectbox("Day", [""] + list(range(1, 32)), index=0, key="received_day")
-                        r_month = r_col2.selectbox("Month", [""] + [
-                            "January", "February", "March", "April", "May", "June",
-                            "July", "August", "September", "October", "November", "December"
-                        ], index=0, key="received_month")
-                        # Static year range that automatically includes current year
-                        r_year = r_col3.selectbox("Year", [""] + list(range(1980, datetime.now().year + 1)), 
-                                         index=0, key="received_year")
-                    
-                    with col2:
-                        # Accepted date dropdowns
-                        st.markdown("**Accepted Date**")
-                        a_col1, a_col2, a_col3 = st.columns(3)
-                        a_day = a_col1.selectbox("Day", [""] + list(range(1, 32)), index=0, key="accepted_day")
-                        a_month = a_col2.selectbox("Month", [""] + [
-                            "January", "February", "March", "April", "May", "June",
-                            "July", "August", "September", "October", "November", "December"
-                        ], index=0, key="accepted_month")
-                        a_year = a_col3.selectbox("Year", [""] + list(range(1980, datetime.now().year + 1)),
-                                         index=0, key="accepted_year")
-                    
-                    # Only proceed if all date fields are selected
-                    if not all([r_day, r_month, r_year, a_day, a_month, a_year]):
-                        return None
-                    
-                    # Format the selected dates
-                    received_date_str = f"{r_day} {r_month} {r_year}"
-                    accepted_date_str = f"{a_day} {a_month} {a_year}"
-                    
-                    dates = (
-                        parse_date(received_date_str),
-                        parse_date(accepted_date_str)
-                    )
-            else:
-                st.success("✓ Automatically extracted valid dates from PDF")
-
-            # Add dates to XML
-            (r_year, r_month, r_day), (a_year, a_month, a_day) = dates
-            history_elem = ET.Element("History")
-            for status, y, m, d in [("received", r_year, r_month, r_day), ("accepted", a_year, a_month, a_day)]:
-                pubdate = ET.SubElement(history_elem, "PubDate", {"PubStatus": status})
-                ET.SubElement(pubdate, "Year").text = y
-                ET.SubElement(pubdate, "Month").text = m
-                ET.SubElement(pubdate, "Day").text = d
-            article_meta.append(history_elem)
-
-            # Abstract
-            abstract = article.find("Abstract")
-            abs_elem = ET.SubElement(article_meta, "abstract")
-            p_elem = ET.SubElement(abs_elem, "p")
-            p_elem.text = abstract.text.strip() if abstract is not None else "null"
-
-            # Links and language
-            ET.SubElement(article_meta, "pdf-link").text = pdf_link if pdf_link else "null"
-            ET.SubElement(article_meta, "full_text_url").text = article_url if article_url else "null"
-            ET.SubElement(article_meta, "Language").text = "eng"
-
-            # Format and store XML
-            indent(article_out)
-            xml_str = ET.tostring(article_out, encoding='utf-8', method='xml').decode()
-            
-            st.session_state.processed_xml = xml_str
-            st.session_state.show_combine_section = True
-            
-            # Only show success messages after processing completes
-            st.success("✓ Dates selected successfully")
-            st.success("Initial XML processing complete! You can now combine with template XML.")
-            
-            with st.expander("Preview Processed XML Output"):
-                st.code(xml_str[:2000] + "..." if len(xml_str) > 2000 else xml_str, language="xml")
-
-    except Exception as e:
-        st.error(f"An error occurred during processing: {str(e)}")
-    finally:
-        # Clean up temporary files
-        if os.path.exists(temp_pdf):
-            os.remove(temp_pdf)
-        if os.path.exists(temp_xml):
-            os.remove(temp_xml)
-
-def combine_with_template(template_file):
-    try:
-        temp_template = "temp_template.xml"
-        
-        with st.spinner("Combining with template..."):
-            with open(temp_template, "wb") as f:
-                f.write(template_file.getbuffer())
-            
-            processed_root = ET.fromstring(st.session_state.processed_xml)
-            front = ET.Element("front")
-            front.text = "\n  "
-            article = ET.SubElement(front, "Article")
-            article.text = "\n    "
-            
-            def copy_element(source, target, indent_level):
-                indent = "  " * indent_level
-                for elem in source:
-                    new_elem = ET.SubElement(target, elem.tag)
-                    if elem.text:
-                        new_elem.text = elem.text
-                    if elem.attrib:
-                        new_elem.attrib.update(elem.attrib)
-                    new_elem.tail = f"\n{indent}"
-                    if len(elem) > 0:
-                        new_elem.text = f"\n{indent}  "
-                        copy_element(elem, new_elem, indent_level + 1)
-                        new_elem[-1].tail = f"\n{indent}"
-            
-            journal_meta = processed_root.find("Journal-meta")
-            if journal_meta is not None:
-                new_journal_meta = ET.SubElement(article, "Journal-meta")
-                new_journal_meta.text = "\n      "
-                copy_element(journal_meta, new_journal_meta, 3)
-                new_journal_meta[-1].tail = "\n    "
-                new_journal_meta.tail = "\n    "
-            
-            article_meta = processed_root.find("article-meta")
-            if article_meta is not None:
-                new_article_meta = ET.SubElement(article, "article-meta")
-                new_article_meta.text = "\n      "
-                copy_element(article_meta, new_article_meta, 3)
-                new_article_meta[-1].tail = "\n    "
-                new_article_meta.tail = "\n  "
-            
-            article.tail = "\n"
-            xml_str = ET.tostring(front, encoding='utf-8').decode()
-            
-            with open(temp_template, "r", encoding="utf-8") as f:
-                template_content = f.read()
-            
-            front_start = template_content.find("<front>")
-            front_end = template_content.find("</front>")
-            
-            if front_start == -1 or front_end == -1:
-                st.error("Template does not contain <front> tags")
-                return
-            
-            combined_content = (
-                template_content[:front_start] +
-                xml_str +
-                template_content[front_end + len("</front>"):]
-            )
-            
-            st.session_state.final_combined_xml = combined_content
-            st.success("XML successfully combined with template!")
-            
-            with st.expander("Preview Combined XML Output"):
-                st.code(combined_content, language="xml")
-    except Exception as e:
-        st.error(f"Error combining with template: {str(e)}")
-    finally:
-        if os.path.exists(temp_template):
-            os.remove(temp_template)
-
-def main():
-    st.title("Journal Article XML Generator")
-    st.markdown('<div style="font-size:18px;margin-bottom:10px; font-weight:600">This tool creates JATS XML by merging metadata from the article PDF and web input with back-section content from Vertopal.</div>', unsafe_allow_html=True)
-    
-    # Main XML Processing Form
-    st.markdown("---")
-    reset_key = st.session_state.reset_counter
-    
-    with st.form("input_form"):
-        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:10px;">Upload PDF File</div>', unsafe_allow_html=True)
-        pdf_file = st.file_uploader(
-            " ",
-            type=['pdf'], 
-            help="Upload the article PDF file",
-            key=f"pdf_uploader_{reset_key}",
-            label_visibility="collapsed"
-        )
-        
-        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:10px;">Upload Input XML File</div>', unsafe_allow_html=True)
-        input_xml = st.file_uploader(
-            " ",
-            type=['xml'], 
-            help="Upload the original XML metadata file",
-            key=f"xml_uploader_{reset_key}",
-            label_visibility="collapsed"
-        )
-        
-        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:-30px;">Article URL</div>', unsafe_allow_html=True)
-        article_url = st.text_input(
-            label=" ",
-            help="Enter the URL of the article webpage", 
-            key=f"article_url_{reset_key}",
-            value=""
-        )
-
-        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:-30px;">PDF Link</div>', unsafe_allow_html=True)
-        pdf_link = st.text_input(
-            label=" ", 
-            help="Enter the direct URL to the PDF file", 
-            key=f"pdf_link_{reset_key}",
-            value=""
-        )
-        
-        st.write("")
-        
-        col1, col2 = st.columns([1, 4])
-        with col1:
-            reset_button = st.form_submit_button("Reset", type="secondary")
-        with col2:
-            submit_button = st.form_submit_button("Generate XML", type="primary")
-
-        if reset_button:
-            clear_form()
-            st.rerun()
-            
-        if submit_button:
-            if not all([pdf_file, input_xml, article_url]):
-                st.warning("Please provide all required files and URLs")
-            else:
-                process_files(pdf_file, input_xml, article_url, pdf_link)
-    
-    if st.session_state.show_combine_section:
-        st.markdown("---")
-        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:10px;">Combine with Template XML</div>', unsafe_allow_html=True)
-        
-        with st.form("template_form"):
-            template_file = st.file_uploader(
-                "Upload Template XML",
-                type=['xml'],
-                help="Upload the template XML file to combine with (must contain <front> section)",
-                key=f"template_uploader_{reset_key}"
-            )
-            
-            combine_button = st.form_submit_button("Combine with Template")
-            
-            if combine_button:
-                if template_file is None:
-                    st.warning("Please upload a template XML file")
-                else:
-                    combine_with_template(template_file)
-    
-    if st.session_state.processed_xml:
-        st.download_button(
-            label="Download Processed XML",
-            data=st.session_state.processed_xml,
-            file_name=st.session_state.filename,
-            mime="application/xml",
-            key="processed_download"
-        )
-    
-    if st.session_state.final_combined_xml:
-        st.download_button(
-            label="Download Combined XML",
-            data=st.session_state.final_combined_xml,
-            file_name=st.session_state.filename,
-            mime="application/xml",
-            key="combined_download"
-        )
-    
-    if st.session_state.show_success:
-        st.success("All inputs have been cleared!")
-        st.session_state.show_success = False
-
-if __name__ == "__main__":
-    main()
-
-
-
-
-
-
+from datetime import datetime
+import hashlib
+import io
+import time
+import uuid
+import streamlit as st
+
+from xmlgen import archive, articleindex, articleset, artifacts, crossref, harvest, jobs, metrics, pdfworkers, template, validate
+from xmlgen.pipeline import (
+    extract_history_from_pdf,
+    has_history_dates,
+    parse_date,
+    process_article,
+)
+from xmlgen.record import extract_record, render_article_xml, render_front
+from xmlgen.scrape import scrape_all, scrape_article_page
+
+# PDFs are scanned in separate worker processes with time and memory limits;
+# configure() restarts the pool, so only on the first run in this process
+if not pdfworkers.enabled():
+    pdfworkers.configure(enabled=True)
+
+if 'reset_counter' not in st.session_state:
+    st.session_state.reset_counter = 0
+if 'show_success' not in st.session_state:
+    st.session_state.show_success = False
+if 'xml_data' not in st.session_state:
+    st.session_state.xml_data = None
+if 'filename' not in st.session_state:
+    st.session_state.filename = "formatted_article_set.xml"
+# processed_xml and final_combined_xml hold artifact names; the documents
+# themselves live in the session's artifact store (see get_store)
+if 'artifact_session' not in st.session_state:
+    st.session_state.artifact_session = uuid.uuid4().hex
+if 'processed_xml' not in st.session_state:
+    st.session_state.processed_xml = None
+if 'show_combine_section' not in st.session_state:
+    st.session_state.show_combine_section = False
+if 'final_combined_xml' not in st.session_state:
+    st.session_state.final_combined_xml = None
+if 'article_record' not in st.session_state:
+    st.session_state.article_record = None
+if 'validation' not in st.session_state:
+    st.session_state.validation = {}
+if 'issue_results' not in st.session_state:
+    st.session_state.issue_results = None
+if 'issue_unmatched' not in st.session_state:
+    st.session_state.issue_unmatched = []
+if 'issue_archive' not in st.session_state:
+    st.session_state.issue_archive = None
+if 'performance' not in st.session_state:
+    st.session_state.performance = None
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = st.query_params.get("job")
+if 'rendered_job' not in st.session_state:
+    st.session_state.rendered_job = None
+if 'index_warnings' not in st.session_state:
+    st.session_state.index_warnings = []
+if 'issue_job_id' not in st.session_state:
+    st.session_state.issue_job_id = st.query_params.get("issue_job")
+
+def clear_form():
+    get_store().drop(st.session_state.artifact_session)
+    st.session_state.reset_counter += 1
+    st.session_state.show_success = True
+    st.session_state.xml_data = None
+    st.session_state.processed_xml = None
+    st.session_state.filename = "formatted_article_set.xml"
+    st.session_state.show_combine_section = False
+    st.session_state.final_combined_xml = None
+    st.session_state.article_record = None
+    st.session_state.validation = {}
+    st.session_state.issue_results = None
+    st.session_state.issue_unmatched = []
+    st.session_state.issue_archive = None
+    st.session_state.performance = None
+    st.session_state.job_id = None
+    st.session_state.rendered_job = None
+    st.session_state.index_warnings = []
+    st.session_state.issue_job_id = None
+    st.query_params.clear()
+
+def st_report(level, message):
+    getattr(st, level)(message)
+
+# Submissions run as background jobs on a shared worker pool, so a long issue
+# doesn't block the session. The job ID is kept in the URL: after a reload the
+# page picks the job up again and its result is read back from disk. Picking
+# dates by hand only re-renders the finished job's record.
+POLL_SECONDS = 1
+STAGE_LABELS = {
+    "harvest": "Harvesting the issue TOC",
+    "scrape": "Scraping article pages",
+    "record": "Reading the input XML",
+    "pdf_history": "Finding history dates in the PDF",
+    "articles": "Processing articles",
+}
+
+@st.cache_resource
+def get_queue():
+    # One queue per server process; XMLGEN_MAX_JOBS caps how many jobs run at once
+    return jobs.JobQueue()
+
+@st.cache_resource
+def get_store():
+    # Outputs over the per-session memory cap are spilled to disk; idle sessions expire
+    return artifacts.ArtifactStore()
+
+PREVIEW_BYTES = 2000
+
+def show_preview(label, name, key):
+    # Only one window of the document is read and sent to the browser
+    size = get_store().size(st.session_state.artifact_session, name)
+    with st.expander(label):
+        start = 0
+        if size > PREVIEW_BYTES:
+            windows = (size + PREVIEW_BYTES - 1) // PREVIEW_BYTES
+            part = st.number_input(f"Part (of {windows})", min_value=1, max_value=windows, value=1, key=key)
+            start = (part - 1) * PREVIEW_BYTES
+        window = get_store().read(st.session_state.artifact_session, name, start, PREVIEW_BYTES)
+        preview = window.decode("utf-8", errors="ignore")
+        st.code(preview + "..." if start + PREVIEW_BYTES < size else preview, language="xml")
+
+def show_download(label, name, key):
+    # Streamlit reads a download button's data on every rerun; a spilled artifact is only read once asked for
+    session = st.session_state.artifact_session
+    if get_store().spilled(session, name) and not st.button(f"Prepare {label} download", key=f"{key}_prepare"):
+        return
+    with get_store().open(session, name) as artifact:
+        st.download_button(label=f"Download {label}", data=artifact, file_name=st.session_state.filename,
+                           mime="application/xml", key=key)
+
+def forget_expired_artifacts():
+    # Artifacts of an idle session expire; a finished job is then rendered again
+    session = st.session_state.artifact_session
+    if st.session_state.processed_xml and not get_store().has(session, st.session_state.processed_xml):
+        st.session_state.processed_xml = None
+        st.session_state.rendered_job = None
+    if st.session_state.final_combined_xml and not get_store().has(session, st.session_state.final_combined_xml):
+        st.session_state.final_combined_xml = None
+
+def show_validation(report, label):
+    if report["valid"]:
+        st.caption(f"✓ {label} checked: {', '.join(report['checks'])}")
+    else:
+        lines = [f"line {e['line']}: {e['message']}" if e["line"] is not None else e["message"]
+                 for e in report["errors"][:5]]
+        st.error(f"{label} is not valid:\n\n" + "\n\n".join(lines))
+    for warning in report["warnings"]:
+        st.warning(warning)
+
+def input_key(*parts):
+    # Identical inputs map to the same job, so resubmitting them reuses its result
+    digest = hashlib.sha256()
+    for part in parts:
+        part = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big") + part)
+    return digest.hexdigest()
+
+def show_messages(messages):
+    for level, message in messages:
+        st_report(level, message)
+
+def record_performance(recorder, keep_previous=False):
+    # Shown in the "Performance" expander; the combine step adds to the processing run
+    if keep_previous and st.session_state.performance:
+        recorder.merge(st.session_state.performance)
+    st.session_state.performance = recorder.snapshot()
+
+def forget_job(state_key, param):
+    st.session_state[state_key] = None
+    if param in st.query_params:
+        del st.query_params[param]
+
+def show_job_progress(job):
+    st.info(f"Job {job['id'][:8]} is {job['status']}. This page updates by itself, and the result stays available after a reload.")
+    for name, stage in job["stages"].items():
+        label = STAGE_LABELS.get(name, name)
+        if stage["total"]:
+            st.progress(stage["done"] / stage["total"], text=f"{label}: {stage['done']} of {stage['total']}")
+        else:
+            mark = {"pending": "○", "running": "…", "done": "✓", "failed": "✗"}[stage["state"]]
+            count = f": {stage['done']} so far" if stage["done"] else ""
+            st.markdown(f"{mark} {label}{count}")
+
+def article_job(job, pdf_bytes, xml_bytes, article_url, pdf_link):
+    # Runs on the worker pool: no Streamlit calls in here
+    fingerprint = None
+    if articleindex.enabled():
+        # Inputs processed before are rendered from their stored record: nothing is scraped or scanned
+        fingerprint = articleindex.fingerprint(
+            {"pdf": pdf_bytes, "article_xml": xml_bytes, "article_url": article_url, "pdf_link": pdf_link})
+        entry = articleindex.find(fingerprint)
+        if entry is not None:
+            for level, message in entry["messages"]:
+                job.report(level, message)
+            return {"record": entry["record"], "dates": entry["record"].dates, "fingerprint": fingerprint,
+                    "indexed": True}
+    with job.stage("scrape"):
+        work = crossref.lookup(crossref.row_doi({"article_xml": xml_bytes})) if crossref.enabled() else None
+        page = scrape_article_page(article_url) if crossref.needs_page(work) else None
+    with job.stage("record"):
+        article_record = extract_record(xml_bytes, article_url, pdf_link, job.report, page=page, work=work)
+    with job.stage("pdf_history"):
+        dates = extract_history_from_pdf(pdf_bytes, job.report)
+    return {"record": article_record, "dates": dates, "fingerprint": fingerprint, "indexed": False}
+
+def process_files(pdf_file, input_xml, article_url, pdf_link):
+    pdf_bytes, xml_bytes = pdf_file.getvalue(), input_xml.getvalue()
+    try:
+        job_id = get_queue().submit(
+            "article", article_job, pdf_bytes, xml_bytes, article_url, pdf_link,
+            key=input_key("article", pdf_bytes, xml_bytes, article_url, pdf_link),
+            stages=("scrape", "record", "pdf_history")
+        )
+    except jobs.QueueFull as e:
+        st.error(str(e))
+        return
+    st.session_state.job_id = job_id
+    st.session_state.rendered_job = None
+    st.session_state.index_warnings = []
+    st.session_state.processed_xml = None
+    st.session_state.final_combined_xml = None
+    st.session_state.show_combine_section = False
+    st.query_params["job"] = job_id
+
+def select_dates():
+    # Date input section with dropdowns; None until every field is chosen
+    with st.container():
+        st.markdown("### Required Date Information")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Received date dropdowns
+            st.markdown("**Received Date**")
+            r_col1, r_col2, r_col3 = st.columns(3)
+            r_day = r_col1.selectbox("Day", [""] + list(range(1, 32)), index=0, key="received_day")
+            r_month = r_col2.selectbox("Month", [""] + [
+                "January", "February", "March", "April", "May", "June",
+                "July", "August", "September", "October", "November", "December"
+            ], index=0, key="received_month")
+            # Static year range that automatically includes current year
+            r_year = r_col3.selectbox("Year", [""] + list(range(1980, datetime.now().year + 1)), 
+                             index=0, key="received_year")
+        
+        with col2:
+            # Accepted date dropdowns
+            st.markdown("**Accepted Date**")
+            a_col1, a_col2, a_col3 = st.columns(3)
+            a_day = a_col1.selectbox("Day", [""] + list(range(1, 32)), index=0, key="accepted_day")
+            a_month = a_col2.selectbox("Month", [""] + [
+                "January", "February", "March", "April", "May", "June",
+                "July", "August", "September", "October", "November", "December"
+            ], index=0, key="accepted_month")
+            a_year = a_col3.selectbox("Year", [""] + list(range(1980, datetime.now().year + 1)),
+                             index=0, key="accepted_year")
+        
+        # Only proceed if all date fields are selected
+        if not all([r_day, r_month, r_year, a_day, a_month, a_year]):
+            return None
+        
+        # Format the selected dates
+        received_date_str = f"{r_day} {r_month} {r_year}"
+        accepted_date_str = f"{a_day} {a_month} {a_year}"
+        
+        return (
+            parse_date(received_date_str),
+            parse_date(accepted_date_str)
+        )
+
+def show_article_job():
+    """Progress of the submitted article, or its result; True while it is still running"""
+    job = get_queue().get(st.session_state.job_id)
+    if job is None:
+        st.warning("That job has expired or could not be found. Please submit the files again.")
+        forget_job("job_id", "job")
+        return False
+    if job["status"] in (jobs.QUEUED, jobs.RUNNING):
+        show_job_progress(job)
+        return True
+    if job["status"] == jobs.FAILED:
+        st.error(f"An error occurred during processing: {job['error']}")
+        return False
+    
+    try:
+        show_messages(job["messages"])
+        result = get_queue().result(job["id"])
+        article_record, dates = result["record"], result["dates"]
+        st.session_state.filename = article_record.filename
+        
+        # If dates not found in PDF or invalid, show dropdown selectors
+        if not has_history_dates(dates):
+            st.warning("Could not automatically extract valid dates from PDF. Please select them below:")
+            dates = select_dates()
+            if dates is None:
+                return False
+        elif result.get("indexed"):
+            st.success("✓ Reused the indexed record of these files")
+        else:
+            st.success("✓ Automatically extracted valid dates from PDF")
+        
+        # Render the processed XML from the record, once per job and dates
+        if st.session_state.rendered_job != (job["id"], dates):
+            with metrics.recording() as recorder:
+                article_record.dates = dates
+                xml_str = render_article_xml(article_record)
+            if job["metrics"]:
+                recorder.merge(job["metrics"])
+            record_performance(recorder)
+            
+            get_store().put(st.session_state.artifact_session, "processed.xml", xml_str)
+            get_store().drop(st.session_state.artifact_session, "combined.xml")
+            st.session_state.validation = {"processed": validate.validate_bytes(xml_str, "processed", article_record.filename)}
+            st.session_state.article_record = article_record
+            st.session_state.processed_xml = "processed.xml"
+            st.session_state.final_combined_xml = None
+            st.session_state.show_combine_section = True
+            st.session_state.rendered_job = (job["id"], dates)
+            if articleindex.enabled():
+                st.session_state.index_warnings = articleindex.add(
+                    article_record, result.get("fingerprint"),
+                    messages=job["messages"]
+                )
+        
+        show_messages(st.session_state.index_warnings)
+        
+        # Only show success messages after processing completes
+        st.success("✓ Dates selected successfully")
+        st.success("Initial XML processing complete! You can now combine with template XML.")
+        
+        show_preview("Preview Processed XML Output", st.session_state.processed_xml, "processed_preview_part")
+    
+    except Exception as e:
+        st.error(f"An error occurred during processing: {str(e)}")
+    return False
+
+def combine_with_template(template_file):
+    with metrics.recording() as recorder:
+        _combine_with_template(template_file)
+    record_performance(recorder, keep_previous=True)
+
+def _combine_with_template(template_file):
+    try:
+        with st.spinner("Combining with template..."):
+            front_xml = render_front(st.session_state.article_record)
+            combined_content = template.splice_bytes(template_file.getvalue(), front_xml)
+            get_store().put(st.session_state.artifact_session, "combined.xml", combined_content)
+            st.session_state.validation["combined"] = validate.validate_bytes(
+                combined_content, "combined", st.session_state.filename
+            )
+            
+            st.session_state.final_combined_xml = "combined.xml"
+            st.success("XML successfully combined with template!")
+    except ValueError as e:
+        st.error(str(e))
+    except Exception as e:
+        st.error(f"Error combining with template: {str(e)}")
+
+def issue_job(job, articleset_bytes, pdfs, mapping_bytes, template_bytes, toc_url):
+    # Runs on the worker pool: no Streamlit calls in here
+    problems = []
+    if toc_url:
+        # Article pages and PDFs come from the issue's table of contents instead of uploads
+        with job.stage("harvest"):
+            mapping, problems = harvest.harvest_issue(toc_url)
+            pdfs, download_problems = harvest.download_pdfs(mapping)
+            problems += download_problems
+            mapping = [row for row in mapping if row["pdf"] in pdfs]
+    else:
+        mapping = articleset.parse_mapping(io.StringIO(mapping_bytes.decode("utf-8")))
+    
+    matcher = articleset.Matcher(mapping)
+    with job.stage("scrape"):
+        # Articles whose inputs are in the article index are rendered from their stored records
+        indexed = [find_indexed(row, pdfs) for row in articleset.iter_matched(
+            io.BytesIO(articleset_bytes), articleset.Matcher(mapping))] if articleindex.enabled() else []
+        needed = {row["article_url"] for row, _, entry in indexed if entry is None}
+        mapping_needed = [row for row in mapping if not indexed or row["article_url"] in needed]
+        # With a metadata endpoint, pages are only scraped for what the metadata lacks
+        works = crossref.lookup_many(row.get("doi") for row in mapping_needed) if crossref.enabled() else {}
+        pages = scrape_all([
+            row["article_url"] for row in mapping_needed
+            if crossref.needs_page(works.get(crossref.normalize_doi(row.get("doi"))))
+        ])
+    
+    # Every output goes straight into the job's ZIP archive; only a summary stays in memory
+    template_path = None
+    if template_bytes is not None:
+        template_path = job.directory / "template.xml"
+        template_path.write_bytes(template_bytes)
+    package = archive.ArchiveWriter(job.directory / "issue.zip")
+    results = []
+    for row in articleset.iter_matched(io.BytesIO(articleset_bytes), matcher):
+        messages = []
+        files = []
+        result = {"pdf": row["pdf"], "filename": None, "error": None, "messages": messages, "validation": []}
+        try:
+            if row["pdf"] not in pdfs:
+                raise ValueError(f"PDF {row['pdf']} was not uploaded")
+            fingerprint, entry = indexed[len(results)][1:] if indexed else (None, None)
+            if entry is not None:
+                article_record = entry["record"]
+                messages.extend(entry["messages"])
+            else:
+                fallback_dates = None
+                if row.get("received") and row.get("accepted"):
+                    fallback_dates = (parse_date(row["received"]), parse_date(row["accepted"]))
+                article_record, _ = process_article(
+                    pdfs[row["pdf"]], row["article_xml"], row["article_url"], row.get("pdf_link", ""),
+                    fallback_dates, lambda level, message: messages.append((level, message)),
+                    page=pages.get(row["article_url"]), work=works.get(crossref.row_doi(row))
+                )
+            if articleindex.enabled():
+                messages.extend(articleindex.add(article_record, fingerprint, row["pdf"], messages=messages))
+            result["filename"] = article_record.filename
+            processed_xml = render_article_xml(article_record)
+            result["validation"].append(validate.validate_bytes(processed_xml, "processed", article_record.filename))
+            files.append(package.write("processed", article_record.filename, processed_xml))
+            if template_path is not None:
+                # Spliced to a scratch file so it can be validated before it is archived
+                combined_path = job.directory / "combined.xml"
+                with open(combined_path, "wb") as out:
+                    template.write_spliced(template_path, render_front(article_record), out)
+                result["validation"].append(validate.validate_file(combined_path, "combined"))
+                files.append(package.write("combined", article_record.filename, combined_path))
+                combined_path.unlink()
+            for entry, report in zip(files, result["validation"]):
+                entry["valid"], entry["validation_errors"] = report["valid"], report["errors"]
+        except Exception as e:
+            result["error"] = str(e)
+        package.add_article(row["pdf"], result["filename"], files, result["error"], messages, row=len(results) + 1)
+        results.append(result)
+        job.advance("articles", len(results))
+    package.close()
+    job.advance("articles", len(results), len(results))
+    
+    unmatched = (
+        [f"Not harvested: {problem}" for problem in problems] +
+        [f"Article {a} has no mapping row" for a in matcher.unmatched_articles] +
+        [f"Mapping row for {row['pdf']} matches no article" for row in matcher.unmatched_rows]
+    )
+    return {"results": results, "unmatched": unmatched, "archive": str(package.path)}
+
+def find_indexed(row, pdfs):
+    """(row, fingerprint, article index entry or None) for a matched issue row"""
+    if row["pdf"] not in pdfs:
+        return row, None, None
+    fingerprint = articleindex.fingerprint(dict(row, pdf=pdfs[row["pdf"]]))
+    return row, fingerprint, articleindex.find(fingerprint)
+
+def process_issue(articleset_file, pdf_files, mapping_file, template_file=None, toc_url=""):
+    articleset_bytes = articleset_file.getvalue()
+    pdfs = {} if toc_url else {f.name: f.getvalue() for f in pdf_files}
+    mapping_bytes = b"" if toc_url else mapping_file.getvalue()
+    template_bytes = template_file.getvalue() if template_file is not None else None
+    key = input_key("issue", articleset_bytes, mapping_bytes, template_bytes or b"", toc_url,
+                    *[part for name in sorted(pdfs) for part in (name, pdfs[name])])
+    try:
+        job_id = get_queue().submit(
+            "issue", issue_job, articleset_bytes, pdfs, mapping_bytes, template_bytes, toc_url,
+            key=key, stages=("harvest", "scrape", "articles") if toc_url else ("scrape", "articles")
+        )
+    except jobs.QueueFull as e:
+        st.error(str(e))
+        return
+    st.session_state.issue_job_id = job_id
+    st.session_state.issue_results = None
+    st.session_state.issue_unmatched = []
+    st.query_params["issue_job"] = job_id
+
+def show_issue_job():
+    """Progress of the submitted issue, or its results; True while it is still running"""
+    job = get_queue().get(st.session_state.issue_job_id)
+    if job is None:
+        st.warning("That issue job has expired or could not be found. Please submit the issue again.")
+        forget_job("issue_job_id", "issue_job")
+        return False
+    if job["status"] in (jobs.QUEUED, jobs.RUNNING):
+        show_job_progress(job)
+        return True
+    if job["status"] == jobs.FAILED:
+        st.error(f"An error occurred while processing the issue: {job['error']}")
+        return False
+    if st.session_state.issue_results is None:
+        result = get_queue().result(job["id"])
+        st.session_state.issue_results = result["results"]
+        st.session_state.issue_unmatched = result["unmatched"]
+        st.session_state.issue_archive = result["archive"]
+    return False
+
+def show_issue_results():
+    results = st.session_state.issue_results
+    succeeded = sum(1 for r in results if r["error"] is None)
+    st.success(f"{succeeded} of {len(results)} articles processed")
+    for note in st.session_state.issue_unmatched:
+        st.warning(note)
+    for result in results:
+        if result["error"] is not None:
+            st.error(f"{result['pdf']}: {result['error']}")
+            continue
+        st.markdown(f"**{result['filename']}**")
+        show_messages(result["messages"])
+        for report in result["validation"]:
+            if not report["valid"]:
+                show_validation(report, f"{report['kind'].capitalize()} XML")
+    
+    # One archive with every processed and combined XML plus manifest.json
+    try:
+        with open(st.session_state.issue_archive, "rb") as archive_file:
+            st.download_button("Download All (ZIP)", archive_file, file_name="issue_xml.zip",
+                               mime="application/zip", key="issue_archive_download")
+    except OSError:
+        st.warning("The issue archive has expired. Please process the issue again.")
+
+def markdown_table(rows):
+    # Plain markdown keeps the expander free of the dataframe stack
+    header = list(rows[0])
+    lines = ["| " + " | ".join(header) + " |", "|" + " --- |" * len(header)]
+    lines += ["| " + " | ".join(str(row[k]) for k in header) + " |" for row in rows]
+    return "\n".join(lines)
+
+def show_performance():
+    snapshot = st.session_state.performance
+    with st.expander("Performance"):
+        stages = metrics.stage_table(snapshot)
+        if stages:
+            st.markdown("**Stage timings**")
+            st.markdown(markdown_table(stages))
+        counters = metrics.counter_table(snapshot)
+        if counters:
+            st.markdown("**Counters**")
+            st.markdown(markdown_table(counters))
+        st.download_button("Download Prometheus metrics", metrics.prometheus_text(snapshot),
+                           file_name="xmlgen_metrics.prom", mime="text/plain", key="performance_download")
+
+def main():
+    st.title("Journal Article XML Generator")
+    st.markdown('<div style="font-size:18px;margin-bottom:10px; font-weight:600">This tool creates JATS XML by merging metadata from the article PDF and web input with back-section content from Vertopal.</div>', unsafe_allow_html=True)
+    
+    # Main XML Processing Form
+    st.markdown("---")
+    reset_key = st.session_state.reset_counter
+    forget_expired_artifacts()
+    
+    with st.form("input_form"):
+        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:10px;">Upload PDF File</div>', unsafe_allow_html=True)
+        pdf_file = st.file_uploader(
+            " ",
+            type=['pdf'], 
+            help="Upload the article PDF file",
+            key=f"pdf_uploader_{reset_key}",
+            label_visibility="collapsed"
+        )
+        
+        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:10px;">Upload Input XML File</div>', unsafe_allow_html=True)
+        input_xml = st.file_uploader(
+            " ",
+            type=['xml'], 
+            help="Upload the original XML metadata file",
+            key=f"xml_uploader_{reset_key}",
+            label_visibility="collapsed"
+        )
+        
+        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:-30px;">Article URL</div>', unsafe_allow_html=True)
+        article_url = st.text_input(
+            label=" ",
+            help="Enter the URL of the article webpage", 
+            key=f"article_url_{reset_key}",
+            value=""
+        )
+
+        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:-30px;">PDF Link</div>', unsafe_allow_html=True)
+        pdf_link = st.text_input(
+            label=" ", 
+            help="Enter the direct URL to the PDF file", 
+            key=f"pdf_link_{reset_key}",
+            value=""
+        )
+        
+        st.write("")
+        
+        col1, col2 = st.columns([1, 4])
+        with col1:
+            reset_button = st.form_submit_button("Reset", type="secondary")
+        with col2:
+            submit_button = st.form_submit_button("Generate XML", type="primary")
+
+        if reset_button:
+            clear_form()
+            st.rerun()
+            
+        if submit_button:
+            if not all([pdf_file, input_xml, article_url]):
+                st.warning("Please provide all required files and URLs")
+            else:
+                process_files(pdf_file, input_xml, article_url, pdf_link)
+    
+    waiting = False
+    if st.session_state.job_id:
+        waiting = show_article_job()
+    
+    if st.session_state.show_combine_section:
+        st.markdown("---")
+        st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:10px;">Combine with Template XML</div>', unsafe_allow_html=True)
+        
+        with st.form("template_form"):
+            template_file = st.file_uploader(
+                "Upload Template XML",
+                type=['xml'],
+                help="Upload the template XML file to combine with (must contain <front> section)",
+                key=f"template_uploader_{reset_key}"
+            )
+            
+            combine_button = st.form_submit_button("Combine with Template")
+            
+            if combine_button:
+                if template_file is None:
+                    st.warning("Please upload a template XML file")
+                else:
+                    combine_with_template(template_file)
+    
+    if st.session_state.final_combined_xml:
+        show_preview("Preview Combined XML Output", st.session_state.final_combined_xml, "combined_preview_part")
+    
+    for kind, label in (("processed", "Processed XML"), ("combined", "Combined XML")):
+        if kind in st.session_state.validation:
+            show_validation(st.session_state.validation[kind], label)
+    
+    if st.session_state.processed_xml:
+        show_download("Processed XML", st.session_state.processed_xml, "processed_download")
+    
+    if st.session_state.final_combined_xml:
+        show_download("Combined XML", st.session_state.final_combined_xml, "combined_download")
+    
+    if st.session_state.performance:
+        show_performance()
+    
+    # Whole-issue processing from an ArticleSet XML
+    st.markdown("---")
+    st.markdown('<div style="font-size:25px; font-weight:600; margin-bottom:10px;">Process a Whole Issue</div>', unsafe_allow_html=True)
+    
+    with st.form("issue_form"):
+        articleset_file = st.file_uploader(
+            "Upload ArticleSet XML",
+            type=['xml'],
+            help="Input XML holding every Article of the issue",
+            key=f"articleset_uploader_{reset_key}"
+        )
+        issue_pdfs = st.file_uploader(
+            "Upload Article PDFs",
+            type=['pdf'],
+            accept_multiple_files=True,
+            help="One PDF per article, named as in the mapping CSV",
+            key=f"issue_pdf_uploader_{reset_key}"
+        )
+        mapping_file = st.file_uploader(
+            "Upload Mapping CSV",
+            type=['csv'],
+            help="Columns: doi and/or first_page, pdf, article_url, pdf_link[, received, accepted]",
+            key=f"mapping_uploader_{reset_key}"
+        )
+        toc_url = st.text_input(
+            "Or Issue TOC URL",
+            help="Instead of PDFs and a mapping CSV: find every article page and PDF from the issue's table of contents",
+            key=f"issue_toc_url_{reset_key}"
+        )
+        issue_template = st.file_uploader(
+            "Upload Template XML (optional)",
+            type=['xml'],
+            help="Template to combine every article with (must contain <front> section)",
+            key=f"issue_template_uploader_{reset_key}"
+        )
+        
+        issue_button = st.form_submit_button("Generate Issue XML", type="primary")
+        
+        if issue_button:
+            if not articleset_file or not (toc_url or (issue_pdfs and mapping_file)):
+                st.warning("Please provide the ArticleSet XML, and either the issue TOC URL or the PDFs and the mapping CSV")
+            else:
+                process_issue(articleset_file, issue_pdfs, mapping_file, issue_template, toc_url.strip())
+    
+    if st.session_state.issue_job_id:
+        waiting = show_issue_job() or waiting
+    
+    if st.session_state.issue_results:
+        show_issue_results()
+    
+    if st.session_state.show_success:
+        st.success("All inputs have been cleared!")
+        st.session_state.show_success = False
+    
+    # Poll while a job is queued or running
+    if waiting:
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+
+if __name__ == "__main__":
+    main()
+
+
+
+
+
+
@@ -0,0 +1,39 @@
+"""Fixtures shared by the tests: a small benchmark corpus served by ``benchmarks/server.py``.
+
+Every test gets its own cache directory, and retries are off so a request to a
+stopped server fails at once.
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import corpus  # noqa: E402
+import server  # noqa: E402
+from xmlgen import fetch  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    path = tmp_path / "cache"
+    fetch.configure(cache_dir=str(path), use_cache=True, ttl=24 * 3600, retries=0)
+    return path
+
+
+@pytest.fixture
+def site(tmp_path):
+    """Yields (stand-in server, corpus directory, expected layouts) for a six-article corpus
+
+    The server also answers Crossref ``/works`` queries from the corpus's ``works.json``.
+    """
+    out = tmp_path / "corpus"
+    (out / "site").mkdir(parents=True)
+    with server.serve(out / "site") as stand_in:
+        expected = corpus.generate(out, articles=6, page_counts=(1, 5), base_url=stand_in.base_url, template_kib=4)
+        stand_in.works = server.works_by_doi(json.loads((out / "works.json").read_text(encoding="utf-8")))
+        yield stand_in, out, expected
@@ -0,0 +1,81 @@
+import filecmp
+
+import pytest
+
+import corpus
+import server
+from xmlgen import batch, crossref
+
+
+@pytest.fixture
+def metadata(site, cache_dir):
+    """Points ``crossref`` at the stand-in server; yields (server, corpus directory, {DOI: article number})"""
+    stand_in, out, expected = site
+    crossref.configure(enabled=True, endpoint=stand_in.base_url, cache_dir=str(cache_dir), use_cache=True,
+                       batch_size=2, concurrency=2)
+    dois = {corpus.doi_for(n): n for n in expected if corpus.XML_VARIANTS[expected[n]["xml_variant"]][3]}
+    yield stand_in, out, dois
+    crossref.configure(enabled=False, endpoint=crossref.DEFAULT_ENDPOINT)
+
+
+@pytest.fixture
+def down_endpoint(tmp_path):
+    """The base URL of a server that has been stopped"""
+    with server.serve(tmp_path) as stopped:
+        pass
+    return stopped.base_url
+
+
+def test_lookup_many_asks_for_dois_in_batches(metadata):
+    stand_in, _, dois = metadata
+    assert len(dois) == 5
+    works = crossref.lookup_many([doi.upper() for doi in dois] + ["10.1000/unknown"])
+    assert stand_in.stats["requests"] == 3  # Six DOIs, two per request
+    assert works == {
+        doi: crossref.Work(doi, ("2023", "09", f"{n % 28 + 1:02d}"), "2", "2", 10 * n + 1, 10 * n + 1)
+        for doi, n in dois.items()
+    }
+    # Known and unknown DOIs alike are answered from the cache now
+    assert crossref.lookup_many(list(dois) + ["10.1000/unknown"]) == works
+    assert stand_in.stats["requests"] == 3
+
+
+def test_single_doi_is_looked_up_by_path(metadata):
+    stand_in, _, dois = metadata
+    doi = next(iter(dois))
+    assert crossref.lookup(f"https://doi.org/{doi}").doi == doi
+    assert crossref.lookup("10.1000/unknown") is None  # 404: known to be missing
+    assert crossref.lookup("10.1000/unknown") is None
+    assert stand_in.stats["requests"] == 2
+
+
+def test_lookup_when_the_endpoint_is_down(metadata, down_endpoint):
+    stand_in, _, dois = metadata
+    crossref.configure(endpoint=down_endpoint)
+    assert crossref.lookup_many(list(dois)) == {}
+    # A failure isn't cached: the DOIs are asked for again once the endpoint is back
+    crossref.configure(endpoint=stand_in.base_url)
+    assert len(crossref.lookup_many(list(dois))) == 5
+    assert stand_in.stats["requests"] == 3
+
+
+def run(out, tmp_path, name, metadata_options):
+    rows = batch.read_manifest(out / "manifest.csv")
+    results = batch.run_batch(rows, tmp_path / name, workers=2, template_path=str(out / "template.xml"),
+                              fetch_options={"cache_dir": str(tmp_path / name / "cache"), "retries": 0},
+                              metadata_options=metadata_options)
+    assert all(result["ok"] for result in results)
+    return [result["filename"] for result in results]
+
+
+def test_batch_falls_back_to_scraping_when_the_endpoint_is_down(metadata, down_endpoint, tmp_path):
+    stand_in, out, _ = metadata
+    cache = str(tmp_path / "metadata")
+    filenames = run(out, tmp_path, "scraped", {"enabled": False})
+    assert run(out, tmp_path, "down", {"enabled": True, "endpoint": down_endpoint, "cache_dir": cache}) == filenames
+    _, mismatch, errors = filecmp.cmpfiles(tmp_path / "scraped", tmp_path / "down", filenames, shallow=False)
+    assert (mismatch, errors) == ([], [])
+
+    assert run(out, tmp_path, "metadata", {"enabled": True, "endpoint": stand_in.base_url, "cache_dir": cache}) == filenames
+    first = (tmp_path / "metadata" / filenames[0]).read_text(encoding="utf-8")
+    assert "<Month>09</Month>" in first and "<Day>02</Day>" in first
@@ -0,0 +1,110 @@
+import json
+import os
+
+import pytest
+
+import server
+from xmlgen import fetch, scrape
+
+
+def article(site, n=1):
+    stand_in, out, _ = site
+    return f"{stand_in.base_url}/article/view/{1000 + n}", out / "site" / "article" / "view" / str(1000 + n)
+
+
+def test_fetch_serves_fresh_entries_without_the_network(site):
+    url, path = article(site)
+    stand_in = site[0]
+    first = fetch.fetch(url)
+    assert (first.status_code, first.from_cache, first.content) == (200, False, path.read_bytes())
+    fetch.configure()  # Drops the memory cache, so the next answer comes from disk
+    second = fetch.fetch(url)
+    assert (second.from_cache, second.content) == (True, first.content)
+    assert stand_in.stats["requests"] == 1
+
+
+@pytest.mark.parametrize("etags", [True, False], ids=["etag", "last-modified"])
+def test_stale_entry_is_revalidated_and_reused_on_304(tmp_path, etags):
+    site_dir = tmp_path / "site"
+    site_dir.mkdir()
+    (site_dir / "page.html").write_bytes(b"<html><head></head><body>unchanged</body></html>")
+    with server.serve(site_dir, etags=etags) as stand_in:
+        url = f"{stand_in.base_url}/page.html"
+        fetch.fetch(url)
+        body_bytes = stand_in.stats["bytes_sent"]
+        fetch.configure(ttl=0)
+        result = fetch.fetch(url)
+    assert (result.status_code, result.from_cache) == (200, True)
+    assert result.content == b"<html><head></head><body>unchanged</body></html>"
+    assert stand_in.stats == {"requests": 2, "bytes_sent": body_bytes}
+
+
+def test_stale_entry_that_changed_is_downloaded_again(tmp_path, cache_dir):
+    site_dir = tmp_path / "site"
+    site_dir.mkdir()
+    page = site_dir / "page.html"
+    page.write_bytes(b"old")
+    with server.serve(site_dir) as stand_in:
+        url = f"{stand_in.base_url}/page.html"
+        fetch.fetch(url)
+        page.write_bytes(b"new body")
+        os.utime(page, (page.stat().st_atime + 10, page.stat().st_mtime + 10))
+        fetch.configure(ttl=0)
+        result = fetch.fetch(url)
+        fetch.configure(ttl=3600)
+        cached = fetch.fetch(url)
+    assert (result.from_cache, result.content) == (False, b"new body")
+    assert (cached.from_cache, cached.content) == (True, b"new body")
+    assert stand_in.stats["requests"] == 2
+
+
+def test_fetch_until_stops_early_and_caches_the_prefix(site, cache_dir):
+    url, path = article(site)
+    stand_in = site[0]
+    result, scanner = fetch.fetch_until(url, scrape.PageScanner, chunk_size=1024)
+    assert scanner.done and not result.complete
+    assert 0 < len(result.content) < path.stat().st_size
+    assert path.read_bytes().startswith(result.content)
+    assert scanner.citation["citation_pdf_url"] == [f"{stand_in.base_url}/article/download/1001/1"]
+    meta = [json.loads(p.read_text()) for p in (cache_dir / "http").glob("*.json")]
+    assert [m["complete"] for m in meta] == [False]
+
+    # The prefix answers another scan, from memory and from disk
+    for _ in range(2):
+        again, scanner = fetch.fetch_until(url, scrape.PageScanner)
+        assert again.from_cache and scanner.done
+        fetch.configure()
+    assert stand_in.stats["requests"] == 1
+
+
+def test_partial_entry_never_answers_a_full_fetch(site):
+    url, path = article(site)
+    stand_in = site[0]
+    fetch.fetch_until(url, scrape.PageScanner, chunk_size=1024)
+    full = fetch.fetch(url)
+    assert (full.from_cache, full.complete, full.content) == (False, True, path.read_bytes())
+    # The complete body replaces the prefix and finishes scans that need more than it held
+    result, scanner = fetch.fetch_until(url, Collector)
+    assert result.from_cache and scanner.data == full.content
+    assert stand_in.stats["requests"] == 2
+
+
+def test_stale_partial_entry_is_downloaded_again(site):
+    url, path = article(site)
+    stand_in = site[0]
+    fetch.fetch_until(url, scrape.PageScanner, chunk_size=1024)
+    fetch.configure(ttl=0)
+    result, scanner = fetch.fetch_until(url, Collector)
+    assert (result.from_cache, result.complete, scanner.data) == (False, True, path.read_bytes())
+    assert stand_in.stats["requests"] == 2
+
+
+class Collector:
+    """A scanner that needs the whole body"""
+
+    def __init__(self):
+        self.data = b""
+
+    def feed(self, chunk):
+        self.data += chunk
+        return False
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import corpus
+from xmlgen import harvest
+
+
+def test_harvest_issue_reads_every_article_page(site):
+    stand_in, out, expected = site
+    rows, problems = harvest.harvest_issue(f"{stand_in.base_url}/issue/view/1")
+    assert problems == []
+    assert rows == [{
+        "doi": corpus.doi_for(n) if corpus.XML_VARIANTS[expected[n]["xml_variant"]][3] else "",
+        "first_page": str(10 * n + 1),
+        "pdf": f"{1000 + n}.pdf",
+        "article_url": f"{stand_in.base_url}/article/view/{1000 + n}",
+        "pdf_link": f"{stand_in.base_url}/article/download/{1000 + n}/1",
+    } for n in expected]
+
+
+def test_galley_view_link_is_rewritten_to_its_download_link(site):
+    stand_in, out, _ = site
+    # Without citation_pdf_url the TOC's galley link (.../article/view/1002/1) is all there is
+    page = out / "site" / "article" / "view" / "1002"
+    page.write_text("\n".join(line for line in page.read_text(encoding="utf-8").splitlines()
+                              if "citation_pdf_url" not in line), encoding="utf-8")
+    assert 'href="/article/view/1002/1"' in (out / "site" / "issue" / "view" / "1").read_text(encoding="utf-8")
+    rows, problems = harvest.harvest_issue(f"{stand_in.base_url}/issue/view/1")
+    assert problems == []
+    assert rows[1]["pdf_link"] == f"{stand_in.base_url}/article/download/1002/1"
+
+
+def test_article_without_a_pdf_is_reported(site):
+    stand_in, out, _ = site
+    page = out / "site" / "article" / "view" / "1003"
+    page.write_text(page.read_text(encoding="utf-8").replace("citation_pdf_url", "citation_other"), encoding="utf-8")
+    toc = out / "site" / "issue" / "view" / "1"
+    toc.write_text(toc.read_text(encoding="utf-8").replace(
+        '<a class="obj_galley_link pdf" href="/article/view/1003/1">PDF</a>', ""), encoding="utf-8")
+    rows, problems = harvest.harvest_issue(f"{stand_in.base_url}/issue/view/1")
+    assert [row["pdf"] for row in rows] == ["1001.pdf", "1002.pdf", "1004.pdf", "1005.pdf", "1006.pdf"]
+    assert problems == [f"{stand_in.base_url}/article/view/1003: no PDF galley found"]
+
+
+def test_parse_toc_prefers_the_pdf_galley():
+    toc = """<a href="/index.php/j/article/view/7">Title</a>
+    <a class="obj_galley_link file" href="/index.php/j/article/view/7/30">HTML</a>
+    <a class="obj_galley_link pdf" href="/index.php/j/article/view/7/31?x=1">PDF</a>
+    <a class="obj_galley_link" href="https://site/index.php/j/article/view/8/40">Full text (PDF)</a>"""
+    assert harvest.parse_toc("https://site/index.php/j/issue/view/2", toc) == [
+        ("https://site/index.php/j/article/view/7", "https://site/index.php/j/article/view/7/31"),
+        ("https://site/index.php/j/article/view/8", "https://site/index.php/j/article/view/8/40"),
+    ]
+
+
+def test_download_pdfs_saves_each_row_under_its_name(site, tmp_path):
+    stand_in, out, _ = site
+    rows, _ = harvest.harvest_issue(f"{stand_in.base_url}/issue/view/1")
+    pdfs, problems = harvest.download_pdfs(rows, tmp_path / "pdfs")
+    assert problems == []
+    assert sorted(pdfs) == [row["pdf"] for row in rows]
+    for n in range(1, 7):
+        assert (tmp_path / "pdfs" / f"{1000 + n}.pdf").read_bytes() == (out / "pdfs" / f"{n}.pdf").read_bytes()
+
+
+def test_rows_sharing_a_link_each_get_the_pdf(site, tmp_path):
+    stand_in, out, _ = site
+    link = f"{stand_in.base_url}/article/download/1001/1"
+    rows = [{"pdf": "a.pdf", "pdf_link": link}, {"pdf": "b.pdf", "pdf_link": link},
+            {"pdf": "c.pdf", "pdf_link": f"{stand_in.base_url}/article/download/missing/1"}]
+    for dest_dir in (None, tmp_path / "pdfs"):
+        requests = stand_in.stats["requests"]
+        pdfs, problems = harvest.download_pdfs(rows, dest_dir)
+        assert stand_in.stats["requests"] - requests == 2
+        contents = {name: value if dest_dir is None else Path(value).read_bytes() for name, value in pdfs.items()}
+        assert contents == {"a.pdf": (out / "pdfs" / "1.pdf").read_bytes(), "b.pdf": (out / "pdfs" / "1.pdf").read_bytes()}
+        assert problems[0] == f"a.pdf, b.pdf: share the PDF link {link}"
+        assert problems[1].startswith("c.pdf: could not download")
@@ -0,0 +1 @@
+"""Journal Article XML Generator core, shared by the Streamlit app and the command line."""
@@ -0,0 +1,360 @@
+"""Command line entry point: ``python -m xmlgen <command> ...``"""
+import argparse
+import sys
+
+
+def pipeline_options(args):
+    """Keyword arguments shared by ``batch.run_batch`` and ``watch.Watcher``"""
+    return {
+        "template_path": args.template,
+        "fetch_options": {"cache_dir": args.cache_dir, "ttl": args.http_ttl, "use_cache": not args.no_http_cache},
+        "pdf_cache_options": {"cache_dir": args.cache_dir, "enabled": not args.no_pdf_cache},
+        "page_budget": args.page_budget,
+        "validate_options": {"enabled": not args.no_validate, "combined_schema": args.schema,
+                             "processed_schema": args.processed_schema},
+        "metadata_options": {"enabled": True if args.metadata is not None else None,
+                             "endpoint": args.metadata or None,
+                             "cache_dir": args.cache_dir, "use_cache": not args.no_http_cache,
+                             "scrape_keywords": False if args.no_keyword_scrape else None},
+    }
+
+
+def run_options(args):
+    """Keyword arguments for ``batch.run_batch`` from the shared run options"""
+    return {
+        "workers": args.workers,
+        "per_host": args.per_host,
+        "delay": args.delay,
+        "archive_path": args.zip,
+        "incremental_run": args.incremental,
+        "index_options": {"enabled": True if args.index is not None else None, "path": args.index or None,
+                          "cache_dir": args.cache_dir},
+        **pipeline_options(args),
+    }
+
+
+def cmd_batch(args):
+    from xmlgen import batch
+
+    rows = batch.read_manifest(args.manifest)
+    results = batch.run_batch(rows, args.out, **run_options(args))
+    print(batch.format_summary(results))
+    if args.zip:
+        print(f"Archive written to {args.zip}")
+    return 0 if all(batch.passed(r) for r in results) else 1
+
+
+def run_issue(articleset_path, mapping, args):
+    """Process the ArticleSet against mapping rows and print the summary; True when nothing failed"""
+    from xmlgen import articleset, batch
+
+    matcher = articleset.Matcher(mapping)
+    with open(articleset_path, "rb") as source:
+        rows = articleset.iter_matched(source, matcher)
+        results = batch.run_batch(rows, args.out, urls=[row["article_url"] for row in mapping],
+                                  url_dois=[(row["article_url"], row.get("doi")) for row in mapping],
+                                  **run_options(args))
+    print(batch.format_summary(results))
+    if args.zip:
+        print(f"Archive written to {args.zip}")
+    for article in matcher.unmatched_articles:
+        print(f"UNMATCHED article {article}: no mapping row")
+    for row in matcher.unmatched_rows:
+        print(f"UNMATCHED mapping row {row.get('doi') or row.get('first_page')} ({row['pdf']}): no such article")
+    return all(batch.passed(r) for r in results) and not matcher.unmatched_articles and not matcher.unmatched_rows
+
+
+def cmd_issue(args):
+    from xmlgen import articleset
+
+    return 0 if run_issue(args.articleset, articleset.read_mapping(args.mapping), args) else 1
+
+
+def cmd_harvest(args):
+    from pathlib import Path
+
+    from xmlgen import fetch, harvest
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    fetch.configure(cache_dir=args.cache_dir, ttl=args.http_ttl, use_cache=not args.no_http_cache)
+    rows, problems = harvest.harvest_issue(args.toc_url, per_host=args.per_host, delay=args.delay)
+    pdfs, download_problems = harvest.download_pdfs(rows, out / "pdfs", per_host=args.per_host, delay=args.delay)
+    problems += download_problems
+    rows = [row for row in rows if row["pdf"] in pdfs]
+    # The saved mapping points at the PDFs relative to itself, so it can be re-run with the issue command
+    harvest.write_mapping([dict(row, pdf=f"pdfs/{row['pdf']}") for row in rows], out / "mapping.csv")
+    rows = [dict(row, pdf=pdfs[row["pdf"]]) for row in rows]
+    print(f"Harvested {len(rows)} article(s) from {args.toc_url}; mapping saved to {out / 'mapping.csv'}")
+    for problem in problems:
+        print(f"NOT HARVESTED {problem}")
+    ok = run_issue(args.articleset, rows, args)
+    return 0 if ok and not problems else 1
+
+
+def cmd_pdf_cache(args):
+    from xmlgen import pdfcache
+
+    pdfcache.configure(cache_dir=args.cache_dir)
+    if args.action == "stats":
+        stats = pdfcache.stats()
+        print(f"{stats['entries']} of at most {stats['max_entries']} entries in {stats['path']}")
+    elif args.action == "clear":
+        print(f"Removed {pdfcache.clear()} entries")
+    else:
+        if not args.pdfs:
+            print("invalidate needs at least one PDF", file=sys.stderr)
+            return 2
+        for pdf in args.pdfs:
+            print(f"{pdf}: removed {pdfcache.invalidate(pdfcache.pdf_digest(pdf))} entries")
+    return 0
+
+
+def cmd_index(args):
+    from xmlgen import articleindex, batch
+
+    articleindex.configure(path=args.index, cache_dir=args.cache_dir)
+    if args.action == "issues":
+        for found in articleindex.issues():
+            print(f"{found['journal']} ({found['issn']}) Vol.{found['volume'] or '-'} No.{found['issue'] or '-'}: "
+                  f"{found['articles']} article(s)")
+        return 0
+    if args.action == "duplicates":
+        found = articleindex.duplicates()
+        for column, label in (("doi", "DOI"), ("filename", "FILENAME")):
+            for value, entries in found[column].items():
+                print(f"{label} {value}: {len(entries)} articles")
+                for entry in entries:
+                    where = entry["output"] or entry["source"] or "-"
+                    print(f"        {entry['custom_id']} {entry['doi'] or '-'} {where}")
+        return 1 if found["doi"] or found["filename"] else 0
+    if not (args.journal and args.volume is not None and args.issue is not None):
+        print("rebuild needs --journal, --volume and --issue", file=sys.stderr)
+        return 2
+    entries = articleindex.issue_entries(args.journal, args.volume, args.issue)
+    if not entries:
+        print(f"No indexed articles for {args.journal} Vol.{args.volume} No.{args.issue}", file=sys.stderr)
+        return 1
+    results = batch.rebuild_issue(entries, args.out, args.template, args.zip,
+                                  {"enabled": not args.no_validate, "combined_schema": args.schema})
+    print(batch.format_summary(results))
+    if args.zip:
+        print(f"Archive written to {args.zip}")
+    return 0 if all(batch.passed(r) for r in results) else 1
+
+
+def cmd_validate(args):
+    import json
+
+    from xmlgen import validate
+
+    validate.configure(combined_schema=args.schema if args.kind == "combined" else None,
+                       processed_schema=args.schema if args.kind == "processed" else None)
+    reports = validate.validate_many([(path, args.kind) for path in args.files], workers=args.workers)
+    if args.json:
+        for report in reports:
+            print(json.dumps(report))
+    else:
+        for report in reports:
+            print(validate.format_report(report))
+        invalid = sum(1 for r in reports if not r["valid"])
+        print(f"{len(reports) - invalid} valid, {invalid} invalid, {len(reports)} total")
+    return 0 if all(r["valid"] for r in reports) else 1
+
+
+def cmd_watch(args):
+    import signal
+    import threading
+
+    from xmlgen import watch
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    watcher = watch.Watcher(args.inbox, args.outbox, workers=args.workers, poll=args.poll, settle=args.settle,
+                            log=lambda line: print(line, flush=True), **pipeline_options(args))
+    print(f"Watching {args.inbox} with {args.workers} worker(s); outputs go to {args.outbox}", flush=True)
+    failures = watcher.run(once=args.once, stop=stop)
+    return 0 if not failures else 1
+
+
+def cmd_serve(args):
+    from xmlgen import crossref, fetch, jobs, pdfcache, service, validate
+
+    options = pipeline_options(args)
+    fetch.configure(**options["fetch_options"])
+    pdfcache.configure(**options["pdf_cache_options"])
+    validate.configure(**options["validate_options"])
+    crossref.configure(**options["metadata_options"])
+    queue = jobs.JobQueue(max_concurrent=args.workers, max_queued=args.max_queued, cache_dir=args.cache_dir)
+    api = service.Service(queue, options["template_path"], options["page_budget"], args.max_upload_mb)
+    server = service.make_server(api, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_port} with {queue.max_concurrent} worker(s)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def cmd_check_deps(args):
+    from importlib import metadata
+    from pathlib import Path
+
+    requirements = Path(args.requirements or Path(__file__).resolve().parent.parent / "requirements.txt")
+    problems = 0
+    for line in requirements.read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        name, _, wanted = line.partition("==")
+        try:
+            installed = metadata.version(name.strip())
+        except metadata.PackageNotFoundError:
+            print(f"MISSING {name.strip()}")
+            problems += 1
+            continue
+        if wanted and installed != wanted.strip():
+            print(f"MISMATCH {name.strip()}: {installed} installed, {wanted.strip()} required")
+            problems += 1
+    if problems:
+        print(f"Install the pinned versions with: pip install -r {requirements}")
+        return 1
+    print("All requirements are installed")
+    return 0
+
+
+def add_pipeline_options(p):
+    p.add_argument("--template", default=None, help="Template XML; also writes combined XML to a combined/ subdirectory")
+    p.add_argument("--cache-dir", default=None, help="Cache directory (default: $XMLGEN_CACHE_DIR or ~/.cache/xmlgen)")
+    p.add_argument("--http-ttl", type=float, default=None, help="Seconds a cached article page is used without revalidation")
+    p.add_argument("--no-http-cache", action="store_true", help="Always download article pages")
+    p.add_argument("--page-budget", type=int, default=None, help="Most PDF pages to scan for the history line (default: all)")
+    p.add_argument("--no-pdf-cache", action="store_true", help="Always re-scan PDFs for the history line")
+    p.add_argument("--metadata", nargs="?", const="", default=None, metavar="URL",
+                   help="Look DOIs up in batches at a Crossref-compatible endpoint "
+                        "(default: $XMLGEN_METADATA_URL or api.crossref.org)")
+    p.add_argument("--no-keyword-scrape", action="store_true",
+                   help="With --metadata, scrape article pages only when the metadata has no publication date")
+    p.add_argument("--schema", default=None, help="Local JATS DTD or XSD for the combined outputs (default: $XMLGEN_JATS_SCHEMA)")
+    p.add_argument("--processed-schema", default=None, help="Local DTD or XSD for the processed outputs")
+    p.add_argument("--no-validate", action="store_true", help="Skip the well-formedness and schema checks")
+    p.add_argument("--metrics-json", default=None, help="Append per-stage span events and a summary as JSON lines")
+    p.add_argument("--metrics-prom", default=None, help="Write stage timings and counters in Prometheus text format")
+
+
+def add_run_options(p):
+    p.add_argument("--out", default="output", help="Directory for the generated XML files (default: output)")
+    p.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    p.add_argument("--zip", default=None, help="Also package every output and a manifest into this ZIP archive")
+    p.add_argument("--incremental", action="store_true",
+                   help="Skip articles whose inputs haven't changed since the last --incremental run into --out")
+    p.add_argument("--index", nargs="?", const="", default=None, metavar="PATH",
+                   help="Record every article in a local SQLite index and reuse the records of indexed inputs "
+                        "(default: $XMLGEN_INDEX or <cache dir>/articles.sqlite3)")
+    p.add_argument("--per-host", type=int, default=4, help="Concurrent page downloads per host (default: 4)")
+    p.add_argument("--delay", type=float, default=0.0, help="Minimum seconds between requests to one host")
+    add_pipeline_options(p)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m xmlgen", description="Journal Article XML Generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("batch", help="Process every article listed in a CSV manifest")
+    p.add_argument("manifest", help="CSV with columns pdf, xml, article_url, pdf_link[, received, accepted]")
+    add_run_options(p)
+    p.set_defaults(func=cmd_batch)
+
+    p = commands.add_parser("issue", help="Process every Article of an ArticleSet XML")
+    p.add_argument("articleset", help="Input XML with one Article element per article")
+    p.add_argument("mapping", help="CSV with columns doi and/or first_page, pdf, article_url, pdf_link[, received, accepted]")
+    add_run_options(p)
+    p.set_defaults(func=cmd_issue)
+
+    p = commands.add_parser("harvest", help="Discover an issue's articles and PDFs from its TOC page and process them")
+    p.add_argument("toc_url", help="Issue table of contents URL, e.g. https://journal.example/index.php/j/issue/view/5")
+    p.add_argument("articleset", help="Input XML with one Article element per article")
+    add_run_options(p)
+    p.set_defaults(func=cmd_harvest)
+
+    p = commands.add_parser("watch", help="Process PDF/XML/URL sets as they are dropped into an inbox directory")
+    p.add_argument("inbox", help="Directory to watch for <name>.pdf, <name>.xml and <name>.url sets")
+    p.add_argument("--outbox", default="outbox", help="Directory for the generated XML and failure reports (default: outbox)")
+    p.add_argument("--workers", type=int, default=2, help="Sets processed at once (default: 2)")
+    p.add_argument("--poll", type=float, default=1.0, help="Seconds between inbox scans (default: 1)")
+    p.add_argument("--settle", type=float, default=2.0,
+                   help="Seconds a set's files must be unchanged before it is taken (default: 2)")
+    p.add_argument("--once", action="store_true", help="Exit once the inbox holds no complete set")
+    add_pipeline_options(p)
+    p.set_defaults(func=cmd_watch)
+
+    p = commands.add_parser("serve", help="Run an HTTP API for submitting generation jobs and fetching their XML")
+    p.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    p.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    p.add_argument("--workers", type=int, default=None, help="Jobs run at once (default: $XMLGEN_MAX_JOBS or 2)")
+    p.add_argument("--max-queued", type=int, default=None,
+                   help="Jobs that may wait before submissions get 503 (default: 50)")
+    p.add_argument("--max-upload-mb", type=int, default=100, help="Largest accepted submission (default: 100)")
+    add_pipeline_options(p)
+    p.set_defaults(func=cmd_serve)
+
+    p = commands.add_parser("pdf-cache", help="Inspect or invalidate the PDF extraction cache")
+    p.add_argument("action", choices=("stats", "clear", "invalidate"))
+    p.add_argument("pdfs", nargs="*", help="PDF files to invalidate")
+    p.add_argument("--cache-dir", default=None, help="Cache directory (default: $XMLGEN_CACHE_DIR or ~/.cache/xmlgen)")
+    p.set_defaults(func=cmd_pdf_cache)
+
+    p = commands.add_parser("index", help="List, check or rebuild issues from the local article index")
+    p.add_argument("action", choices=("issues", "duplicates", "rebuild"))
+    p.add_argument("--index", default=None, metavar="PATH",
+                   help="Index database (default: $XMLGEN_INDEX or <cache dir>/articles.sqlite3)")
+    p.add_argument("--cache-dir", default=None, help="Cache directory (default: $XMLGEN_CACHE_DIR or ~/.cache/xmlgen)")
+    p.add_argument("--journal", default=None, help="Issue to rebuild: journal title or ISSN")
+    p.add_argument("--volume", default=None, help="Issue to rebuild: volume")
+    p.add_argument("--issue", default=None, help="Issue to rebuild: issue number")
+    p.add_argument("--out", default="output", help="Directory for the rebuilt XML files (default: output)")
+    p.add_argument("--template", default=None, help="Template XML; also writes combined XML to a combined/ subdirectory")
+    p.add_argument("--zip", default=None, help="Also package the outputs and a manifest into this ZIP archive")
+    p.add_argument("--schema", default=None, help="Local JATS DTD or XSD for the combined outputs (default: $XMLGEN_JATS_SCHEMA)")
+    p.add_argument("--no-validate", action="store_true", help="Skip the well-formedness and schema checks")
+    p.set_defaults(func=cmd_index)
+
+    p = commands.add_parser("validate", help="Check XML files for well-formedness and against a local schema")
+    p.add_argument("files", nargs="+", help="XML files to check")
+    p.add_argument("--kind", choices=("combined", "processed"), default="combined",
+                   help="Which configured schema applies (default: combined)")
+    p.add_argument("--schema", default=None, help="Local DTD or XSD (default: $XMLGEN_JATS_SCHEMA for combined files)")
+    p.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    p.add_argument("--json", action="store_true", help="Print one JSON report per file")
+    p.set_defaults(func=cmd_validate)
+
+    p = commands.add_parser("check-deps", help="Check installed packages against requirements.txt")
+    p.add_argument("--requirements", default=None, help="Requirements file (default: the one next to the app)")
+    p.set_defaults(func=cmd_check_deps)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not (getattr(args, "metrics_json", None) or getattr(args, "metrics_prom", None)):
+        return args.func(args)
+
+    from xmlgen import metrics
+
+    with metrics.recording() as recorder:
+        rc = args.func(args)
+    snapshot = recorder.snapshot()
+    if args.metrics_json:
+        metrics.write_json_log(args.metrics_json, recorder.events, snapshot)
+    if args.metrics_prom:
+        with open(args.metrics_prom, "w", encoding="utf-8") as f:
+            f.write(metrics.prometheus_text(snapshot))
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
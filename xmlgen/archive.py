@@ -0,0 +1,122 @@
+"""ZIP packaging of generated XML, written entry by entry as articles finish.
+
+``ArchiveWriter(path)`` streams each processed and combined XML into a ZIP file
+on disk (``processed/<filename>``, ``combined/<filename>``, named as
+``generate_filename`` named them) as soon as it is produced, so a whole issue is
+never held in memory. ``close()`` adds ``manifest.json``, listing every article
+with its PDF, status, files (size and SHA-256) and messages or error, and then
+renames the archive into place; until then it is ``<path>.part``.
+
+A file name that is already in the archive gets a ``-2``, ``-3``, ... suffix
+rather than replacing the earlier entry; the manifest shows the name each
+article actually got.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from xmlgen import metrics
+
+MANIFEST = "manifest.json"
+CHUNK_SIZE = 1 << 20
+
+
+class _HashingWriter:
+    """Counts and hashes what passes through to the zip entry"""
+
+    def __init__(self, out):
+        self.out = out
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.out.write(data)
+        self.size += len(data)
+        self.sha256.update(data)
+        return len(data)
+
+
+class ArchiveWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.partial = self.path.with_name(self.path.name + ".part")
+        self.zip = zipfile.ZipFile(self.partial, "w", compression=zipfile.ZIP_DEFLATED)
+        self.names = set()
+        self.articles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _entry_name(self, folder, filename):
+        stem, dot, suffix = filename.rpartition(".")
+        if not dot:
+            stem, suffix = filename, ""
+        name, n = f"{folder}/{filename}", 2
+        while name in self.names:
+            name = f"{folder}/{stem}-{n}{dot}{suffix}"
+            n += 1
+        self.names.add(name)
+        return name
+
+    @contextmanager
+    def open(self, folder, filename):
+        """Stream one entry; afterwards the stream's ``entry`` holds its manifest entry (path, size, SHA-256)"""
+        name = self._entry_name(folder, filename)
+        with metrics.span("archive_write"):
+            with self.zip.open(name, "w", force_zip64=True) as out:
+                writer = _HashingWriter(out)
+                yield writer
+        writer.entry = {"path": name, "bytes": writer.size, "sha256": writer.sha256.hexdigest()}
+        metrics.count("archive_bytes", writer.size)
+
+    def write(self, folder, filename, data):
+        """Add ``data`` (bytes, str, or a path to copy from) as ``folder/filename``; returns the manifest entry"""
+        with self.open(folder, filename) as out:
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                out.write(data)
+            else:
+                with open(data, "rb") as source:
+                    shutil.copyfileobj(source, out, CHUNK_SIZE)
+        return out.entry
+
+    def add_article(self, pdf, filename=None, files=(), error=None, messages=(), row=None):
+        """Record one article in the manifest, including failed ones; ``messages`` are (level, message) pairs"""
+        self.articles.append({
+            "row": row,
+            "pdf": os.path.basename(str(pdf)),
+            "filename": filename,
+            "status": "failed" if error else "ok",
+            "files": list(files),
+            "error": error,
+            "messages": [f"{level}: {message}" for level, message in messages],
+        })
+
+    def close(self):
+        manifest = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "articles": sorted(self.articles, key=lambda a: a["row"] or 0),
+            "succeeded": sum(1 for a in self.articles if a["status"] == "ok"),
+            "failed": sum(1 for a in self.articles if a["status"] == "failed"),
+        }
+        self.zip.writestr(MANIFEST, json.dumps(manifest, indent=2))
+        self.zip.close()
+        os.replace(self.partial, self.path)
+        return self.path
+
+    def abort(self):
+        self.zip.close()
+        self.partial.unlink(missing_ok=True)
@@ -0,0 +1,187 @@
+"""Local SQLite index of the articles that have been processed.
+
+Filenames, history dates, keywords and custom IDs used to vanish with the run
+that produced them. With ``configure(enabled=True)`` (``--index`` on the
+command line, or ``XMLGEN_INDEX``) every article a batch, issue or harvest run
+or the app processes is recorded in ``<cache_dir>/articles.sqlite3``. Each
+entry holds the extracted ``ArticleRecord`` (as JSON, see
+``record.record_to_dict``), the output filename and paths, the history and
+messages of the run as (level, message) pairs, and a fingerprint of the inputs. The fingerprint is
+``incremental.fingerprint`` without the template, which only affects rendering.
+
+Entries are keyed by DOI and custom ID, with indexes on the custom ID, the
+filename, the fingerprint and (journal, volume, issue), so that
+
+- a row whose inputs were processed before is rendered from its stored record
+  instead of being scraped, scanned and extracted again (``find``);
+- a DOI or filename another article already has is found at once
+  (``conflicts``, ``duplicates``);
+- an issue's outputs can be rebuilt from the index alone (``issue_entries``,
+  ``batch.rebuild_issue``).
+
+``find``, ``conflicts`` and ``add`` never raise: a broken index only means
+nothing is reused.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from xmlgen import crossref, incremental, record, sqlitedb
+
+_config = {
+    "enabled": bool(os.environ.get("XMLGEN_INDEX")),
+    "path": os.environ.get("XMLGEN_INDEX") or None,
+    "cache_dir": os.environ.get("XMLGEN_CACHE_DIR", str(Path.home() / ".cache" / "xmlgen")),
+}
+_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    doi TEXT NOT NULL,
+    custom_id TEXT NOT NULL,
+    journal TEXT NOT NULL,
+    issn TEXT NOT NULL,
+    volume TEXT NOT NULL,
+    issue TEXT NOT NULL,
+    first_page INTEGER,
+    filename TEXT NOT NULL,
+    article_url TEXT,
+    source TEXT,
+    output TEXT,
+    combined TEXT,
+    fingerprint TEXT,
+    record TEXT NOT NULL,
+    history TEXT,
+    messages TEXT NOT NULL,
+    processed REAL NOT NULL,
+    PRIMARY KEY (doi, custom_id)
+);
+CREATE INDEX IF NOT EXISTS articles_custom_id ON articles (custom_id);
+CREATE INDEX IF NOT EXISTS articles_filename ON articles (filename);
+CREATE INDEX IF NOT EXISTS articles_fingerprint ON articles (fingerprint);
+CREATE INDEX IF NOT EXISTS articles_journal ON articles (journal, volume, issue);
+CREATE INDEX IF NOT EXISTS articles_issn ON articles (issn, volume, issue);
+"""
+
+
+def configure(**options):
+    """Override index settings (enabled, path, cache_dir)"""
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise TypeError(f"Unknown index option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        sqlitedb.close(db_path())
+        _config.update({k: v for k, v in options.items() if v is not None})
+
+
+def enabled():
+    return _config["enabled"]
+
+
+def db_path():
+    return Path(_config["path"] or Path(_config["cache_dir"]) / "articles.sqlite3")
+
+
+def _connection():
+    return sqlitedb.connect(db_path(), SCHEMA, sqlite3.Row)
+
+
+def _query(sql, params=()):
+    with _lock:
+        return _connection().execute(sql, params).fetchall()
+
+
+def fingerprint(row, page_budget=None):
+    """Hex digest of the row's inputs and of everything else its record depends on"""
+    return incremental.fingerprint(row, None, {"page_budget": page_budget, "metadata": crossref.source()})
+
+
+def _entry(row):
+    entry = dict(row)
+    entry["record"] = record.record_from_dict(json.loads(entry["record"]))
+    entry["messages"] = [tuple(message) for message in json.loads(entry["messages"])]
+    return entry
+
+
+def find(fingerprint):
+    """The latest entry recorded with this fingerprint, or None"""
+    try:
+        rows = _query("SELECT * FROM articles WHERE fingerprint = ? ORDER BY processed DESC LIMIT 1", (fingerprint,))
+        return _entry(rows[0]) if rows else None
+    except (sqlite3.Error, OSError, ValueError, TypeError):
+        return None
+
+
+def _describe(row):
+    return f"{row['custom_id']} ({row['output'] or row['source'] or row['filename']})"
+
+
+def conflicts(article_record):
+    """Warnings about other entries with the record's DOI or filename"""
+    doi = crossref.normalize_doi(article_record.doi) or ""
+    key = (doi, article_record.custom_id)
+    warnings = []
+    try:
+        if doi:
+            for row in _query("SELECT * FROM articles WHERE doi = ? AND custom_id != ?", key):
+                warnings.append(f"DOI {doi} is also indexed as {_describe(row)}")
+        # Another entry with the same DOI was reported above
+        for row in _query("SELECT * FROM articles WHERE filename = ?1 AND (doi != ?2 OR doi = '' AND custom_id != ?3)",
+                          (article_record.filename, *key)):
+            warnings.append(f"Filename {article_record.filename} is also used by "
+                            f"{row['doi'] or 'an article without a DOI'}, {_describe(row)}")
+    except (sqlite3.Error, OSError):
+        pass
+    return warnings
+
+
+def add(article_record, fingerprint=None, source=None, output=None, combined=None, history=None, messages=()):
+    """Record a processed article, replacing any entry with its DOI and custom ID
+
+    ``messages`` are (level, message) pairs. Returns ``conflicts`` for it, plus
+    one when the index couldn't be updated, as ("warning", message) pairs.
+    """
+    warnings = [("warning", warning) for warning in conflicts(article_record)]
+    values = (
+        crossref.normalize_doi(article_record.doi) or "", article_record.custom_id, article_record.journal_title,
+        article_record.issn, article_record.volume, article_record.issue, article_record.first_page,
+        article_record.filename, article_record.article_url, source and str(source), output and str(output),
+        combined and str(combined), fingerprint, json.dumps(record.record_to_dict(article_record)), history,
+        json.dumps(list(messages)), time.time(),
+    )
+    try:
+        with _lock:
+            _connection().execute(f"INSERT OR REPLACE INTO articles VALUES ({', '.join('?' * len(values))})", values)
+    except (sqlite3.Error, OSError) as e:
+        warnings.append(("warning", f"Could not update the article index: {e}"))
+    return warnings
+
+
+def duplicates():
+    """{"doi": {doi: [entry, ...]}, "filename": {filename: [entry, ...]}} for values held by several entries"""
+    found = {}
+    for column in ("doi", "filename"):
+        rows = _query(f"SELECT * FROM articles WHERE {column} IN (SELECT {column} FROM articles WHERE {column} != '' "
+                      f"GROUP BY {column} HAVING COUNT(*) > 1) ORDER BY {column}, processed")
+        found[column] = {}
+        for row in rows:
+            found[column].setdefault(row[column], []).append(dict(row, record=None))
+    return found
+
+
+def issues():
+    """[{journal, issn, volume, issue, articles}] for every indexed issue"""
+    rows = _query("SELECT journal, issn, volume, issue, COUNT(*) AS articles FROM articles "
+                  "GROUP BY journal, issn, volume, issue ORDER BY journal, volume, issue")
+    return [dict(row) for row in rows]
+
+
+def issue_entries(journal, volume, issue):
+    """The entries of one issue in page order; ``journal`` is its title or ISSN"""
+    rows = _query("SELECT * FROM articles WHERE (journal = ?1 AND volume = ?2 AND issue = ?3) "
+                  "OR (issn = ?1 AND volume = ?2 AND issue = ?3) ORDER BY first_page, custom_id",
+                  (journal, str(volume), str(issue)))
+    return [_entry(row) for row in rows]
@@ -0,0 +1,109 @@
+"""Streaming ArticleSet input: one input XML holding a whole issue.
+
+``iter_articles`` walks the input with ``iterparse`` and yields each
+``Article`` element as soon as it is complete, then detaches it so memory
+stays flat however many articles the file holds.
+
+PDFs and article URLs are matched to articles through a mapping CSV with the
+columns
+
+    doi and/or first_page, pdf, article_url, pdf_link[, received, accepted]
+
+A row matches the article with the same DOI (case-insensitive) or, when the
+row has no DOI, the same first page number.
+"""
+import csv
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from xmlgen import record
+
+MAPPING_COLUMNS = ("pdf", "article_url")
+
+
+def iter_articles(source):
+    """Yield every Article element of ``source`` (a path or binary file object) in document order"""
+    stack = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.tag == "Article":
+            yield elem
+            # Detach the finished article so the parsed tree never accumulates
+            if stack:
+                stack[-1].remove(elem)
+            elem.clear()
+
+
+def article_keys(article):
+    """(lower-cased DOI or None, first page number as a string or None)"""
+    doi_elem = article.find(".//ELocationID[@EIdType='doi']")
+    doi = doi_elem.text.strip().lower() if doi_elem is not None and doi_elem.text else None
+    first_page = record.page_range(article)[0]
+    return doi, str(first_page) if first_page else None
+
+
+def read_mapping(mapping_path):
+    mapping_path = Path(mapping_path)
+    with open(mapping_path, newline="", encoding="utf-8") as f:
+        return parse_mapping(f, base=mapping_path.parent)
+
+
+def parse_mapping(lines, base=None):
+    """Mapping rows from an open CSV file; ``pdf`` is resolved against ``base`` when given"""
+    reader = csv.DictReader(lines)
+    fields = reader.fieldnames or []
+    missing = [c for c in MAPPING_COLUMNS if c not in fields]
+    if missing or not ({"doi", "first_page"} & set(fields)):
+        raise ValueError("Mapping needs doi or first_page, plus pdf and article_url columns")
+    rows = []
+    for row in reader:
+        row = {k: (v or "").strip() for k, v in row.items() if k}
+        if not any(row.values()):
+            continue
+        if base is not None:
+            row["pdf"] = str(Path(base) / row["pdf"])
+        rows.append(row)
+    return rows
+
+
+class Matcher:
+    """Pairs streamed articles with mapping rows; remembers what stayed unmatched"""
+
+    def __init__(self, rows):
+        self.by_doi = {}
+        self.by_first_page = {}
+        for row in rows:
+            if row.get("doi"):
+                self.by_doi[row["doi"].lower()] = row
+            elif row.get("first_page"):
+                self.by_first_page[row["first_page"]] = row
+        self.rows = rows
+        self.used = set()
+        self.unmatched_articles = []
+
+    def match(self, article):
+        doi, first_page = article_keys(article)
+        row = self.by_doi.get(doi) if doi else None
+        if row is None and first_page:
+            row = self.by_first_page.get(first_page)
+        if row is None or id(row) in self.used:
+            self.unmatched_articles.append(doi or f"FirstPage {first_page or '?'}")
+            return None
+        self.used.add(id(row))
+        return row
+
+    @property
+    def unmatched_rows(self):
+        return [row for row in self.rows if id(row) not in self.used]
+
+
+def iter_matched(source, matcher):
+    """Yield one batch row per matched article, carrying the article's own XML bytes"""
+    for article in iter_articles(source):
+        row = matcher.match(article)
+        if row is not None:
+            article.tail = None
+            yield dict(row, article_xml=ET.tostring(article, encoding="utf-8"))
@@ -0,0 +1,167 @@
+"""Per-session store for generated documents, with a memory cap and disk spill.
+
+The app used to keep every processed and combined XML in ``st.session_state``,
+so server memory grew with users and template sizes. ``ArtifactStore`` keeps a
+session's artifacts in memory only up to ``memory_cap`` bytes in total; larger
+ones go to ``<cache_dir>/sessions/<session id>/``. Sessions not touched for
+``ttl`` seconds are dropped with their files, and leftovers from an earlier
+server process are removed the same way.
+
+``read(session, name, start, length)`` returns one window of an artifact, so a
+preview never loads, or sends, more than that slice. ``spilled`` tells the app
+which artifacts are on disk, so it reads those for a download only on request.
+
+Settings come from ``configure()`` or the ``XMLGEN_SESSION_MEMORY_KB`` and
+``XMLGEN_SESSION_TTL`` (seconds) environment variables.
+"""
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from xmlgen import metrics
+
+CLEANUP_INTERVAL = 60
+
+_config = {
+    "cache_dir": os.environ.get("XMLGEN_CACHE_DIR", str(Path.home() / ".cache" / "xmlgen")),
+    "memory_cap": int(os.environ.get("XMLGEN_SESSION_MEMORY_KB", 1024)) * 1024,
+    "ttl": float(os.environ.get("XMLGEN_SESSION_TTL", 3600)),
+}
+
+
+def configure(**options):
+    """Override store settings (cache_dir, memory_cap in bytes, ttl) for stores created afterwards"""
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise TypeError(f"Unknown artifact store option(s): {', '.join(sorted(unknown))}")
+    _config.update({k: v for k, v in options.items() if v is not None})
+
+
+def _safe(name):
+    # Session IDs and artifact names become path components
+    if not re.fullmatch(r"[A-Za-z0-9_.\-]+", name) or name.startswith("."):
+        raise ValueError(f"Invalid artifact or session name: {name!r}")
+    return name
+
+
+class ArtifactStore:
+    def __init__(self, cache_dir=None, memory_cap=None, ttl=None):
+        self.root = Path(cache_dir or _config["cache_dir"]) / "sessions"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.memory_cap = memory_cap if memory_cap is not None else _config["memory_cap"]
+        self.ttl = ttl if ttl is not None else _config["ttl"]
+        self.sessions = {}  # id -> {"memory": {name: bytes}, "disk": {name: path}, "used": timestamp}
+        self.lock = threading.Lock()
+        self.last_cleanup = 0.0
+
+    def _session(self, session_id):
+        session = self.sessions.setdefault(_safe(session_id), {"memory": {}, "disk": {}, "used": 0.0})
+        session["used"] = time.time()
+        return session
+
+    def _discard(self, session, name):
+        session["memory"].pop(name, None)
+        path = session["disk"].pop(name, None)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    def put(self, session_id, name, data):
+        """Store ``data`` (bytes or str) as ``name``, replacing any earlier artifact of that name"""
+        self.cleanup()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self.lock:
+            session = self._session(session_id)
+            self._discard(session, _safe(name))
+            in_memory = sum(len(value) for value in session["memory"].values())
+            if in_memory + len(data) <= self.memory_cap:
+                session["memory"][name] = bytes(data)
+                return
+            directory = self.root / session_id
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=name, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, directory / name)
+        metrics.count("artifact_spilled_bytes", len(data))
+        with self.lock:
+            self._session(session_id)["disk"][name] = directory / name
+
+    def _locate(self, session_id, name):
+        """(bytes, None) or (None, path); KeyError when there is no such artifact"""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                raise KeyError(name)
+            session["used"] = time.time()
+            if name in session["memory"]:
+                return session["memory"][name], None
+            return None, session["disk"][name]
+
+    def has(self, session_id, name):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            return session is not None and (name in session["memory"] or name in session["disk"])
+
+    def spilled(self, session_id, name):
+        """Whether the artifact went over the memory cap and lives on disk"""
+        return self._locate(session_id, name)[1] is not None
+
+    def size(self, session_id, name):
+        data, path = self._locate(session_id, name)
+        return len(data) if path is None else path.stat().st_size
+
+    def read(self, session_id, name, start=0, length=None):
+        """``length`` bytes of the artifact from ``start`` (all of it by default)"""
+        data, path = self._locate(session_id, name)
+        if path is None:
+            return data[start:None if length is None else start + length]
+        with open(path, "rb") as f:
+            f.seek(start)
+            return f.read(-1 if length is None else length)
+
+    def open(self, session_id, name):
+        """A binary file object over the artifact, e.g. for a download button"""
+        data, path = self._locate(session_id, name)
+        return io.BytesIO(data) if path is None else open(path, "rb")
+
+    def drop(self, session_id, name=None):
+        """Remove one artifact, or the whole session"""
+        with self.lock:
+            if name is not None:
+                session = self.sessions.get(session_id)
+                if session is not None:
+                    self._discard(session, name)
+                return
+            self.sessions.pop(session_id, None)
+        shutil.rmtree(self.root / _safe(session_id), ignore_errors=True)
+
+    def cleanup(self, force=False):
+        """Drop sessions idle for longer than the TTL; runs at most once a minute unless forced"""
+        now = time.time()
+        if not force and now - self.last_cleanup < CLEANUP_INTERVAL:
+            return
+        self.last_cleanup = now
+        cutoff = now - self.ttl
+        with self.lock:
+            expired = [sid for sid, session in self.sessions.items() if session["used"] < cutoff]
+            for sid in expired:
+                del self.sessions[sid]
+            live = set(self.sessions)
+        try:
+            directories = list(self.root.iterdir())
+        except OSError:
+            return
+        for directory in directories:
+            try:
+                if directory.name not in live and directory.stat().st_mtime < cutoff:
+                    shutil.rmtree(directory, ignore_errors=True)
+                elif directory.name in expired:
+                    shutil.rmtree(directory, ignore_errors=True)
+            except OSError:
+                pass
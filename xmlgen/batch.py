@@ -0,0 +1,378 @@
+"""Headless batch runner: processes a manifest of articles across a process pool.
+
+The manifest is a CSV file with a header row and the columns
+
+    pdf, xml, article_url, pdf_link[, received, accepted]
+
+``pdf`` and ``xml`` are paths (relative paths are resolved against the
+manifest's directory). ``received``/``accepted`` are optional fallback dates
+such as ``12 March 2023`` used when the history line can't be found in the PDF,
+the same way the Streamlit form falls back to its date dropdowns.
+"""
+import csv
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from xmlgen import archive, articleindex, crossref, fetch, incremental, metrics, pdfcache, pipeline, record, scrape, template, validate
+
+REQUIRED_COLUMNS = ("pdf", "xml", "article_url")
+
+
+def read_manifest(manifest_path):
+    manifest_path = Path(manifest_path)
+    base = manifest_path.parent
+    with open(manifest_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Manifest is missing column(s): {', '.join(missing)}")
+        rows = []
+        for row in reader:
+            row = {k: (v or "").strip() for k, v in row.items() if k}
+            if not any(row.values()):
+                continue
+            for key in ("pdf", "xml"):
+                row[key] = str(base / row[key])
+            rows.append(row)
+    return rows
+
+
+def _init_worker(fetch_options, pdf_cache_options, validate_options, metadata_options):
+    fetch.configure(**fetch_options)
+    pdfcache.configure(**pdf_cache_options)
+    validate.configure(**validate_options)
+    crossref.configure(**metadata_options)
+
+
+def process_row(row, out_dir, template_path=None, page=None, page_budget=None, work=None, indexed=None):
+    """Run one manifest row through the pipeline; never raises
+
+    The article XML comes from ``row["article_xml"]`` (bytes, see ``articleset``)
+    or else from the file at ``row["xml"]``. ``work`` is the row's looked-up
+    ``crossref.Work``, if any. ``indexed`` is the row's ``articleindex`` entry,
+    whose record is rendered again instead of extracting one. The record comes
+    back in ``result["record"]``, and the row's metrics snapshot and span events
+    in ``result["metrics"]``/``result["events"]``.
+    """
+    with metrics.recording() as recorder:
+        result = _process_row(row, out_dir, template_path, page, page_budget, work, indexed)
+    result["metrics"] = recorder.snapshot()
+    result["events"] = recorder.events
+    return result
+
+
+def _process_row(row, out_dir, template_path, page, page_budget, work, indexed):
+    messages = []
+
+    def report(level, message):
+        messages.append((level, message))
+
+    result = failed_result(row, None)
+    result["messages"] = messages
+    try:
+        if indexed is not None:
+            # Extracted by an earlier run from the same inputs
+            article_record = indexed["record"]
+            result["history"] = indexed["history"]
+            messages.extend(indexed["messages"])
+            result["indexed"] = True
+        else:
+            xml_content = row.get("article_xml") or Path(row["xml"]).read_bytes()
+            fallback_dates = None
+            if row.get("received") and row.get("accepted"):
+                fallback_dates = (pipeline.parse_date(row["received"]), pipeline.parse_date(row["accepted"]))
+
+            article_record, scan = pipeline.process_article(
+                row["pdf"], xml_content, row["article_url"], row.get("pdf_link", ""), fallback_dates, report,
+                page=page, page_budget=page_budget, work=work,
+            )
+            if scan is not None:
+                result["history"] = describe_scan(scan)
+        write_outputs(article_record, out_dir, template_path, result)
+        result["record"] = article_record
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def write_outputs(article_record, out_dir, template_path, result):
+    """Render the record's processed (and with a template, combined) XML into ``out_dir`` and validate it"""
+    filename = article_record.filename
+    out_dir = Path(out_dir)
+    processed_xml = record.render_article_xml(article_record)
+    (out_dir / filename).write_text(processed_xml, encoding="utf-8")
+    if template_path:
+        with open(out_dir / "combined" / filename, "wb") as out:
+            template.write_spliced(template_path, record.render_front(article_record), out)
+
+    # Checked here, in the worker, so a batch is validated in parallel
+    if validate.enabled():
+        result["validation"].append(validate.validate_bytes(processed_xml, "processed", filename))
+        if template_path:
+            result["validation"].append(validate.validate_file(out_dir / "combined" / filename, "combined"))
+    result["filename"] = filename
+
+
+def failed_result(row, error):
+    return {"pdf": row["pdf"], "filename": None, "ok": False, "skipped": False, "indexed": False, "error": error,
+            "history": None, "messages": [], "validation": [], "record": None, "metrics": None, "events": []}
+
+
+def skipped_result(row, entry):
+    """The result recorded for an unchanged row by an earlier incremental run"""
+    return {"pdf": row["pdf"], "filename": entry["filename"], "ok": True, "skipped": True, "indexed": False,
+            "error": None, "history": entry["history"], "messages": entry["messages"],
+            "validation": entry["validation"], "record": None, "metrics": None, "events": []}
+
+
+def passed(result):
+    """Processed without error and every output valid"""
+    return result["ok"] and all(report["valid"] for report in result["validation"])
+
+
+def run_batch(rows, out_dir, workers=None, template_path=None, fetch_options=None, per_host=4, delay=0.0,
+              page_budget=None, pdf_cache_options=None, urls=None, archive_path=None, validate_options=None,
+              incremental_run=False, metadata_options=None, url_dois=None, index_options=None):
+    """Fan the rows out over a process pool; results come back in row order
+
+    ``rows`` may be any iterable (e.g. ``articleset.iter_matched``); only a few
+    rows per worker are in flight at once. All article pages (``urls``, by default
+    those of the rows) are scraped up front, concurrently (see
+    ``scrape.scrape_many``), and handed to the workers. ``fetch_options`` and
+    ``pdf_cache_options`` are passed to ``fetch.configure`` and
+    ``pdfcache.configure`` here and in every worker, as are ``validate_options``
+    to ``validate.configure``; each output is validated in its worker and the
+    reports come back in ``result["validation"]``. Each row's metrics are
+    merged into the caller's ``metrics`` recorder. With ``archive_path`` every
+    output is also added to a ZIP archive (see ``archive``) as its row finishes.
+
+    When ``crossref`` is enabled (``metadata_options`` go to ``crossref.configure``)
+    the rows' DOIs are looked up in batches first, and only the pages the
+    metadata can't stand in for are scraped. The DOIs are read from the rows;
+    for rows that are streamed pass ``url_dois``, (article URL, DOI) pairs.
+
+    With ``incremental_run`` rows whose inputs are unchanged since the last
+    incremental run into ``out_dir`` are not scraped or processed again (see
+    ``incremental``); their earlier results come back with ``skipped`` set.
+
+    When ``articleindex`` is enabled (``index_options`` go to
+    ``articleindex.configure``) every processed article is recorded in the
+    index, and rows whose inputs are already indexed are rendered from their
+    stored records without being scraped or extracted; they come back with
+    ``indexed`` set. Other articles in the index with the same DOI or filename
+    are reported in the row's messages.
+    """
+    fetch.configure(**(fetch_options or {}))
+    pdfcache.configure(**(pdf_cache_options or {}))
+    validate.configure(**(validate_options or {}))
+    crossref.configure(**(metadata_options or {}))
+    articleindex.configure(**(index_options or {}))
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if template_path:
+        (out_dir / "combined").mkdir(exist_ok=True)
+
+    unchanged = {}  # row index -> state entry
+    fingerprints = {}
+    if incremental_run:
+        rows = list(rows)
+        state = incremental.load_state(out_dir)
+        options = {"page_budget": page_budget, "metadata": crossref.source(),
+                   **incremental.schema_options()}
+        for i, row in enumerate(rows):
+            try:
+                fingerprints[i] = incremental.fingerprint(row, template_path, options)
+            except OSError:
+                continue  # Unreadable input: processing reports it
+            entry = state.get(incremental.row_key(row))
+            if (entry is not None and entry["fingerprint"] == fingerprints[i]
+                    and incremental.outputs_present(out_dir, entry, template_path)):
+                unchanged[i] = entry
+        metrics.count("incremental_skipped", len(unchanged))
+        urls = [row["article_url"] for i, row in enumerate(rows) if i not in unchanged]
+    elif urls is None:
+        rows = list(rows)
+        urls = [row["article_url"] for row in rows]
+    indexed = {}  # row index -> articleindex entry
+    index_fingerprints = {}
+    if articleindex.enabled():
+        rows = list(rows)
+        for i, row in enumerate(rows):
+            if i in unchanged:
+                continue
+            try:
+                index_fingerprints[i] = articleindex.fingerprint(row, page_budget)
+            except OSError:
+                continue  # Unreadable input: processing reports it
+            entry = articleindex.find(index_fingerprints[i])
+            if entry is not None:
+                indexed[i] = entry
+        metrics.count("index_reused", len(indexed))
+        # Rows rendered from the index need neither their page nor their metadata
+        needed = {row["article_url"] for i, row in enumerate(rows) if i not in unchanged and i not in indexed}
+        urls = [url for url in urls if url in needed]
+        if url_dois is not None:
+            url_dois = [(url, doi) for url, doi in url_dois if url in needed]
+    works = {}
+    if crossref.enabled():
+        if url_dois is None:
+            # Streamed rows can't be read twice; without ``url_dois`` they are all scraped
+            url_dois = [(row["article_url"], crossref.row_doi(row)) for i, row in enumerate(rows)
+                        if i not in unchanged and i not in indexed] if isinstance(rows, list) else []
+        works = crossref.lookup_many(doi for _, doi in url_dois)
+        needed = {url for url, doi in url_dois if crossref.needs_page(works.get(crossref.normalize_doi(doi)))}
+        covered = {url for url, _ in url_dois} - needed
+        urls = [url for url in urls if url not in covered]
+    pages = scrape.scrape_all(urls, per_host=per_host, delay=delay)
+
+    workers = workers or os.cpu_count()
+    results = {}
+    pending = {}
+
+    recorder = metrics.current()
+    package = archive.ArchiveWriter(archive_path) if archive_path else None
+
+    def collect(futures):
+        for future in futures:
+            i, row = pending.pop(future)
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                # A worker that died (e.g. crashed inside PyMuPDF) only fails its own row
+                results[i] = failed_result(row, f"Worker failed: {e}")
+            if results[i]["metrics"] is not None:
+                recorder.merge(results[i]["metrics"])
+            if recorder.events is not None:
+                recorder.events.extend(dict(event, row=i + 1) for event in results[i]["events"])
+            results[i]["metrics"], results[i]["events"] = None, []
+            if results[i]["record"] is not None and articleindex.enabled():
+                filename = results[i]["filename"]
+                warnings = articleindex.add(
+                    results[i]["record"], index_fingerprints.get(i), row["pdf"], (out_dir / filename).resolve(),
+                    (out_dir / "combined" / filename).resolve() if template_path else None,
+                    results[i]["history"], results[i]["messages"],
+                )
+                results[i]["messages"] += warnings
+            results[i]["record"] = None
+            if package is not None:
+                add_to_archive(package, results[i], i + 1, out_dir, template_path)
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(fetch_options or {}, pdf_cache_options or {}, validate_options or {},
+                                       metadata_options or {})) as pool:
+        for i, row in enumerate(rows):
+            if i in unchanged:
+                results[i] = skipped_result(row, unchanged[i])
+                if package is not None:
+                    add_to_archive(package, results[i], i + 1, out_dir, template_path)
+                continue
+            if len(pending) >= workers * 2:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            work = works.get(crossref.row_doi(row)) if works else None
+            future = pool.submit(process_row, row, str(out_dir), template_path, pages.get(row["article_url"]), page_budget,
+                                 work, indexed.get(i))
+            pending[future] = (i, row)
+        collect(list(pending))
+    if package is not None:
+        package.close()
+    if incremental_run:
+        save_fingerprints(out_dir, rows, results, fingerprints)
+    return [results[i] for i in sorted(results)]
+
+
+def save_fingerprints(out_dir, rows, results, fingerprints):
+    """Record the rows that succeeded for the next incremental run; failed rows are forgotten"""
+    state = incremental.load_state(out_dir)
+    for i, row in enumerate(rows):
+        key = incremental.row_key(row)
+        if results[i]["ok"] and i in fingerprints:
+            state[key] = {"fingerprint": fingerprints[i], "filename": results[i]["filename"],
+                          "history": results[i]["history"], "messages": results[i]["messages"],
+                          "validation": results[i]["validation"]}
+        else:
+            state.pop(key, None)
+    incremental.save_state(out_dir, state)
+
+
+def rebuild_issue(entries, out_dir, template_path=None, archive_path=None, validate_options=None):
+    """Write the outputs of indexed articles (``articleindex.issue_entries``) again, extracting nothing
+
+    Results are shaped like ``run_batch``'s, with ``indexed`` set.
+    """
+    validate.configure(**(validate_options or {}))
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if template_path:
+        (out_dir / "combined").mkdir(exist_ok=True)
+    package = archive.ArchiveWriter(archive_path) if archive_path else None
+    results = []
+    for entry in entries:
+        result = failed_result({"pdf": entry["source"] or entry["custom_id"]}, None)
+        result.update(indexed=True, history=entry["history"], messages=list(entry["messages"]))
+        try:
+            write_outputs(entry["record"], out_dir, template_path, result)
+            result["ok"] = True
+        except Exception as e:
+            result["error"] = str(e)
+        results.append(result)
+        if package is not None:
+            add_to_archive(package, result, len(results), out_dir, template_path)
+    if package is not None:
+        package.close()
+    return results
+
+
+def add_to_archive(package, result, row, out_dir, template_path=None):
+    """Copy one row's output files into the archive and record it in the manifest"""
+    files = []
+    if result["ok"]:
+        files.append(package.write("processed", result["filename"], out_dir / result["filename"]))
+        if template_path:
+            files.append(package.write("combined", result["filename"], out_dir / "combined" / result["filename"]))
+    reports = {report["kind"]: report for report in result["validation"]}
+    for entry in files:
+        report = reports.get(entry["path"].split("/", 1)[0])
+        if report is not None:
+            entry["valid"], entry["validation_errors"] = report["valid"], report["errors"]
+    package.add_article(result["pdf"], result["filename"], files, result["error"], result["messages"], row=row)
+
+
+def describe_scan(scan):
+    if scan.pattern is None:
+        return f"history line not found, {scan.pages_read} page(s) read"
+    return f"history '{scan.pattern}' on page {scan.page}, {scan.pages_read} page(s) read"
+
+
+def format_summary(results):
+    lines = []
+    seen = {}
+    for i, result in enumerate(results, start=1):
+        if result["ok"]:
+            status = "SKIPPED" if result["skipped"] else "OK     "
+            note = " (unchanged)" if result["skipped"] else " (from index)" if result["indexed"] else ""
+            lines.append(f"{status} row {i}: {result['filename']}{note}")
+            if result["filename"] in seen:
+                lines.append(f"        warning: overwrote output of row {seen[result['filename']]} with the same filename")
+            seen[result["filename"]] = i
+        else:
+            lines.append(f"FAILED  row {i} ({result['pdf']}): {result['error']}")
+        for report in result["validation"]:
+            if not report["valid"]:
+                lines.append(f"        INVALID {report['kind']} output:")
+                lines += [f"    {line}" for line in validate.format_report(report).splitlines()[1:]]
+        if result["history"]:
+            lines.append(f"        {result['history']}")
+        for level, message in result["messages"]:
+            lines.append(f"        {level}: {message}")
+    succeeded = sum(1 for r in results if r["ok"])
+    invalid = sum(1 for r in results if r["ok"] and not passed(r))
+    skipped = sum(1 for r in results if r["skipped"])
+    indexed = sum(1 for r in results if r["ok"] and r["indexed"])
+    lines.append(f"{succeeded} succeeded, {len(results) - succeeded} failed, {len(results)} total"
+                 + (f"; {skipped} skipped as unchanged" if skipped else "")
+                 + (f"; {indexed} reused from the index" if indexed else "")
+                 + (f"; {invalid} with invalid output" if invalid else ""))
+    return "\n".join(lines)
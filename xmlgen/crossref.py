@@ -0,0 +1,245 @@
+"""Article metadata by DOI from a Crossref-compatible REST endpoint.
+
+Without this, the publication date comes from scraping each article page and
+volume and issue are guessed from the DOI string when the input XML lacks them.
+With ``configure(enabled=True)`` (``--metadata`` on the command line, or
+``XMLGEN_METADATA_URL``) ``lookup_many`` resolves a whole issue's DOIs in a few
+batched ``GET <endpoint>/works?filter=doi:A,doi:B,...`` requests instead. It
+fills in the publication date, volume, issue and pages, and stores each work in
+``<cache_dir>/crossref.sqlite3`` for ``ttl`` seconds. DOIs the endpoint doesn't
+know are cached for ``miss_ttl``.
+
+Crossref has no article keywords, so by default the article page is still
+scraped for them. With ``scrape_keywords=False`` a page is only scraped when
+the metadata lacks a full publication date. Where both are available the
+metadata wins and the page fills the gaps (``merge_page``). A failed request
+never fails an article: its DOIs simply fall back to scraping.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from pathlib import Path
+from urllib.parse import quote, urlencode
+
+from xmlgen import fetch, metrics, scrape, sqlitedb
+
+DEFAULT_ENDPOINT = "https://api.crossref.org"
+FIELDS = ("DOI", "published-online", "published", "issued", "volume", "issue", "page")
+
+# published is a (year, month, day) tuple of strings like scrape.ArticlePage's, or None
+Work = namedtuple("Work", ["doi", "published", "volume", "issue", "first_page", "last_page"])
+
+_config = {
+    "enabled": bool(os.environ.get("XMLGEN_METADATA_URL")),
+    "endpoint": os.environ.get("XMLGEN_METADATA_URL") or DEFAULT_ENDPOINT,
+    "mailto": os.environ.get("XMLGEN_METADATA_MAILTO") or None,
+    "cache_dir": os.environ.get("XMLGEN_CACHE_DIR", str(Path.home() / ".cache" / "xmlgen")),
+    "use_cache": True,
+    "ttl": 7 * 24 * 3600,
+    "miss_ttl": 3600,
+    "batch_size": 20,
+    "concurrency": 2,
+    "timeout": 30.0,
+    "scrape_keywords": True,
+}
+_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS works (
+    doi TEXT PRIMARY KEY,
+    work TEXT,
+    fetched REAL NOT NULL
+);
+"""
+
+
+def configure(**options):
+    """Override metadata settings (enabled, endpoint, mailto, cache_dir, use_cache, ttl, miss_ttl,
+    batch_size, concurrency, timeout, scrape_keywords)"""
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise TypeError(f"Unknown metadata option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        sqlitedb.close(db_path())
+        _config.update({k: v for k, v in options.items() if v is not None})
+
+
+def enabled():
+    return _config["enabled"]
+
+
+def source():
+    """What the metadata comes from, for fingerprints; None when disabled"""
+    return [_config["endpoint"], _config["scrape_keywords"]] if _config["enabled"] else None
+
+
+def normalize_doi(doi):
+    """Lower-cased DOI without a resolver prefix, or None"""
+    if not doi:
+        return None
+    doi = re.sub(r"^(https?://(dx\.)?doi\.org/|doi:)", "", doi.strip(), flags=re.I)
+    return doi.lower() or None
+
+
+def doi_of(xml_content):
+    """The DOI in an input XML (bytes or a path), or None"""
+    if isinstance(xml_content, (bytes, bytearray)):
+        root = ET.fromstring(xml_content)
+    else:
+        root = ET.parse(xml_content).getroot()
+    return normalize_doi(root.findtext(".//ELocationID[@EIdType='doi']"))
+
+
+def row_doi(row):
+    """A batch row's DOI: its mapping ``doi`` column, else the one in its input XML"""
+    try:
+        return normalize_doi(row.get("doi")) or doi_of(row.get("article_xml") or row["xml"])
+    except (OSError, ET.ParseError):
+        return None  # Processing the row reports the problem
+
+
+def _date(item):
+    for field in ("published-online", "published", "issued"):
+        parts = (item.get(field) or {}).get("date-parts") or [[]]
+        if len(parts[0]) == 3 and all(isinstance(p, int) for p in parts[0]):
+            year, month, day = parts[0]
+            return str(year), f"{month:02d}", f"{day:02d}"
+    return None
+
+
+def parse_work(item):
+    """Work from one Crossref ``message`` item"""
+    first = last = None
+    pages = re.split(r"\s*[-–]\s*", str(item.get("page") or "").strip())
+    if pages[0].isdigit():
+        first = int(pages[0])
+        last = int(pages[-1]) if pages[-1].isdigit() else first
+    return Work(normalize_doi(item.get("DOI")), _date(item), str(item.get("volume") or "").strip() or None,
+                str(item.get("issue") or "").strip() or None, first, last)
+
+
+def db_path():
+    return Path(_config["cache_dir"]) / "crossref.sqlite3"
+
+
+def _connection():
+    return sqlitedb.connect(db_path(), SCHEMA)
+
+
+def _work_from_json(text):
+    work = Work(*json.loads(text))
+    return work._replace(published=tuple(work.published) if work.published else None)
+
+
+def _cached(dois):
+    """{doi: Work or None} for the DOIs with a fresh cache entry"""
+    now = time.time()
+    found = {}
+    with _lock:
+        conn = _connection()
+        for doi in dois:
+            row = conn.execute("SELECT work, fetched FROM works WHERE doi = ?", (doi,)).fetchone()
+            if row is not None and now - row[1] < (_config["ttl"] if row[0] else _config["miss_ttl"]):
+                found[doi] = _work_from_json(row[0]) if row[0] else None
+    return found
+
+
+def _store(works):
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        conn.executemany("INSERT OR REPLACE INTO works VALUES (?, ?, ?)",
+                         [(doi, json.dumps(work) if work else None, now) for doi, work in works.items()])
+
+
+def _query_url(dois):
+    if len(dois) == 1:
+        return f"{_config['endpoint'].rstrip('/')}/works/{quote(dois[0], safe='/')}"
+    params = {"filter": ",".join(f"doi:{doi}" for doi in dois), "rows": len(dois), "select": ",".join(FIELDS)}
+    if _config["mailto"]:
+        params["mailto"] = _config["mailto"]
+    return f"{_config['endpoint'].rstrip('/')}/works?{urlencode(params)}"
+
+
+def _request(url):
+    """Works from one request ({doi: Work}), or None when it failed"""
+    try:
+        with metrics.span("metadata_request"):
+            response = fetch.get_session().get(url, timeout=_config["timeout"])
+        metrics.count("metadata_requests", status=response.status_code)
+        if response.status_code == 404:
+            return {}
+        response.raise_for_status()
+        message = response.json()["message"]
+        items = message.get("items", [message]) if isinstance(message, dict) else []
+    except Exception:
+        metrics.count("metadata_failures")
+        return None
+    works = (parse_work(item) for item in items if isinstance(item, dict))
+    return {work.doi: work for work in works if work.doi}
+
+
+def lookup_many(dois):
+    """{normalized DOI: Work} for the DOIs the endpoint (or the cache) knows; never raises
+
+    Uncached DOIs are requested ``batch_size`` at a time. DOIs with a comma
+    can't go in a filter and get a request of their own.
+    """
+    wanted = list(dict.fromkeys(filter(None, map(normalize_doi, dois))))
+    if not wanted:
+        return {}
+    with metrics.span("metadata_lookup"):
+        found = {}
+        if _config["use_cache"]:
+            try:
+                found = _cached(wanted)
+            except (sqlite3.Error, OSError):
+                pass  # A broken cache must never fail processing
+        metrics.count("metadata_cache", len(found), result="hit")
+        missing = [doi for doi in wanted if doi not in found]
+        metrics.count("metadata_cache", len(missing), result="miss")
+
+        plain = [doi for doi in missing if "," not in doi]
+        groups = [plain[i:i + _config["batch_size"]] for i in range(0, len(plain), _config["batch_size"])]
+        groups += [[doi] for doi in missing if "," in doi]
+        urls = {_query_url(group): group for group in groups}
+        replies = scrape.run_per_host(_request, list(urls), per_host=_config["concurrency"])
+        fetched = {}
+        for url, group in urls.items():
+            if replies.get(url) is not None:
+                # Every DOI of a successful request is answered, known or not
+                fetched.update({doi: replies[url].get(doi) for doi in group})
+        if _config["use_cache"] and fetched:
+            try:
+                _store(fetched)
+            except (sqlite3.Error, OSError):
+                pass
+        found.update(fetched)
+    return {doi: work for doi, work in found.items() if work is not None}
+
+
+def lookup(doi):
+    """Work for one DOI, or None"""
+    return lookup_many([doi]).get(normalize_doi(doi))
+
+
+def needs_page(work):
+    """Whether the article page has to be scraped as well as (or instead of) using ``work``"""
+    return work is None or work.published is None or _config["scrape_keywords"]
+
+
+def merge_page(url, page, work):
+    """The ArticlePage to build from: ``work``'s publication date, the page's keywords
+
+    ``page`` may be None when it wasn't scraped; a failed page is fine as long
+    as the metadata has the date.
+    """
+    if work is None or work.published is None:
+        return page
+    keywords = page.keywords if page is not None and page.error is None else []
+    return scrape.ArticlePage(url, work.published, list(keywords), None)
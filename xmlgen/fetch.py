@@ -0,0 +1,302 @@
+"""Shared HTTP fetch layer: one pooled session plus a persistent response cache.
+
+Every article page goes through ``fetch(url)``. Responses are kept in a small
+in-memory LRU and on disk under ``<cache_dir>/http``. A disk entry
+younger than the TTL is served without touching the network; an older one is
+revalidated with ``If-None-Match``/``If-Modified-Since`` and reused on a 304.
+
+``fetch_until(url, make_scanner)`` streams the body into a scanner and closes
+the connection as soon as the scanner has what it needs. The prefix read so far
+is cached as a partial entry: it answers later scans but never a full ``fetch``.
+
+Settings come from ``configure()`` or the ``XMLGEN_CACHE_DIR``,
+``XMLGEN_HTTP_TTL`` (seconds) and ``XMLGEN_HTTP_TIMEOUT`` environment variables.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+from xmlgen import metrics
+
+# complete is False when content is only the prefix read before an early stop
+FetchResult = namedtuple("FetchResult", ["url", "status_code", "content", "from_cache", "complete"], defaults=(True,))
+
+USER_AGENT = "Journal-Article-XML-Generator"
+CHUNK_SIZE = 16 * 1024
+
+_config = {
+    "cache_dir": os.environ.get("XMLGEN_CACHE_DIR", str(Path.home() / ".cache" / "xmlgen")),
+    "ttl": float(os.environ.get("XMLGEN_HTTP_TTL", 24 * 3600)),
+    "timeout": float(os.environ.get("XMLGEN_HTTP_TIMEOUT", 30)),
+    "retries": 3,
+    "backoff": 0.5,
+    "pool_size": 10,
+    "use_cache": True,
+    "memory_entries": 256,
+}
+_session = None
+_memory = OrderedDict()  # url -> (stored_at, FetchResult), least recently used first
+_lock = threading.Lock()
+
+
+def configure(**options):
+    """Override fetch settings (cache_dir, ttl, timeout, retries, backoff, pool_size, use_cache, memory_entries)"""
+    global _session
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise TypeError(f"Unknown fetch option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        _config.update({k: v for k, v in options.items() if v is not None})
+        _session = None
+        _memory.clear()
+
+
+def get_session():
+    """Process-wide keep-alive session with retries and exponential backoff"""
+    global _session
+    with _lock:
+        if _session is None:
+            # requests is only imported once something is actually downloaded
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=_config["retries"],
+                backoff_factor=_config["backoff"],
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET", "HEAD"),
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(pool_connections=_config["pool_size"], pool_maxsize=_config["pool_size"], max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base = Path(_config["cache_dir"]) / "http"
+    return base / f"{key}.body", base / f"{key}.json"
+
+
+def _atomic_write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _read_cache(url):
+    body_path, meta_path = _cache_paths(url)
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("url") != url:
+            return None, None
+        return meta, body_path.read_bytes()
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_cache(url, response, body, complete=True):
+    body_path, meta_path = _cache_paths(url)
+    meta = {
+        "url": url,
+        "status_code": response.status_code,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+        "complete": complete,
+    }
+    try:
+        # Body first: a metadata file is only ever written next to a complete body
+        _atomic_write(body_path, body)
+        _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+    except OSError:
+        pass  # The cache is an optimisation; a read-only disk must not fail the fetch
+
+
+def _touch_cache(url, meta):
+    _, meta_path = _cache_paths(url)
+    meta = dict(meta, fetched_at=time.time())
+    try:
+        _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+    except OSError:
+        pass
+
+
+def _record_response(response, body_bytes):
+    """Count one network response: status, body bytes read and urllib3 retries"""
+    metrics.count("http_requests", status=response.status_code)
+    metrics.count("http_bytes", body_bytes)
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    if retries is not None and retries.history:
+        metrics.count("http_retries", len(retries.history))
+
+
+def _from_memory(url, partial_ok):
+    with _lock:
+        stored_at, cached = _memory.get(url, (0, None))
+        if cached is None or time.time() - stored_at >= _config["ttl"] or not (cached.complete or partial_ok):
+            return None
+        _memory.move_to_end(url)
+    return cached._replace(from_cache=True)
+
+
+def _from_disk(url, partial_ok):
+    """(fresh cached FetchResult or None, stale metadata, stale body, conditional request headers)"""
+    meta, body = _read_cache(url)
+    if meta is None:
+        return None, None, None, {}
+    complete = meta.get("complete", True)
+    if time.time() - meta["fetched_at"] < _config["ttl"] and (complete or partial_ok):
+        return FetchResult(url, meta["status_code"], body, True, complete), None, None, {}
+    if not complete:
+        return None, None, None, {}  # A 304 can't be answered from a prefix
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return None, meta, body, headers
+
+
+def fetch(url):
+    """GET a page through the memory cache, the disk cache and finally the network"""
+    cached = _from_memory(url, partial_ok=False)
+    if cached is not None:
+        metrics.count("http_cache", result="memory_hit")
+        return cached
+
+    headers = {}
+    meta = body = None
+    if _config["use_cache"]:
+        cached, meta, body, headers = _from_disk(url, partial_ok=False)
+        if cached is not None:
+            metrics.count("http_cache", result="disk_hit")
+            return _remember(cached)
+
+    with metrics.span("http_get"):
+        response = get_session().get(url, headers=headers, timeout=_config["timeout"])
+        content = response.content
+    _record_response(response, len(content))
+
+    if response.status_code == 304 and meta is not None:
+        metrics.count("http_cache", result="revalidated")
+        _touch_cache(url, meta)
+        return _remember(FetchResult(url, meta["status_code"], body, True))
+
+    metrics.count("http_cache", result="miss")
+    if _config["use_cache"] and response.status_code == 200:
+        _write_cache(url, response, content)
+    return _remember(FetchResult(url, response.status_code, content, False))
+
+
+def fetch_until(url, make_scanner, chunk_size=CHUNK_SIZE):
+    """Stream a page into ``make_scanner()`` and stop downloading once it has seen enough
+
+    The scanner's ``feed(chunk)`` returns True when it needs no more bytes. A
+    cached body, even a prefix left by an earlier early stop, is scanned first;
+    the network is used only when that is stale or doesn't finish the scan.
+    Returns (FetchResult, scanner).
+    """
+    cached = _from_memory(url, partial_ok=True)
+    if cached is not None:
+        scanner = make_scanner()
+        if scanner.feed(cached.content) or cached.complete:
+            metrics.count("http_cache", result="memory_hit")
+            return cached, scanner
+
+    headers = {}
+    meta = body = None
+    if _config["use_cache"]:
+        cached, meta, body, headers = _from_disk(url, partial_ok=True)
+        if cached is not None:
+            scanner = make_scanner()
+            if scanner.feed(cached.content) or cached.complete:
+                metrics.count("http_cache", result="disk_hit")
+                return _remember(cached), scanner
+
+    scanner = make_scanner()
+    chunks = []
+    complete = True
+    with (
+        metrics.span("http_get"),
+        get_session().get(url, headers=headers, timeout=_config["timeout"], stream=True) as response,
+    ):
+        if response.status_code == 304 and meta is not None:
+            _record_response(response, 0)
+            metrics.count("http_cache", result="revalidated")
+            _touch_cache(url, meta)
+            scanner.feed(body)
+            return _remember(FetchResult(url, meta["status_code"], body, True)), scanner
+        for chunk in response.iter_content(chunk_size):
+            chunks.append(chunk)
+            if scanner.feed(chunk):
+                complete = False  # Closing the response drops the rest of the body unread
+                break
+
+    content = b"".join(chunks)
+    _record_response(response, len(content))
+    metrics.count("http_cache", result="miss")
+    if not complete and response.headers.get("Content-Length", "").isdigit():
+        metrics.count("http_bytes_skipped", max(0, int(response.headers["Content-Length"]) - len(content)))
+    if _config["use_cache"] and response.status_code == 200:
+        _write_cache(url, response, content, complete)
+    return _remember(FetchResult(url, response.status_code, content, False, complete)), scanner
+
+
+def download(url, path=None, chunk_size=1 << 20):
+    """GET a file (e.g. a PDF galley) past the page caches; raises on a non-200 response
+
+    With ``path`` the body is streamed to that file atomically and the path is
+    returned, otherwise the body is returned as bytes.
+    """
+    with metrics.span("download"), get_session().get(url, timeout=_config["timeout"], stream=True) as response:
+        if response.status_code != 200:
+            _record_response(response, 0)
+            raise ValueError(f"HTTP {response.status_code} for {url}")
+        if path is None:
+            content = response.content
+            _record_response(response, len(content))
+            return content
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        try:
+            written = 0
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+                    written += len(chunk)
+            os.replace(tmp, path)
+            _record_response(response, written)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return path
+
+
+def _remember(result):
+    if result.status_code == 200:
+        with _lock:
+            _memory[result.url] = (time.time(), result)
+            _memory.move_to_end(result.url)
+            while len(_memory) > _config["memory_entries"]:
+                _memory.popitem(last=False)
+    return result
@@ -0,0 +1,177 @@
+"""Issue table-of-contents harvester for OJS-style journal sites.
+
+``harvest_issue(toc_url)`` reads an issue TOC page, collects every article
+page link (``.../article/view/<id>``) and PDF galley link
+(``.../article/view/<id>/<galley>``), then scans all article pages
+concurrently for their ``citation_doi``, ``citation_firstpage`` and
+``citation_pdf_url`` meta tags. The result is a list of mapping rows in the
+``articleset`` format, so harvested articles pair with the entries of an
+ArticleSet XML exactly like a hand-written mapping CSV. Article pages go through
+``fetch.fetch_until``, which leaves them in the page cache for the later
+scrape. ``download_pdfs`` then fetches the PDFs with the same per-host limits.
+"""
+import csv
+import re
+import shutil
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from xmlgen import fetch, scrape
+
+MAPPING_FIELDS = ("doi", "first_page", "pdf", "article_url", "pdf_link")
+
+_ARTICLE_RE = re.compile(r"/article/view/([^/]+)/?$")
+_GALLEY_RE = re.compile(r"/article/(?:view|download)/([^/]+)/([^/]+)/?$")
+
+
+class _LinkCollector(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []  # (href, class, text), in page order
+        self.current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            attrs = dict(attrs)
+            if attrs.get("href"):
+                self.current = [attrs["href"], attrs.get("class") or "", []]
+
+    def handle_data(self, data):
+        if self.current is not None:
+            self.current[2].append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self.current is not None:
+            href, cls, text = self.current
+            self.links.append((href, cls, "".join(text).strip()))
+            self.current = None
+
+
+def _clean(url):
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+def _is_pdf_galley(cls, text):
+    return "pdf" in cls.lower().split() or "pdf" in text.lower()
+
+
+def parse_toc(toc_url, content):
+    """[(article_url, galley_url or None)] for every article linked from a TOC page, in page order"""
+    collector = _LinkCollector()
+    collector.feed(content.decode("utf-8", errors="replace") if isinstance(content, bytes) else content)
+    collector.close()
+
+    articles = {}  # article id -> [article_url, galley_url, galley is a PDF]
+    for href, cls, text in collector.links:
+        url = _clean(urljoin(toc_url, href))
+        path = urlsplit(url).path
+        match = _ARTICLE_RE.search(path)
+        if match:
+            articles.setdefault(match.group(1), [url, None, False])
+            continue
+        match = _GALLEY_RE.search(path)
+        if match:
+            entry = articles.setdefault(match.group(1), [url[:url.rindex("/" + match.group(2))], None, False])
+            is_pdf = _is_pdf_galley(cls, text)
+            # Keep the first PDF galley; any galley is better than none
+            if entry[1] is None or (is_pdf and not entry[2]):
+                entry[1], entry[2] = url, is_pdf
+    return [(url, galley) for url, galley, _ in articles.values()]
+
+
+def download_url(galley_url):
+    """The direct download URL of an OJS galley (``view`` -> ``download``)"""
+    return galley_url.replace("/article/view/", "/article/download/", 1)
+
+
+def _scan_article(url):
+    _, scanner = fetch.fetch_until(url, scrape.PageScanner)
+    scanner.close()
+    return scanner.citation
+
+
+def harvest_issue(toc_url, per_host=4, delay=0.0):
+    """Mapping rows for every article of an issue TOC; returns (rows, problems)
+
+    Rows carry ``doi``, ``first_page``, ``pdf`` (a file name for the PDF, see
+    ``download_pdfs``), ``article_url`` and ``pdf_link``. Articles without a PDF
+    or whose page couldn't be read are left out and described in ``problems``.
+    """
+    response = fetch.fetch(toc_url)
+    if response.status_code != 200:
+        raise ValueError(f"Could not read the issue TOC: HTTP {response.status_code}")
+    entries = parse_toc(toc_url, response.content)
+    if not entries:
+        raise ValueError("No article links found on the issue TOC page")
+
+    def scan(url):
+        try:
+            return _scan_article(url)
+        except Exception as e:
+            return e
+
+    scans = scrape.run_per_host(scan, [url for url, _ in entries], per_host=per_host, delay=delay)
+    rows, problems = [], []
+    for url, galley in entries:
+        citation = scans[url]
+        if isinstance(citation, Exception):
+            problems.append(f"{url}: could not read the article page: {citation}")
+            continue
+        pdf_link = (citation.get("citation_pdf_url") or [""])[0] or (download_url(galley) if galley else "")
+        if not pdf_link:
+            problems.append(f"{url}: no PDF galley found")
+            continue
+        article_id = _ARTICLE_RE.search(urlsplit(url).path).group(1)
+        rows.append({
+            "doi": (citation.get("citation_doi") or [""])[0].strip(),
+            "first_page": (citation.get("citation_firstpage") or [""])[0].strip(),
+            "pdf": f"{article_id}.pdf",
+            "article_url": url,
+            "pdf_link": pdf_link,
+        })
+    return rows, problems
+
+
+def download_pdfs(rows, dest_dir=None, per_host=4, delay=0.0):
+    """Download every row's ``pdf_link``; returns ({row pdf name: path or bytes}, problems)
+
+    With ``dest_dir`` each PDF is saved there under the row's ``pdf`` name and
+    its path is returned; otherwise the PDF bytes are kept in memory. A link
+    shared by several rows is downloaded once, copied to each of their names and
+    reported in ``problems``.
+    """
+    names = {}  # pdf_link -> the pdf names of its rows, in row order
+    for row in rows:
+        names.setdefault(row["pdf_link"], []).append(row["pdf"])
+
+    def get(url):
+        try:
+            return fetch.download(url, None if dest_dir is None else f"{dest_dir}/{names[url][0]}")
+        except Exception as e:
+            return e
+
+    downloaded = scrape.run_per_host(get, list(names), per_host=per_host, delay=delay)
+    pdfs, problems = {}, []
+    for url, result in downloaded.items():
+        first, *others = names[url]
+        if others:
+            problems.append(f"{', '.join(names[url])}: share the PDF link {url}")
+        if isinstance(result, Exception):
+            problems.extend(f"{name}: could not download {url}: {result}" for name in names[url])
+            continue
+        pdfs[first] = str(result) if dest_dir is not None else result
+        for name in others:
+            if dest_dir is None:
+                pdfs[name] = result
+            else:
+                pdfs[name] = str(shutil.copyfile(result, f"{dest_dir}/{name}"))
+    return pdfs, problems
+
+
+def write_mapping(rows, path):
+    """Save harvested rows as a mapping CSV that ``articleset.read_mapping`` reads back"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=MAPPING_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
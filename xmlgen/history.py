@@ -0,0 +1,121 @@
+"""Single-pass scanner for the "Received ... Accepted ..." history line in article PDFs.
+
+The five history-line layouts are merged into one compiled alternation, so
+each chunk of text is scanned once instead of five times. Pages are visited in
+the order the line usually appears (the first few pages, then the last few,
+then the rest) and can be capped with a page budget. Only the text blocks
+around a "Received"/"Accepted"/"Revised" keyword are regex-scanned.
+
+The result is still the one a front-to-back scan gives: the line on the
+earliest page. A PDF of several papers has several lines, so after a match only
+the unread pages before it are scanned; within the budget, the earliest
+matching page read wins.
+"""
+import re
+from collections import namedtuple
+
+from xmlgen import metrics
+
+# Bump whenever a change here can alter results; it is part of the pdfcache key
+EXTRACTOR_VERSION = "3"
+
+COMBINED_DATE = r"(?:[A-Za-z]{3,9}\s+\d{1,2},?\s*\d{4}|\d{1,2}\s+[A-Za-z]{3,9},?\s*\d{4})"
+
+# (name, pattern) in priority order; each pattern has one received and one accepted group
+HISTORY_PATTERNS = [
+    ("comma", r"Received\s*[:\-]?\s*(?P<r0>{d}),\s*Accepted\s*[:\-]?\s*(?P<a0>{d})"),
+    ("space", r"Received\s+(?P<r1>{d})\s+Accepted\s+(?P<a1>{d})"),
+    ("on-semicolon", r"Received\s+on\s+(?P<r2>{d})\s*;\s*Accepted\s+on\s+(?P<a2>{d})"),
+    ("pipe", r"Received[:\-]?\s*(?P<r3>{d})\s*\|\s*(?:Revised[:\-]?\s*{d}\s*\|\s*)?Accepted[:\-]?\s*(?P<a3>{d})"),
+    ("semicolon", r"Received\s*[:\-]?\s*(?P<r4>{d})\s*;\s*Accepted\s*[:\-]?\s*(?P<a4>{d})"),
+]
+HISTORY_RE = re.compile(
+    "|".join(f"(?:{pattern.format(d=COMBINED_DATE)})" for _, pattern in HISTORY_PATTERNS),
+    re.IGNORECASE,
+)
+KEYWORDS = ("received", "accepted", "revised")
+
+# Separates non-adjacent block runs; not whitespace, so no pattern can match across it
+_RUN_BREAK = "\n\x00\n"
+
+HistoryScan = namedtuple("HistoryScan", ["received", "accepted", "pattern", "page", "pages_read"])
+
+
+def page_order(page_count, head=3, tail=2):
+    """Indexes of the first ``head`` pages, then the last ``tail``, then everything in between"""
+    first = list(range(min(head, page_count)))
+    last = [i for i in range(max(page_count - tail, 0), page_count) if i not in first]
+    middle = range(len(first), page_count - len(last))
+    return first + last + list(middle)
+
+
+def candidate_text(page):
+    """Text of the blocks around history keywords, adjacent blocks joined as in ``page.get_text()``"""
+    blocks = [b[4] for b in page.get_text("blocks") if b[6] == 0]
+    wanted = set()
+    for i, text in enumerate(blocks):
+        lowered = text.lower()
+        if any(keyword in lowered for keyword in KEYWORDS):
+            # Neighbours too: a date may sit in its own block next to its label
+            wanted.update((i - 1, i, i + 1))
+    runs, previous = [], None
+    for i in sorted(j for j in wanted if 0 <= j < len(blocks)):
+        if previous is not None and i != previous + 1:
+            runs.append(_RUN_BREAK)
+        runs.append(blocks[i])
+        previous = i
+    return "".join(runs)
+
+
+def best_match(text):
+    """The match of the highest-priority pattern in ``text`` (earliest one for ties)"""
+    best = None
+    for match in HISTORY_RE.finditer(text):
+        index = int(match.lastgroup[1:])
+        if best is None or index < best[0]:
+            best = (index, match)
+            if index == 0:
+                break
+    return best
+
+
+def scan_history(doc, page_budget=None, head=3, tail=2):
+    """Scan an open ``fitz.Document`` (or a path, or the PDF bytes) for the history line
+
+    Returns a ``HistoryScan`` whose ``received``/``accepted`` are the raw date
+    strings, or None for both when no line was found within ``page_budget`` pages.
+    """
+    import fitz  # PyMuPDF, loaded only once a PDF actually has to be read
+
+    if not isinstance(doc, fitz.Document):
+        if isinstance(doc, (bytes, bytearray, memoryview)):
+            opened = fitz.open(stream=bytes(doc), filetype="pdf")
+        else:
+            opened = fitz.open(doc)
+        with opened:
+            return scan_history(opened, page_budget, head, tail)
+
+    order = page_order(doc.page_count, head, tail)
+    if page_budget is not None:
+        order = order[:page_budget]
+
+    earliest = None  # (page index, pattern index, match)
+    pages_read = 0
+    for page_index in order:
+        if earliest is not None and page_index > earliest[0]:
+            continue  # Only an earlier page can change the result
+        pages_read += 1
+        found = best_match(candidate_text(doc[page_index]))
+        if found:
+            earliest = (page_index, *found)
+    metrics.count("pdf_pages_scanned", pages_read)
+    if earliest is None:
+        return HistoryScan(None, None, None, None, pages_read)
+    page_index, index, match = earliest
+    return HistoryScan(
+        match.group(f"r{index}").strip(),
+        match.group(f"a{index}").strip(),
+        HISTORY_PATTERNS[index][0],
+        page_index + 1,
+        pages_read,
+    )
@@ -0,0 +1,96 @@
+"""Fingerprints for incremental batch runs.
+
+``batch.run_batch(..., incremental_run=True)`` (``--incremental``) keeps
+``<out>/.xmlgen-incremental.json`` with one entry per article (keyed by article
+URL): the fingerprint of its inputs, its output filename, and the history and
+validation of the run that produced it. On the next run, an article whose fingerprint matches and whose
+outputs are still on disk is skipped: no page fetch, PDF scan, build or
+combine.
+
+The fingerprint is a SHA-256 over the PDF, input XML and template contents,
+the article URL and the rest of the row (PDF link, fallback dates), the run
+options that change output (page budget, schemas), and the code version: a
+digest of the ``xmlgen`` sources, so any code change regenerates everything.
+Failed articles are never recorded, so they are always retried.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from xmlgen import pdfcache, validate
+
+STATE_FILE = ".xmlgen-incremental.json"
+
+
+@lru_cache(maxsize=1)
+def code_version():
+    """Digest of every module in the ``xmlgen`` package"""
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).resolve().parent.glob("*.py")):
+        digest.update(path.name.encode("utf-8") + b"\0" + path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _file_digest(path):
+    return pdfcache.pdf_digest(path) if path else None
+
+
+def row_key(row):
+    return row.get("article_url") or str(row["pdf"])
+
+
+def fingerprint(row, template_path=None, options=None):
+    """Hex digest of everything that determines this row's outputs"""
+    xml = row.get("article_xml")
+    parts = {
+        "pdf": pdfcache.pdf_digest(row["pdf"]),
+        "xml": hashlib.sha256(xml).hexdigest() if xml else _file_digest(row["xml"]),
+        "template": _file_digest(template_path),
+        "article_url": row.get("article_url", ""),
+        "pdf_link": row.get("pdf_link", ""),
+        "received": row.get("received", ""),
+        "accepted": row.get("accepted", ""),
+        "options": options or {},
+        "code": code_version(),
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def schema_options():
+    """The validation settings in effect as fingerprint options, schema files by content
+
+    Read after ``validate.configure``, so a schema that comes from
+    ``XMLGEN_JATS_SCHEMA`` counts as much as one given explicitly.
+    """
+    settings = validate.settings()
+    return {
+        "validate": settings["enabled"],
+        "combined_schema": _file_digest(settings["combined_schema"]),
+        "processed_schema": _file_digest(settings["processed_schema"]),
+    }
+
+
+def load_state(out_dir):
+    try:
+        with open(Path(out_dir) / STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(out_dir, state):
+    out_dir = Path(out_dir)
+    fd, tmp = tempfile.mkstemp(dir=out_dir, prefix=STATE_FILE, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, out_dir / STATE_FILE)
+
+
+def outputs_present(out_dir, entry, template_path=None):
+    out_dir = Path(out_dir)
+    if not (out_dir / entry["filename"]).is_file():
+        return False
+    return not template_path or (out_dir / "combined" / entry["filename"]).is_file()
@@ -0,0 +1,230 @@
+"""Background job queue: long submissions run on a worker pool, off the UI thread.
+
+``JobQueue.submit(kind, func, *args)`` returns a job ID at once; at most
+``max_concurrent`` jobs run at a time and further submissions wait in line
+(``QueueFull`` is raised past ``max_queued``). ``func(job, *args)`` reports
+per-stage progress through ``job.stage(name)`` and ``job.advance(stage, done,
+total)``, and returns a picklable result.
+
+Job state is written to ``<cache_dir>/jobs/<id>/job.json`` on every change and
+the result to ``result.pickle``, so a page reload - or another process - can
+poll the job and fetch its result by ID. Jobs older than ``ttl`` seconds are
+removed. Submitting with the same ``key`` as a queued or running job, or one
+that finished less than ``reuse`` seconds ago, returns that job instead of
+starting another; failed jobs are never reused.
+
+Settings come from ``configure()`` or the ``XMLGEN_MAX_JOBS`` and
+``XMLGEN_JOB_TTL`` (seconds) environment variables.
+"""
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from xmlgen import metrics
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+PENDING, STAGE_RUNNING, STAGE_DONE, STAGE_FAILED = "pending", "running", "done", "failed"
+
+_config = {
+    "cache_dir": os.environ.get("XMLGEN_CACHE_DIR", str(Path.home() / ".cache" / "xmlgen")),
+    "max_concurrent": int(os.environ.get("XMLGEN_MAX_JOBS", 2)),
+    "max_queued": 50,
+    "ttl": float(os.environ.get("XMLGEN_JOB_TTL", 24 * 3600)),
+    "reuse": 600,
+}
+
+
+class QueueFull(Exception):
+    """Too many jobs are already waiting; the caller should try again later"""
+
+
+def configure(**options):
+    """Override queue settings (cache_dir, max_concurrent, max_queued, ttl, reuse) for queues created afterwards"""
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise TypeError(f"Unknown job option(s): {', '.join(sorted(unknown))}")
+    _config.update({k: v for k, v in options.items() if v is not None})
+
+
+def _atomic_write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Job:
+    """One submission; ``state`` is the JSON-friendly view that gets persisted"""
+
+    def __init__(self, queue, job_id, kind, key, stages):
+        self.queue = queue
+        self.id = job_id
+        self.directory = queue.root / job_id  # For files the job writes; removed with the job
+        self.state = {
+            "id": job_id,
+            "kind": kind,
+            "key": key,
+            "status": QUEUED,
+            "stages": {name: {"state": PENDING, "done": 0, "total": None} for name in stages},
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "error": None,
+            "messages": [],
+            "metrics": None,
+        }
+
+    def _update(self, **changes):
+        with self.queue.lock:
+            self.state.update(changes)
+        self.queue.save(self)
+
+    def _stage(self, name, **changes):
+        with self.queue.lock:
+            stage = self.state["stages"].setdefault(name, {"state": PENDING, "done": 0, "total": None})
+            stage.update(changes)
+        self.queue.save(self)
+
+    @contextmanager
+    def stage(self, name):
+        """Mark ``name`` running for the block and done after it, or failed if it raises"""
+        self._stage(name, state=STAGE_RUNNING)
+        try:
+            yield
+        except BaseException:
+            self._stage(name, state=STAGE_FAILED)
+            raise
+        self._stage(name, state=STAGE_DONE)
+
+    def advance(self, name, done, total=None):
+        """Progress inside a stage, e.g. articles processed so far"""
+        self._stage(name, state=STAGE_DONE if total is not None and done >= total else STAGE_RUNNING,
+                    done=done, total=total)
+
+    def report(self, level, message):
+        """A ``report`` callback that keeps warnings with the job"""
+        with self.queue.lock:
+            self.state["messages"].append([level, message])
+        self.queue.save(self)
+
+
+class JobQueue:
+    def __init__(self, max_concurrent=None, max_queued=None, cache_dir=None, ttl=None, reuse=None):
+        self.max_concurrent = max_concurrent or _config["max_concurrent"]
+        self.max_queued = max_queued or _config["max_queued"]
+        self.ttl = ttl if ttl is not None else _config["ttl"]
+        self.reuse = reuse if reuse is not None else _config["reuse"]
+        self.root = Path(cache_dir or _config["cache_dir"]) / "jobs"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="xmlgen-job")
+        self.lock = threading.RLock()
+        self.jobs = {}  # id -> Job, for jobs submitted to this queue
+        self.by_key = {}
+
+    def submit(self, kind, func, *args, key=None, stages=()):
+        """Queue ``func(job, *args)``; returns the job ID"""
+        self.cleanup()
+        with self.lock:
+            existing = self.jobs.get(self.by_key.get(key))
+            if existing is not None and existing.state["status"] != FAILED:
+                finished = existing.state["finished"]
+                if finished is None or time.time() - finished < self.reuse:
+                    return existing.id
+            if sum(1 for job in self.jobs.values() if job.state["status"] == QUEUED) >= self.max_queued:
+                raise QueueFull(f"{self.max_queued} jobs are already waiting; please try again shortly")
+            job = Job(self, uuid.uuid4().hex, kind, key, stages)
+            self.jobs[job.id] = job
+            if key is not None:
+                self.by_key[key] = job.id
+        self.save(job)
+        self.executor.submit(self._run, job, func, args)
+        return job.id
+
+    def _run(self, job, func, args):
+        job._update(status=RUNNING, started=time.time())
+        with metrics.recording() as recorder:
+            try:
+                result = func(job, *args)
+                _atomic_write(self.root / job.id / "result.pickle", pickle.dumps(result))
+            except Exception as e:
+                job._update(status=FAILED, error=str(e) or type(e).__name__, finished=time.time(),
+                            metrics=recorder.snapshot())
+                return
+        job._update(status=DONE, finished=time.time(), metrics=recorder.snapshot())
+
+    def save(self, job):
+        directory = self.root / job.id
+        directory.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            data = json.dumps(job.state).encode("utf-8")
+        try:
+            _atomic_write(directory / "job.json", data)
+        except OSError:
+            pass  # Progress on disk is best effort; the in-memory state stays current
+
+    def get(self, job_id):
+        """The job's state dict, from memory or from disk, or None if unknown or expired"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                return json.loads(json.dumps(job.state))
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            state = json.loads((self.root / job_id / "job.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if state["status"] in (QUEUED, RUNNING):
+            # Submitted to a queue that no longer exists (e.g. the server restarted)
+            state.update(status=FAILED, error="The job was interrupted; please submit it again")
+        return state
+
+    def result(self, job_id):
+        """The value the job's function returned; only for jobs with status ``done``"""
+        with open(self.root / job_id / "result.pickle", "rb") as f:
+            return pickle.load(f)
+
+    def cleanup(self):
+        """Drop finished jobs older than the TTL, in memory and on disk"""
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.state["status"] in (DONE, FAILED) and (job.state["finished"] or 0) < cutoff:
+                    del self.jobs[job_id]
+            self.by_key = {k: v for k, v in self.by_key.items() if v in self.jobs}
+        try:
+            entries = list(self.root.iterdir())
+        except OSError:
+            return
+        for directory in entries:
+            try:
+                if directory.stat().st_mtime < cutoff and directory.name not in self.jobs:
+                    shutil.rmtree(directory, ignore_errors=True)
+            except OSError:
+                pass
+
+    def counts(self):
+        """{status: number of jobs} for the jobs this queue holds"""
+        counts = {}
+        with self.lock:
+            for job in self.jobs.values():
+                counts[job.state["status"]] = counts.get(job.state["status"], 0) + 1
+        return counts
+
+    def active(self):
+        """Number of queued and running jobs"""
+        counts = self.counts()
+        return counts.get(QUEUED, 0) + counts.get(RUNNING, 0)
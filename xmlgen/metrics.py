@@ -0,0 +1,159 @@
+"""Timing spans and counters for every pipeline stage.
+
+Stages wrap their work in ``with metrics.span("pdf_history"):`` and call
+``metrics.count("http_bytes", n)``; both go to the current ``Recorder``.
+``recording()`` installs a fresh recorder for a block (one app run, one batch
+row) through a context variable, so concurrent Streamlit sessions don't mix and
+worker threads started with a copied context report to the same place. Outside
+any ``recording()`` block a process-wide recorder, without the event log,
+collects everything.
+
+A recorder's ``snapshot()`` is plain data: batch workers return it with their
+result and the parent ``merge``s it. ``events`` holds one dict per finished
+span for structured JSON logs; ``prometheus_text`` renders a text dump in the
+Prometheus exposition format.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+PREFIX = "xmlgen"
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Recorder:
+    def __init__(self, keep_events=True):
+        self.counters = {}  # (name, labels) -> value
+        self.timings = {}  # (stage, labels) -> [count, total seconds, max seconds]
+        self.events = [] if keep_events else None
+        self.lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, stage, seconds, **labels):
+        key = _key(stage, labels)
+        with self.lock:
+            timing = self.timings.setdefault(key, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            if self.events is not None:
+                self.events.append({"ts": round(time.time(), 6), "event": "span", "stage": stage,
+                                    "seconds": round(seconds, 6), **labels})
+
+    def snapshot(self):
+        """Picklable, JSON-friendly copy of the counters and timings"""
+        with self.lock:
+            return {
+                "counters": [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                "timings": [[stage, dict(labels), *timing] for (stage, labels), timing in self.timings.items()],
+            }
+
+    def merge(self, snapshot):
+        for name, labels, value in snapshot["counters"]:
+            self.count(name, value, **labels)
+        with self.lock:
+            for stage, labels, count, total, longest in snapshot["timings"]:
+                timing = self.timings.setdefault(_key(stage, labels), [0, 0.0, 0.0])
+                timing[0] += count
+                timing[1] += total
+                timing[2] = max(timing[2], longest)
+
+
+_global = Recorder(keep_events=False)
+_current = ContextVar("xmlgen_metrics_recorder", default=None)
+
+
+def current():
+    return _current.get() or _global
+
+
+@contextmanager
+def recording(recorder=None):
+    """Send everything recorded in this block (and in threads given its context) to ``recorder``"""
+    recorder = recorder or Recorder()
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time the block as one ``stage`` observation, even when it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current().observe(stage, time.perf_counter() - start, **labels)
+
+
+def count(name, value=1, **labels):
+    current().count(name, value, **labels)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def prometheus_text(snapshot):
+    """The snapshot in the Prometheus text exposition format"""
+    lines = []
+    by_name = {}
+    for name, labels, value in snapshot["counters"]:
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        metric = f"{PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in sorted(by_name[name], key=lambda item: sorted(item[0].items())):
+            lines.append(f"{metric}{_labels(labels)} {value}")
+
+    timings = sorted(snapshot["timings"], key=lambda t: (t[0], sorted(t[1].items())))
+    if timings:
+        lines.append(f"# TYPE {PREFIX}_stage_seconds summary")
+        for stage, labels, count_, total, _ in timings:
+            lines.append(f"{PREFIX}_stage_seconds_sum{_labels(dict(labels, stage=stage))} {total:.6f}")
+            lines.append(f"{PREFIX}_stage_seconds_count{_labels(dict(labels, stage=stage))} {count_}")
+        lines.append(f"# TYPE {PREFIX}_stage_seconds_max gauge")
+        for stage, labels, _, _, longest in timings:
+            lines.append(f"{PREFIX}_stage_seconds_max{_labels(dict(labels, stage=stage))} {longest:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+def stage_table(snapshot):
+    """Rows of stage, calls, total ms, mean ms, max ms; the slowest stage first"""
+    rows = []
+    for stage, labels, count_, total, longest in snapshot["timings"]:
+        name = stage + "".join(f" [{k}={v}]" for k, v in sorted(labels.items()))
+        rows.append({"stage": name, "calls": count_, "total_ms": round(total * 1000, 2),
+                     "mean_ms": round(total / count_ * 1000, 2), "max_ms": round(longest * 1000, 2)})
+    return sorted(rows, key=lambda row: -row["total_ms"])
+
+
+def counter_table(snapshot):
+    return [{"counter": name + "".join(f" [{k}={v}]" for k, v in sorted(labels.items())), "value": value}
+            for name, labels, value in sorted(snapshot["counters"], key=lambda c: (c[0], sorted(c[1].items())))]
+
+
+def write_json_log(path, events, summary=None):
+    """Append span events (and a final summary snapshot) to ``path`` as JSON lines"""
+    with open(path, "a", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+        if summary is not None:
+            f.write(json.dumps({"ts": round(time.time(), 6), "event": "summary", **summary}) + "\n")
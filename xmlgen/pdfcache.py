@@ -0,0 +1,143 @@
+"""Persistent, content-addressed cache of PDF history-line scans.
+
+Entries are keyed by the SHA-256 of the PDF bytes plus the extractor version
+(``history.EXTRACTOR_VERSION``) and the page budget, so a re-uploaded PDF is
+answered without opening PyMuPDF at all. "Not found" scans are cached too.
+The store is a small SQLite database under ``<cache_dir>/pdf_history.sqlite3``
+that is safe to share between processes; once it holds more than
+``max_entries`` rows the least recently used ones are evicted.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from xmlgen import history, metrics, pdfworkers, sqlitedb
+
+_config = {
+    "cache_dir": os.environ.get("XMLGEN_CACHE_DIR", str(Path.home() / ".cache" / "xmlgen")),
+    "max_entries": 5000,
+    "enabled": True,
+}
+_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    received TEXT,
+    accepted TEXT,
+    pattern TEXT,
+    page INTEGER,
+    pages_read INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scans_digest ON scans (digest);
+CREATE INDEX IF NOT EXISTS scans_last_used ON scans (last_used);
+"""
+
+
+def configure(**options):
+    """Override cache settings (cache_dir, max_entries, enabled)"""
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise TypeError(f"Unknown pdf cache option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        sqlitedb.close(db_path())
+        _config.update({k: v for k, v in options.items() if v is not None})
+
+
+def db_path():
+    return Path(_config["cache_dir"]) / "pdf_history.sqlite3"
+
+
+def _connection():
+    return sqlitedb.connect(db_path(), SCHEMA)
+
+
+def pdf_digest(pdf):
+    """SHA-256 of a PDF given as bytes or a path"""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(pdf).hexdigest()
+    digest = hashlib.sha256()
+    with open(pdf, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _key(digest, page_budget):
+    return f"{digest}:{history.EXTRACTOR_VERSION}:{page_budget if page_budget is not None else 'all'}"
+
+
+def get(digest, page_budget=None):
+    with _lock:
+        conn = _connection()
+        row = conn.execute(
+            "SELECT received, accepted, pattern, page, pages_read FROM scans WHERE key = ?",
+            (_key(digest, page_budget),),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE scans SET last_used = ? WHERE key = ?", (time.time(), _key(digest, page_budget)))
+    return history.HistoryScan(*row)
+
+
+def put(digest, scan, page_budget=None):
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (_key(digest, page_budget), digest, scan.received, scan.accepted, scan.pattern, scan.page,
+             scan.pages_read, time.time()),
+        )
+        conn.execute(
+            "DELETE FROM scans WHERE key IN (SELECT key FROM scans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (_config["max_entries"],),
+        )
+
+
+def scan(pdf, page_budget=None):
+    """``history.scan_history`` through the cache; returns (scan, hit)
+
+    ``pdf`` is the PDF as bytes or a path. Misses are scanned in a worker process
+    when ``pdfworkers`` is enabled. Exceptions from PyMuPDF or a worker are not cached.
+    """
+    scan_history = pdfworkers.scan_history if pdfworkers.enabled() else history.scan_history
+    if not _config["enabled"]:
+        metrics.count("pdf_cache", result="disabled")
+        return scan_history(pdf, page_budget=page_budget), False
+    digest = pdf_digest(pdf)
+    try:
+        cached = get(digest, page_budget)
+    except (sqlite3.Error, OSError):
+        cached = None  # A broken cache must never fail extraction
+    if cached is not None:
+        metrics.count("pdf_cache", result="hit")
+        return cached, True
+    metrics.count("pdf_cache", result="miss")
+    result = scan_history(pdf, page_budget=page_budget)
+    try:
+        put(digest, result, page_budget)
+    except (sqlite3.Error, OSError):
+        pass
+    return result, False
+
+
+def invalidate(digest):
+    """Drop every cached scan of one PDF; returns the number of entries removed"""
+    with _lock:
+        return _connection().execute("DELETE FROM scans WHERE digest = ?", (digest,)).rowcount
+
+
+def clear():
+    with _lock:
+        return _connection().execute("DELETE FROM scans").rowcount
+
+
+def stats():
+    with _lock:
+        entries, = _connection().execute("SELECT COUNT(*) FROM scans").fetchone()
+    return {"path": str(db_path()), "entries": entries, "max_entries": _config["max_entries"]}
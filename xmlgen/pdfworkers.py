@@ -0,0 +1,257 @@
+"""Isolated worker processes for PDF history scans.
+
+PyMuPDF runs in the calling process by default. After ``configure(enabled=True)``
+(the app does this, as does ``XMLGEN_PDF_WORKERS=N``) ``pdfcache.scan`` hands
+every cache miss to a pool of reusable worker processes instead, so scans use
+every core and a malformed or enormous PDF cannot stall or bloat the caller:
+
+- each task has a wall-clock ``timeout``; a worker that overruns is killed,
+- a worker whose resident memory goes over ``memory_limit_mb`` is killed
+  mid-task, and one left over the limit after a task is recycled,
+- workers are replaced after ``max_tasks`` tasks, and whenever one dies.
+
+``run(pdf, page_budget)`` returns a ``PdfTaskResult``: the ``HistoryScan``, or a
+failure ``reason`` (``timeout``, ``memory``, ``crashed`` or ``error``) and a
+message. ``scan_history`` is the raising form that ``pdfcache`` uses. Metrics
+recorded in a worker are merged into the caller's recorder. Memory is read from
+``/proc``; where that doesn't exist only the timeout and recycling apply.
+
+Workers are started as ``python -m xmlgen.pdfworkers FD`` rather than through
+``multiprocessing``, whose spawn method would re-run the host script (the
+Streamlit app) in every worker. They talk to the pool over a socket pair, so
+this needs a POSIX system.
+"""
+import atexit
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from multiprocessing.connection import Connection
+from pathlib import Path
+
+from xmlgen import history, metrics
+
+POLL_SECONDS = 0.05
+
+_config = {
+    "enabled": bool(int(os.environ.get("XMLGEN_PDF_WORKERS", 0) or 0)),
+    "workers": int(os.environ.get("XMLGEN_PDF_WORKERS", 0) or 0) or min(os.cpu_count() or 1, 4),
+    "timeout": 60.0,
+    "memory_limit_mb": 1024,
+    "max_tasks": 200,
+}
+_pool = None
+_lock = threading.Lock()
+
+
+class PdfTaskResult(namedtuple("PdfTaskResult", ["scan", "reason", "message"])):
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.reason is None
+
+
+class PdfWorkerError(Exception):
+    """A scan that failed in its worker; ``reason`` says how"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+def configure(**options):
+    """Override worker settings (enabled, workers, timeout, memory_limit_mb, max_tasks)
+
+    A running pool is shut down; the next scan starts one with the new settings.
+    """
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise TypeError(f"Unknown pdf worker option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        _config.update({k: v for k, v in options.items() if v is not None})
+        _shutdown_locked()
+
+
+def enabled():
+    return _config["enabled"]
+
+
+def _rss(pid):
+    """Resident set size of ``pid`` in bytes, or None where /proc isn't available"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _worker_main(conn):
+    # One task at a time: (pdf bytes or path, page budget) in, a reply tuple out
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        pdf, page_budget = task
+        with metrics.recording(metrics.Recorder(keep_events=False)) as recorder:
+            try:
+                reply = ("ok", tuple(history.scan_history(pdf, page_budget=page_budget)), None)
+            except MemoryError:
+                reply = ("memory", None, "ran out of memory")
+            except Exception as e:
+                reply = ("error", None, f"{type(e).__name__}: {e}")
+        conn.send((*reply, recorder.snapshot()))
+
+
+class _Worker:
+    def __init__(self):
+        parent, child = socket.socketpair()
+        env = dict(os.environ)
+        package_root = str(Path(__file__).resolve().parent.parent)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+        self.process = subprocess.Popen([sys.executable, "-m", "xmlgen.pdfworkers", str(child.fileno())],
+                                        pass_fds=(child.fileno(),), env=env, stdin=subprocess.DEVNULL)
+        child.close()
+        self.conn = Connection(parent.detach())
+        self.tasks = 0
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.conn.close()
+
+
+class WorkerPool:
+    def __init__(self, workers, timeout, memory_limit_mb, max_tasks):
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.max_tasks = max_tasks
+        self.slots = threading.BoundedSemaphore(workers)
+        self.idle = queue.LifoQueue()  # Most recently used first, so spare workers can sit idle
+        self.closed = False
+
+    def run(self, pdf, page_budget=None):
+        """Scan one PDF (bytes or a path) in a worker; returns a ``PdfTaskResult``, never raises"""
+        if not isinstance(pdf, (bytes, bytearray, memoryview)):
+            pdf = os.fspath(pdf)
+        elif not isinstance(pdf, bytes):
+            pdf = bytes(pdf)
+        with self.slots:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                worker = _Worker()
+            result, reusable = self._run(worker, pdf, page_budget)
+            metrics.count("pdf_worker", result="ok" if result.ok else result.reason)
+            if reusable and not self.closed:
+                self.idle.put(worker)
+            else:
+                metrics.count("pdf_worker_recycled")
+                worker.stop(kill=not reusable)
+        return result
+
+    def _run(self, worker, pdf, page_budget):
+        """(result, whether the worker can take another task)"""
+        try:
+            worker.conn.send((pdf, page_budget))
+        except OSError:
+            return PdfTaskResult(None, "crashed", "the PDF worker exited before the task was sent"), False
+        worker.tasks += 1
+        deadline = time.monotonic() + self.timeout
+        while not worker.conn.poll(POLL_SECONDS):
+            if not worker.alive():
+                return PdfTaskResult(None, "crashed",
+                                     f"the PDF worker exited with code {worker.process.returncode}"), False
+            if time.monotonic() > deadline:
+                worker.stop(kill=True)
+                return PdfTaskResult(None, "timeout", f"scan timed out after {self.timeout:g} s"), False
+            rss = _rss(worker.process.pid) if self.memory_limit else None
+            if rss is not None and rss > self.memory_limit:
+                worker.stop(kill=True)
+                return PdfTaskResult(None, "memory",
+                                     f"scan used more than {self.memory_limit // (1024 * 1024)} MB of memory"), False
+        try:
+            status, scan, message, snapshot = worker.conn.recv()
+        except (EOFError, OSError):
+            try:
+                worker.process.wait(1)
+            except subprocess.TimeoutExpired:
+                pass
+            return PdfTaskResult(None, "crashed",
+                                 f"the PDF worker exited with code {worker.process.returncode}"), False
+        metrics.current().merge(snapshot)
+        rss = _rss(worker.process.pid) if self.memory_limit else None
+        reusable = (status != "memory" and worker.tasks < self.max_tasks
+                    and (rss is None or rss <= self.memory_limit))
+        if status != "ok":
+            return PdfTaskResult(None, status, message), reusable
+        return PdfTaskResult(history.HistoryScan(*scan), None, None), reusable
+
+    def shutdown(self):
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().stop()
+            except queue.Empty:
+                return
+
+
+def _shutdown_locked():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def shutdown():
+    """Stop the idle workers; busy ones stop when their task ends"""
+    with _lock:
+        _shutdown_locked()
+
+
+atexit.register(shutdown)
+
+
+def pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = WorkerPool(_config["workers"], _config["timeout"], _config["memory_limit_mb"],
+                               _config["max_tasks"])
+        return _pool
+
+
+def run(pdf, page_budget=None):
+    return pool().run(pdf, page_budget)
+
+
+def scan_history(pdf, page_budget=None):
+    """``history.scan_history`` in a worker process; raises ``PdfWorkerError`` on failure"""
+    result = run(pdf, page_budget)
+    if not result.ok:
+        raise PdfWorkerError(result.reason, f"PDF scan failed ({result.reason}): {result.message}")
+    return result.scan
+
+
+if __name__ == "__main__":
+    _worker_main(Connection(int(sys.argv[1])))
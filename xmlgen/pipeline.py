@@ -0,0 +1,207 @@
+"""Streamlit-free core of the Journal Article XML Generator.
+
+Everything here works on in-memory bytes, strings and paths, never on fixed
+temporary files, so the same logic can be driven concurrently by Streamlit
+sessions in ``test.py`` and by the headless batch runner.
+Anything the UI used to show with ``st.warning``/``st.error`` is passed to a
+``report(level, message)`` callback instead; by default it goes to logging.
+"""
+import logging
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from xmlgen import metrics, pdfcache, record, scrape, template
+
+logger = logging.getLogger(__name__)
+
+NULL_DATE = ("null", "null", "null")
+
+
+def parse_input_xml(xml_content):
+    """Parse the input XML once; accepts bytes, str or an already parsed root Element"""
+    if isinstance(xml_content, ET.Element):
+        return xml_content
+    with metrics.span("xml_parse"):
+        return ET.fromstring(xml_content)
+
+
+def log_report(level, message):
+    getattr(logger, level, logger.warning)(message)
+
+
+def parse_date(date_str):
+    for fmt in ["%d %B %Y", "%B %d, %Y", "%d %b %Y", "%b %d, %Y"]:
+        try:
+            dt = datetime.strptime(date_str, fmt)
+            return str(dt.year), f"{dt.month:02d}", f"{dt.day:02d}"
+        except:
+            continue
+    return "null", "null", "null"
+
+
+def has_history_dates(dates):
+    """True when PDF extraction produced something other than the null placeholder"""
+    return dates is not None and dates != (NULL_DATE, NULL_DATE)
+
+
+def scan_pdf_history(pdf_path, report=log_report, page_budget=None):
+    """Returns (dates, scan): parsed (received, accepted) dates or None, and the ``history.HistoryScan``
+
+    ``pdf_path`` may also be the PDF bytes. Scans are memoized by PDF content in ``pdfcache``.
+    """
+    try:
+        with metrics.span("pdf_history"):
+            scan, _ = pdfcache.scan(pdf_path, page_budget=page_budget)
+        metrics.count("history_pattern", pattern=scan.pattern or "none")
+        if scan.received is None:
+            return None, scan  # Return None when dates aren't found
+        return (parse_date(scan.received), parse_date(scan.accepted)), scan
+    except Exception as e:
+        report("error", f"Error processing PDF: {str(e)}")
+        return None, None
+
+
+def extract_history_from_pdf(pdf_path, report=log_report, page_budget=None):
+    return scan_pdf_history(pdf_path, report, page_budget)[0]
+
+
+def extract_journal_abbreviation(doi):
+    """Extract journal abbreviation from DOI"""
+    if not doi:
+        return "null"
+
+    # Split DOI by both '/' and '.'
+    parts = re.split(r'[/.]', doi)
+
+    # Find the abbreviation part (usually the part before the year)
+    for i, part in enumerate(parts):
+        if part.isdigit() and len(part) == 4:  # Year found
+            if i > 0:
+                return parts[i-1].upper()  # Return the part before the year
+    return "null"
+
+
+def generate_filename(article_url, xml_content, report=log_report, page=None):
+    """Build the output filename; ``page`` is an already scraped ``scrape.ArticlePage``
+
+    ``xml_content`` is anything ``parse_input_xml`` accepts.
+    """
+    try:
+        with metrics.span("generate_filename"):
+            root = parse_input_xml(xml_content)
+            doi_elem = root.find(".//ELocationID[@EIdType='doi']")
+            doi = doi_elem.text.strip() if doi_elem is not None and doi_elem.text else None
+
+            if page is None:
+                page = scrape.scrape_article_page(article_url)
+            if page.error is not None:
+                report("warning", f"Could not extract year from article URL: {page.error}")
+            return record.filename_for(root, article_url, doi, record.doi_volume_issue(doi), page)
+    except Exception as e:
+        report("warning", f"Could not generate filename: {str(e)}")
+        return record.DEFAULT_FILENAME
+
+
+def indent(elem, level=0):
+    indent_str = "  "
+    newline = "\n"
+
+    if len(elem):
+        if not elem.text or not elem.text.strip():
+            elem.text = newline + indent_str * (level + 1)
+
+        for i, child in enumerate(elem):
+            indent(child, level + 1)
+
+            if i < len(elem) - 1:
+                if not child.tail or not child.tail.strip():
+                    child.tail = newline + indent_str * (level + 1)
+            else:
+                if not child.tail or not child.tail.strip():
+                    child.tail = newline + indent_str * level
+
+    else:
+        if level > 0 and (not elem.tail or not elem.tail.strip()):
+            elem.tail = newline + indent_str * level
+
+
+def process_article(pdf, xml_content, article_url, pdf_link, fallback_dates=None, report=log_report,
+                    page=None, page_budget=None, work=None):
+    """Extract one article end to end; returns (record.ArticleRecord, history.HistoryScan or None)
+
+    ``pdf`` is a path or the PDF bytes. ``fallback_dates`` (received, accepted)
+    are used when the PDF has no history line; without them that is an error.
+    ``work`` is the article's ``crossref.Work``, if it was looked up.
+    """
+    dates, scan = scan_pdf_history(pdf, report, page_budget)
+    if not has_history_dates(dates):
+        if fallback_dates is None:
+            raise ValueError("Could not extract history dates from PDF and no received/accepted dates were given")
+        dates = fallback_dates
+    article_record = record.extract_record(xml_content, article_url, pdf_link, report, page=page, dates=dates,
+                                           work=work)
+    return article_record, scan
+
+
+def build_article_xml(xml_content, article_url, pdf_link, dates, report=log_report, page=None):
+    """Build the processed Article XML string from the input XML, the article page and history dates
+
+    Shorthand for ``record.extract_record`` + ``record.render_article_xml``; use
+    those directly when the front fragment is needed too.
+    """
+    article_record = record.extract_record(xml_content, article_url, pdf_link, report, page=page, dates=dates)
+    return record.render_article_xml(article_record)
+
+
+def build_front(processed_xml):
+    """Re-indent the processed Article XML as a JATS <front> section"""
+    processed_root = ET.fromstring(processed_xml)
+    front = ET.Element("front")
+    front.text = "\n  "
+    article = ET.SubElement(front, "Article")
+    article.text = "\n    "
+
+    def copy_element(source, target, indent_level):
+        indent = "  " * indent_level
+        for elem in source:
+            new_elem = ET.SubElement(target, elem.tag)
+            if elem.text:
+                new_elem.text = elem.text
+            if elem.attrib:
+                new_elem.attrib.update(elem.attrib)
+            new_elem.tail = f"\n{indent}"
+            if len(elem) > 0:
+                new_elem.text = f"\n{indent}  "
+                copy_element(elem, new_elem, indent_level + 1)
+                new_elem[-1].tail = f"\n{indent}"
+
+    journal_meta = processed_root.find("Journal-meta")
+    if journal_meta is not None:
+        new_journal_meta = ET.SubElement(article, "Journal-meta")
+        new_journal_meta.text = "\n      "
+        copy_element(journal_meta, new_journal_meta, 3)
+        new_journal_meta[-1].tail = "\n    "
+        new_journal_meta.tail = "\n    "
+
+    article_meta = processed_root.find("article-meta")
+    if article_meta is not None:
+        new_article_meta = ET.SubElement(article, "article-meta")
+        new_article_meta.text = "\n      "
+        copy_element(article_meta, new_article_meta, 3)
+        new_article_meta[-1].tail = "\n    "
+        new_article_meta.tail = "\n  "
+
+    article.tail = "\n"
+    return ET.tostring(front, encoding='utf-8').decode()
+
+
+def combine_with_template(processed_xml, template_content):
+    """Replace the <front> section of the template with the processed article metadata
+
+    For template files prefer ``template.write_spliced``, which streams instead
+    of building the whole document in memory.
+    """
+    if isinstance(template_content, str):
+        template_content = template_content.encode("utf-8")
+    return template.splice_bytes(template_content, build_front(processed_xml)).decode("utf-8")
@@ -0,0 +1,378 @@
+"""ArticleRecord: everything one article needs, extracted once and rendered twice.
+
+``extract_record`` reads the input XML, the scraped article page and the
+history dates into a compact ``ArticleRecord``. ``render_article_xml`` writes
+the standalone Article XML and ``render_front`` writes the ``<front>``
+fragment for the template, both straight from the record, so the processed
+XML never has to be parsed back. Records are plain picklable objects and can be
+passed between batch workers; ``record_to_dict``/``record_from_dict`` turn
+them into JSON for ``articleindex``.
+"""
+import re
+import xml.etree.ElementTree as ET
+from copy import deepcopy
+from dataclasses import dataclass, field, fields
+
+from xmlgen import crossref, metrics, pipeline, scrape
+
+DEFAULT_FILENAME = "formatted_article_set.xml"
+
+
+@dataclass(slots=True)
+class ArticleRecord:
+    journal_title: str
+    issn: str
+    shortcode: str
+    doi: str | None
+    volume: str
+    issue: str
+    first_page: int
+    last_page: int
+    page_count: str
+    title: str
+    abstract: str
+    article_url: str
+    pdf_link: str
+    filename: str = DEFAULT_FILENAME
+    author_list: ET.Element | None = None
+    epublish_date: ET.Element | None = None
+    # None when the article page couldn't be scraped: no PubDate/Keywords are written then
+    published: tuple | None = None
+    keywords: list = field(default_factory=list)
+    received: tuple | None = None
+    accepted: tuple | None = None
+
+    @property
+    def custom_id(self):
+        return f"{self.shortcode[0].lower()}{self.shortcode}.v{self.volume}.i{self.issue}.pg{str(self.first_page)}"
+
+    @property
+    def dates(self):
+        return self.received, self.accepted
+
+    @dates.setter
+    def dates(self, dates):
+        self.received, self.accepted = dates
+
+
+# Fields holding input XML subtrees, and date tuples that JSON turns into lists
+_ELEMENT_FIELDS = ("author_list", "epublish_date")
+_TUPLE_FIELDS = ("published", "received", "accepted")
+
+
+def record_to_dict(record):
+    """JSON-ready dict of the record; input subtrees are kept as XML strings"""
+    data = {f.name: getattr(record, f.name) for f in fields(ArticleRecord)}
+    for name in _ELEMENT_FIELDS:
+        if data[name] is not None:
+            elem = deepcopy(data[name])
+            elem.tail = None
+            data[name] = ET.tostring(elem, encoding="unicode")
+    return data
+
+
+def record_from_dict(data):
+    """The ArticleRecord that ``record_to_dict`` produced ``data`` from"""
+    data = dict(data)
+    for name in _ELEMENT_FIELDS:
+        if data[name] is not None:
+            data[name] = ET.fromstring(data[name])
+    for name in _TUPLE_FIELDS:
+        if data[name] is not None:
+            data[name] = tuple(data[name])
+    return ArticleRecord(**data)
+
+
+def doi_volume_issue(doi):
+    """(volume, issue) from a DOI shaped like 10.xxx/xxx.YYYY.V.I..., or (None, None)"""
+    if not doi:
+        return None, None
+    parts = doi.split('.')
+
+    # Find the position of the 4-digit year
+    year_pos = -1
+    for i, part in enumerate(parts):
+        if len(part) == 4 and part.isdigit():
+            year_pos = i
+            break
+
+    # If year found and there are at least 2 parts after it
+    if year_pos != -1 and len(parts) > year_pos + 2:
+        return parts[year_pos + 1], parts[year_pos + 2]
+    return None, None
+
+
+def page_range(article):
+    """(first page, last page, page count) from FirstPage/LastPage, which may hold ranges like 10-19"""
+    fp = 0
+    lp = 0
+    try:
+        fp_text = article.findtext(".//FirstPage", "0").strip()
+        lp_text = article.findtext(".//LastPage", "0").strip()
+
+        # Extract first page number (split on en dash '–' or hyphen '-')
+        if fp_text and '–' in fp_text:
+            fp = int(fp_text.split('–')[0])
+        elif fp_text and '-' in fp_text:
+            fp = int(fp_text.split('-')[0])
+        else:
+            fp = int(fp_text) if fp_text.isdigit() else 0
+
+        # Extract last page number (split on en dash '–' or hyphen '-')
+        if lp_text and '–' in lp_text:
+            lp = int(lp_text.split('–')[1])
+        elif lp_text and '-' in lp_text:
+            lp = int(lp_text.split('-')[1])
+        else:
+            lp = int(lp_text) if lp_text.isdigit() else 0
+
+        # Calculate page count (ensure lp >= fp to avoid negative values)
+        page_count = str(max(0, lp - fp + 1)) if lp >= fp else "0"
+    except:
+        page_count = "null"
+    return fp, lp, page_count
+
+
+def filename_for(scope, article_url, doi, doi_parts, page):
+    """Output filename from the article (or whole input) element, the DOI and the scraped page"""
+    last_doi_digit = ""
+    if doi:
+        last_part = doi.split(".")[-1]
+        last_doi_digit = last_part if last_part.isdigit() else ""
+
+    # Extract number from URL
+    numbers = re.findall(r'\d+', article_url)
+    last_url_num = numbers[-1] if numbers else "-"
+
+    # Tags first; each missing one is filled from the DOI on its own
+    volume = scope.findtext(".//Volume", "").strip() or doi_parts[0] or ""
+    issue = scope.findtext(".//Issue", "").strip() or doi_parts[1] or ""
+
+    # Year from the article page, else from the input's pub date
+    year = "null"
+    if page.error is None:
+        year = page.published[0]
+    else:
+        pub_date = scope.find(".//PubDate[@PubStatus='pub']")
+        if pub_date is not None:
+            year_elem = pub_date.find("Year")
+            if year_elem is not None and year_elem.text:
+                year = year_elem.text.strip()
+
+    parts = [
+        last_doi_digit,
+        last_url_num,
+        f"Vol.{volume or '-'}",
+        f"No.{issue or '-'}",
+        year
+    ]
+    return "_".join(filter(None, parts)) + ".xml"  # filter removes empty parts
+
+
+def extract_record(xml_content, article_url, pdf_link, report=None, page=None, dates=None, work=None):
+    """Fill an ArticleRecord from the input XML and the article page
+
+    ``xml_content`` is anything ``pipeline.parse_input_xml`` accepts, including a
+    single Article element; otherwise its first Article is used. ``page`` is an
+    already scraped ``scrape.ArticlePage``; when omitted the page is scraped here
+    unless ``work`` (a ``crossref.Work``) makes that unnecessary. The work's
+    publication date, volume, issue and pages take the place of the page's date
+    and of what would otherwise be guessed from the DOI.
+    """
+    report = report or pipeline.log_report
+    root = pipeline.parse_input_xml(xml_content)
+    with metrics.span("extract_record"):
+        return _extract_record(root, article_url, pdf_link, report, page, dates, work)
+
+
+def _extract_record(root, article_url, pdf_link, report, page, dates, work):
+    article = root if root.tag == "Article" else root.find(".//Article")
+
+    if article is None:
+        raise ValueError("No Article element found in the input XML")
+    metrics.count("xml_input_nodes", sum(1 for _ in article.iter()))
+
+    # Journal metadata processing
+    journal = article.find("Journal")
+    jt_elem = journal.find("JournalTitle") if journal is not None else None
+    issn_elem = journal.find("Issn") if journal is not None else None
+    doi_elem = article.find(".//ELocationID[@EIdType='doi']")
+
+    if jt_elem is None or issn_elem is None:
+        raise ValueError("Journal title or ISSN not found")
+
+    doi = doi_elem.text.strip() if doi_elem is not None else None
+    # Registered metadata beats guessing from the DOI string
+    if work is not None and work.volume and work.issue:
+        doi_parts = work.volume, work.issue
+    else:
+        doi_parts = doi_volume_issue(doi)
+
+    volume = article.findtext(".//Volume", "").strip()
+    issue = article.findtext(".//Issue", "").strip()
+    # If either is missing, take both from the DOI when it has them
+    if (not volume or not issue) and doi_parts[0] is not None:
+        volume, issue = doi_parts
+
+    fp, lp, page_count = page_range(article)
+    if not fp and work is not None and work.first_page:
+        fp, lp = work.first_page, work.last_page
+        page_count = str(max(0, lp - fp + 1))
+
+    title_elem = article.find("ArticleTitle")
+    abstract = article.find("Abstract")
+
+    record = ArticleRecord(
+        journal_title=jt_elem.text.strip(),
+        issn=issn_elem.text.strip(),
+        shortcode=pipeline.extract_journal_abbreviation(doi_elem.text if doi_elem is not None else ""),
+        doi=doi,
+        volume=volume,
+        issue=issue,
+        first_page=fp,
+        last_page=lp,
+        page_count=page_count,
+        title=title_elem.text.strip() if title_elem is not None else "null",
+        abstract=abstract.text.strip() if abstract is not None else "null",
+        article_url=article_url,
+        pdf_link=pdf_link,
+        author_list=article.find("AuthorList"),
+        epublish_date=article.find(".//PubDate[@PubStatus='epublish']"),
+    )
+    if dates is not None:
+        record.dates = dates
+
+    # Publication dates and keywords from webpage
+    if page is None and crossref.needs_page(work):
+        page = scrape.scrape_article_page(article_url)
+    if page is not None and page.error is not None:
+        report("warning", f"Could not scrape article URL: {page.error}")
+    page = crossref.merge_page(article_url, page, work)
+    if page.error is None:
+        record.published = page.published
+        record.keywords = list(page.keywords)
+
+    try:
+        with metrics.span("generate_filename"):
+            record.filename = filename_for(article, article_url, doi, doi_parts, page)
+    except Exception as e:
+        report("warning", f"Could not generate filename: {str(e)}")
+    return record
+
+
+def build_article_element(record):
+    """Unindented Article tree for the record; input subtrees are copied, never shared"""
+    if record.received is None or record.accepted is None:
+        raise ValueError("Received/accepted dates are missing")
+
+    article_out = ET.Element("Article")
+    journal_meta = ET.SubElement(article_out, "Journal-meta")
+
+    # Add journal identifiers
+    for id_type, val in [("pmc", record.shortcode.lower()), ("pubmed", record.journal_title), ("publisher", record.shortcode)]:
+        ET.SubElement(journal_meta, "journal-id", {"journal-id-type": id_type}).text = val
+
+    ET.SubElement(journal_meta, "Issn").text = record.issn
+    publisher = ET.SubElement(journal_meta, "Publisher")
+    ET.SubElement(publisher, "PublisherName").text = "MMU Press, Multimedia University"
+    ET.SubElement(journal_meta, "JournalTitle").text = record.journal_title
+
+    # Article metadata
+    article_meta = ET.SubElement(article_out, "article-meta")
+
+    # DOI and custom ID
+    ET.SubElement(article_meta, "article-id", {"pub-id-type": "doi"}).text = record.doi if record.doi is not None else "null"
+    ET.SubElement(article_meta, "article-id", {"pub-id-type": "other"}).text = record.custom_id
+
+    ET.SubElement(article_meta, "ArticleTitle").text = record.title
+
+    # Authors
+    if record.author_list is not None:
+        article_meta.append(deepcopy(record.author_list))
+    else:
+        ET.SubElement(article_meta, "AuthorList")
+
+    # Publication dates and keywords from webpage
+    if record.published is not None:
+        if record.epublish_date is not None:
+            article_meta.append(deepcopy(record.epublish_date))
+
+        for pub_type in ['pub', 'cover']:
+            pd_elem = ET.SubElement(article_meta, "PubDate", {"PubStatus": pub_type})
+            for tag, val in zip(["Year", "Month", "Day"], record.published):
+                ET.SubElement(pd_elem, tag).text = val
+
+        keywords_elem = ET.SubElement(article_meta, "Keywords")
+        for kw in record.keywords:
+            kw_elem = ET.SubElement(keywords_elem, "Keyword")
+            ET.SubElement(kw_elem, "italic").text = kw
+
+    # Volume/Issue/Pages
+    ET.SubElement(article_meta, "Volume").text = record.volume
+    ET.SubElement(article_meta, "Issue").text = record.issue
+    ET.SubElement(article_meta, "FirstPage").text = str(record.first_page)
+    ET.SubElement(article_meta, "LastPage").text = str(record.last_page)
+    ET.SubElement(article_meta, "PageCount").text = record.page_count
+
+    # History dates
+    history_elem = ET.SubElement(article_meta, "History")
+    for status, (y, m, d) in [("received", record.received), ("accepted", record.accepted)]:
+        pubdate = ET.SubElement(history_elem, "PubDate", {"PubStatus": status})
+        ET.SubElement(pubdate, "Year").text = y
+        ET.SubElement(pubdate, "Month").text = m
+        ET.SubElement(pubdate, "Day").text = d
+
+    # Abstract
+    abs_elem = ET.SubElement(article_meta, "abstract")
+    ET.SubElement(abs_elem, "p").text = record.abstract
+
+    # Links and language
+    ET.SubElement(article_meta, "pdf-link").text = record.pdf_link if record.pdf_link else "null"
+    ET.SubElement(article_meta, "full_text_url").text = record.article_url if record.article_url else "null"
+    ET.SubElement(article_meta, "Language").text = "eng"
+    return article_out
+
+
+def render_article_xml(record):
+    """The standalone processed Article XML"""
+    with metrics.span("render_article"):
+        article_out = build_article_element(record)
+        metrics.count("xml_output_nodes", sum(1 for _ in article_out.iter()))
+        with metrics.span("indent"):
+            pipeline.indent(article_out)
+        return ET.tostring(article_out, encoding='utf-8', method='xml').decode()
+
+
+def _front_indent(elem, indent_level):
+    # Same layout the template splice has always used: parents get fresh
+    # indentation, leaf text is kept as is
+    indent = "  " * indent_level
+    for child in elem:
+        child.tail = f"\n{indent}"
+        if len(child) > 0:
+            child.text = f"\n{indent}  "
+            _front_indent(child, indent_level + 1)
+            child[-1].tail = f"\n{indent}"
+
+
+def render_front(record):
+    """The ``<front>`` fragment that replaces the template's front section"""
+    with metrics.span("render_front"):
+        return _render_front(record)
+
+
+def _render_front(record):
+    article = build_article_element(record)
+    front = ET.Element("front")
+    front.text = "\n  "
+    front.append(article)
+    article.text = "\n    "
+    article.tail = "\n"
+
+    journal_meta, article_meta = article
+    for section, tail in ((journal_meta, "\n    "), (article_meta, "\n  ")):
+        section.text = "\n      "
+        _front_indent(section, 3)
+        section[-1].tail = "\n    "
+        section.tail = tail
+    return ET.tostring(front, encoding='utf-8').decode()
@@ -0,0 +1,231 @@
+"""Article page scraping: published date and ``citation_keywords``.
+
+Pages are not parsed into a tree. ``PageScanner`` is an incremental
+``html.parser`` scanner that keeps only the ``div.list-group-item.date-published``
+text and the ``citation_keywords`` meta tags; it is fed the body as it streams
+in (``fetch.fetch_until``) and the download stops once ``</head>`` and the date
+block have both been seen, so the rest of an OJS page is never transferred.
+
+``scrape_article_page`` handles one URL synchronously. ``scrape_many`` scrapes
+many URLs concurrently on an asyncio loop, with at most ``per_host`` requests
+in flight per host and at least ``delay`` seconds between request starts to
+the same host. Downloads and scanning run in a thread pool, so the event loop
+itself never blocks.
+
+asyncio is imported on first use to keep app start-up fast.
+"""
+import codecs
+import contextvars
+import re
+import time
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from xmlgen import fetch, metrics, pipeline
+
+# published is a (year, month, day) tuple of strings, "null" where unknown.
+# error is the failure message when the page couldn't be fetched or parsed.
+ArticlePage = namedtuple("ArticlePage", ["url", "published", "keywords", "error"])
+
+
+PUBLISHED_CLASS = "list-group-item date-published"
+_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([A-Za-z0-9_.:-]+)', re.I)
+
+
+def _sniff_encoding(head):
+    """Encoding from a BOM or a <meta charset> in the first bytes, else UTF-8"""
+    for bom, encoding in ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")):
+        if head.startswith(bom):
+            return encoding
+    match = _CHARSET_RE.search(head[:4096])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+class PageScanner(HTMLParser):
+    """Incremental extractor for the published date text and the ``citation_*`` meta tags
+
+    ``feed`` takes raw bytes and returns True once nothing more is needed:
+    ``</head>`` (where OJS writes the meta tags) and the end of the first
+    date-published div have both been seen. ``citation`` maps each meta name
+    to its contents in page order.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.decoder = None
+        self.citation = {}
+        self.head_done = False
+        self.date_depth = 0  # > 0 while inside the date div
+        self.date_done = False
+        self.date_strings = []
+        self.run = []  # Adjacent text pieces, joined into one string at the next markup
+
+    @property
+    def done(self):
+        return self.head_done and self.date_done
+
+    def feed(self, chunk):
+        if self.decoder is None:
+            self.decoder = codecs.getincrementaldecoder(_sniff_encoding(chunk))(errors="replace")
+        super().feed(self.decoder.decode(chunk))
+        return self.done
+
+    def close(self):
+        if self.decoder is not None:
+            super().feed(self.decoder.decode(b"", final=True))
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        text = "".join(self.run).strip()
+        if text:
+            self.date_strings.append(text)
+        self.run = []
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag == "meta":
+            attrs = dict(attrs)
+            name = attrs.get("name") or ""
+            if name.startswith("citation_"):
+                self.citation.setdefault(name, []).append(attrs.get("content") or "")
+        elif tag == "body":
+            self.head_done = True
+        elif tag == "div":
+            if self.date_depth:
+                self.date_depth += 1
+            elif not self.date_done and " ".join((dict(attrs).get("class") or "").split()) == PUBLISHED_CLASS:
+                self.date_depth = 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag == "head":
+            self.head_done = True
+        elif tag == "div" and self.date_depth:
+            self.date_depth -= 1
+            self.date_done = not self.date_depth
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_data(self, data):
+        if self.date_depth:
+            self.run.append(data)
+
+    def page(self, url):
+        """The ArticlePage for what has been scanned so far"""
+        published = ("null", "null", "null")
+        if self.date_done or self.date_depth:
+            text = "".join(self.date_strings).replace("Published:", "").strip()
+            published = pipeline.parse_date(text)
+
+        keywords = []
+        for keywords_content in self.citation.get("citation_keywords", []):
+            for kw in re.split(r'[;,]\s*', keywords_content):
+                kw = kw.strip()
+                if kw:
+                    keywords.append(kw)
+        return ArticlePage(url, published, keywords, None)
+
+
+def parse_article_page(url, content):
+    """ArticlePage from a complete page body"""
+    scanner = PageScanner()
+    scanner.feed(content)
+    scanner.close()
+    return scanner.page(url)
+
+
+def failed_page(url, error):
+    return ArticlePage(url, ("null", "null", "null"), [], str(error))
+
+
+def scrape_article_page(url):
+    """Fetch and parse one article page; failures are returned, not raised"""
+    with metrics.span("scrape"):
+        try:
+            _, scanner = fetch.fetch_until(url, PageScanner)
+            scanner.close()
+            return scanner.page(url)
+        except Exception as e:
+            metrics.count("scrape_failures")
+            return failed_page(url, e)
+
+
+class _HostGate:
+    """Per-host concurrency limit plus a minimum spacing between request starts"""
+
+    def __init__(self, per_host, delay):
+        import asyncio
+
+        self.semaphore = asyncio.Semaphore(per_host)
+        self.lock = asyncio.Lock()
+        self.delay = delay
+        self.next_start = 0.0
+
+    async def __aenter__(self):
+        import asyncio
+
+        await self.semaphore.acquire()
+        if self.delay:
+            async with self.lock:
+                wait = self.next_start - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self.next_start = time.monotonic() + self.delay
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+async def map_per_host(func, urls, per_host=4, delay=0.0, executor=None):
+    """{url: func(url)} for every distinct URL, run in a thread pool under the per-host limits
+
+    ``func`` is a blocking callable; an exception it raises propagates.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    gates = {}
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(4, per_host * 2))
+
+    async def one(url):
+        host = urlsplit(url).netloc
+        gate = gates.setdefault(host, _HostGate(per_host, delay))
+        async with gate:
+            # The caller's context travels along, so metrics from the pool reach its recorder
+            return await loop.run_in_executor(executor, contextvars.copy_context().run, func, url)
+
+    try:
+        unique = list(dict.fromkeys(u for u in urls if u))
+        results = await asyncio.gather(*(one(url) for url in unique))
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+    return dict(zip(unique, results))
+
+
+async def scrape_many(urls, per_host=4, delay=0.0, executor=None):
+    """Scrape every distinct URL concurrently; returns {url: ArticlePage}"""
+    return await map_per_host(scrape_article_page, urls, per_host, delay, executor)
+
+
+def run_per_host(func, urls, per_host=4, delay=0.0):
+    """Blocking wrapper around ``map_per_host`` for non-async callers"""
+    import asyncio
+
+    return asyncio.run(map_per_host(func, urls, per_host=per_host, delay=delay))
+
+
+def scrape_all(urls, per_host=4, delay=0.0):
+    """Blocking wrapper around ``scrape_many`` for non-async callers"""
+    return run_per_host(scrape_article_page, urls, per_host=per_host, delay=delay)
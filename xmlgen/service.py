@@ -0,0 +1,226 @@
+"""HTTP API for XML generation, for systems that can't drive the Streamlit form.
+
+``python -m xmlgen serve`` starts a small threaded HTTP server (standard
+library only) in front of a ``jobs.JobQueue``:
+
+    POST /jobs                     multipart/form-data: ``pdf`` and ``xml`` files,
+                                   ``article_url``, optional ``pdf_link``,
+                                   ``received``/``accepted`` fallback dates and a
+                                   ``template`` file. 202 with the job's status.
+    GET  /jobs/<id>                status, per-stage progress, messages, and once
+                                   done the filename, history and validation
+    GET  /jobs/<id>/processed.xml  the processed Article XML
+    GET  /jobs/<id>/combined.xml   the template with the article spliced in
+    GET  /health                   running and queued job counts
+
+Each ``GET`` route also answers ``HEAD``, with the same headers and no body.
+
+At most ``max_concurrent`` jobs run at once and up to ``max_queued`` wait.
+Past that a submission gets ``503`` with ``Retry-After``, and uploads over
+``max_upload_mb`` get ``413``, so callers back off instead of piling work
+onto the server. Identical submissions share one job, as in the app. PDFs are
+scanned in ``pdfworkers`` processes, so a bad PDF can't stall the server.
+"""
+import hashlib
+import json
+import re
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from xmlgen import batch, crossref, jobs, pdfworkers, pipeline, record, template, validate
+
+RETRY_AFTER = 5
+STAGES = ("process", "render", "combine")
+_JOB_PATH = re.compile(r"^/jobs/([0-9a-f]+)(?:/(processed|combined)\.xml)?$")
+
+
+class RequestError(Exception):
+    """A submission the service rejects; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_form(content_type, body):
+    """{name: bytes} from a multipart/form-data body"""
+    if not content_type.startswith("multipart/form-data"):
+        raise RequestError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Submit jobs as multipart/form-data")
+    message = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+    if not message.is_multipart():
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed multipart body")
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            fields[name] = part.get_payload(decode=True) or b""
+    return fields
+
+
+def generation_job(job, pdf_bytes, xml_bytes, article_url, pdf_link, fallback_dates, template_bytes, page_budget):
+    # Runs on the queue's worker pool; outputs go to the job's directory
+    with job.stage("process"):
+        work = crossref.lookup(crossref.row_doi({"article_xml": xml_bytes})) if crossref.enabled() else None
+        article_record, scan = pipeline.process_article(pdf_bytes, xml_bytes, article_url, pdf_link, fallback_dates,
+                                                        job.report, page_budget=page_budget, work=work)
+    result = {"filename": article_record.filename, "combined": template_bytes is not None, "validation": [],
+              "history": None if scan is None else batch.describe_scan(scan)}
+    with job.stage("render"):
+        processed_xml = record.render_article_xml(article_record)
+        (job.directory / "processed.xml").write_text(processed_xml, encoding="utf-8")
+        if validate.enabled():
+            result["validation"].append(validate.validate_bytes(processed_xml, "processed", article_record.filename))
+    if template_bytes is not None:
+        with job.stage("combine"):
+            template_path = job.directory / "template.xml"
+            template_path.write_bytes(template_bytes)
+            with open(job.directory / "combined.xml", "wb") as out:
+                template.write_spliced(template_path, record.render_front(article_record), out)
+            template_path.unlink()
+            if validate.enabled():
+                report = validate.validate_file(job.directory / "combined.xml", "combined")
+                result["validation"].append(dict(report, file=article_record.filename))
+    return result
+
+
+class Service:
+    def __init__(self, queue=None, template_path=None, page_budget=None, max_upload_mb=100):
+        self.queue = queue or jobs.JobQueue()
+        self.template_bytes = None
+        if template_path:
+            with open(template_path, "rb") as f:
+                self.template_bytes = f.read()
+        self.page_budget = page_budget
+        self.max_upload = max_upload_mb * 1024 * 1024
+        if not pdfworkers.enabled():
+            pdfworkers.configure(enabled=True)
+
+    def submit(self, fields):
+        """Queue a generation job from the form fields; returns the job ID"""
+        for name in ("pdf", "xml", "article_url"):
+            if not fields.get(name):
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"Missing field: {name}")
+        text = {name: fields.get(name, b"").decode("utf-8", "replace").strip()
+                for name in ("article_url", "pdf_link", "received", "accepted")}
+        fallback_dates = None
+        if text["received"] and text["accepted"]:
+            fallback_dates = (pipeline.parse_date(text["received"]), pipeline.parse_date(text["accepted"]))
+            if "null" in fallback_dates[0] + fallback_dates[1]:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "received/accepted must be dates like 12 March 2023")
+        template_bytes = fields.get("template") or self.template_bytes
+        args = (fields["pdf"], fields["xml"], text["article_url"], text["pdf_link"], fallback_dates, template_bytes,
+                self.page_budget)
+        key = hashlib.sha256()
+        for part in args:
+            part = part if isinstance(part, bytes) else json.dumps(part).encode("utf-8")
+            key.update(len(part).to_bytes(8, "big") + part)
+        try:
+            return self.queue.submit("api", generation_job, *args, key=key.hexdigest(),
+                                     stages=STAGES if template_bytes is not None else STAGES[:2])
+        except jobs.QueueFull as e:
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, str(e))
+
+    def status(self, job_id):
+        """The job's public state, or None if it is unknown or expired"""
+        state = self.queue.get(job_id)
+        if state is None:
+            return None
+        state.pop("metrics", None)
+        state.pop("key", None)
+        state["messages"] = [{"level": level, "message": message} for level, message in state["messages"]]
+        if state["status"] == jobs.DONE:
+            result = self.queue.result(job_id)
+            state["result"] = {k: result[k] for k in ("filename", "history", "validation")}
+            state["links"] = {"processed": f"/jobs/{job_id}/processed.xml"}
+            if result["combined"]:
+                state["links"]["combined"] = f"/jobs/{job_id}/combined.xml"
+        return state
+
+    def output(self, job_id, kind):
+        """(status, path or message) for one of a job's outputs"""
+        state = self.status(job_id)
+        if state is None:
+            return HTTPStatus.NOT_FOUND, "No such job"
+        if state["status"] != jobs.DONE:
+            return HTTPStatus.CONFLICT, f"The job is {state['status']}"
+        if kind not in state["links"]:
+            return HTTPStatus.NOT_FOUND, "The job had no template, so there is no combined XML"
+        return HTTPStatus.OK, self.queue.root / job_id / f"{kind}.xml"
+
+    def health(self):
+        counts = self.queue.counts()
+        return {"status": "ok", "running": counts.get(jobs.RUNNING, 0), "queued": counts.get(jobs.QUEUED, 0),
+                "max_concurrent": self.queue.max_concurrent, "max_queued": self.queue.max_queued}
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "xmlgen"
+    service = None  # Set on the subclass that make_server creates
+
+    def _send(self, status, body, content_type="application/json", headers=()):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status, message):
+        headers = [("Retry-After", str(RETRY_AFTER))] if status == HTTPStatus.SERVICE_UNAVAILABLE else []
+        self._send(status, {"error": message}, headers=headers)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/health":
+            return self._send(HTTPStatus.OK, self.service.health())
+        match = _JOB_PATH.match(path)
+        if match is None:
+            return self._error(HTTPStatus.NOT_FOUND, "Not found")
+        job_id, kind = match.groups()
+        if kind is None:
+            state = self.service.status(job_id)
+            if state is None:
+                return self._error(HTTPStatus.NOT_FOUND, "No such job")
+            return self._send(HTTPStatus.OK, state)
+        status, found = self.service.output(job_id, kind)
+        if status != HTTPStatus.OK:
+            return self._error(status, found)
+        self._send(status, found.read_bytes(), "application/xml; charset=utf-8")
+
+    do_HEAD = do_GET  # _send leaves out the body
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != "/jobs":
+            return self._error(HTTPStatus.NOT_FOUND, "Not found")
+        try:
+            length = self.headers.get("Content-Length")
+            if length is None:
+                self.close_connection = True
+                raise RequestError(HTTPStatus.LENGTH_REQUIRED, "Content-Length is required")
+            length = length.strip()
+            if not (length.isascii() and length.isdigit()):
+                self.close_connection = True
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Content-Length must be a non-negative integer")
+            length = int(length)
+            if length > self.service.max_upload:
+                self.close_connection = True
+                raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                   f"Uploads are limited to {self.service.max_upload // (1024 * 1024)} MB")
+            fields = parse_form(self.headers.get("Content-Type", ""), self.rfile.read(length))
+            job_id = self.service.submit(fields)
+        except RequestError as e:
+            return self._error(e.status, str(e))
+        self._send(HTTPStatus.ACCEPTED, self.service.status(job_id), headers=[("Location", f"/jobs/{job_id}")])
+
+
+def make_server(service, host="127.0.0.1", port=8080):
+    handler = type("BoundHandler", (Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
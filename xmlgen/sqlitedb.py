@@ -0,0 +1,40 @@
+"""SQLite connections shared by the PDF scan cache, the metadata cache and the article index.
+
+``connect(path, schema)`` opens each database file once per process and row
+factory: a forked worker must not reuse its parent's connection, so the process
+ID is part of the key. Connections are in autocommit and WAL mode, so several
+processes can share a file, and create ``schema`` when they are opened. They
+may be used from any thread; callers serialize their queries with a lock.
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+_connections = {}  # (path, row_factory, pid) -> connection
+_lock = threading.Lock()
+
+
+def connect(path, schema, row_factory=None):
+    """This process's connection to the database at ``path``, opened on first use"""
+    path = Path(path)
+    key = (str(path.absolute()), row_factory, os.getpid())
+    with _lock:
+        conn = _connections.get(key)
+        if conn is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.row_factory = row_factory
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(schema)
+            _connections[key] = conn
+        return conn
+
+
+def close(path):
+    """Close this process's connections to ``path``; the next ``connect`` reopens it"""
+    path = str(Path(path).absolute())
+    pid = os.getpid()
+    with _lock:
+        for key in [key for key in _connections if key[0] == path and key[2] == pid]:
+            _connections.pop(key).close()
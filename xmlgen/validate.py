@@ -0,0 +1,154 @@
+"""Validation of generated XML: well-formedness always, a JATS schema when configured.
+
+Combined documents are built by splicing bytes at the template's ``<front>``
+offsets, so nothing else would notice a broken one. ``validate_bytes`` and
+``validate_file`` parse an output once and return a ``report`` dict::
+
+    {"file": ..., "kind": "processed" | "combined", "valid": bool,
+     "checks": ["well-formed", "dtd" | "xsd"],
+     "errors": [{"line": ..., "column": ..., "message": ...}], "warnings": [...]}
+
+Schemas are local DTD or XSD files (``combined_schema`` for combined
+documents, ``processed_schema`` for the processed ones; ``XMLGEN_JATS_SCHEMA``
+sets the first). Each is compiled once per process and cached by path, size and
+mtime, so checking every output costs a single parse. Schema validation needs
+lxml (``python3-lxml`` in packages.txt); without it only well-formedness is
+checked and the report carries a warning. Documents are never allowed to load
+DTDs or entities from the network.
+
+Batch workers validate their own outputs, so a batch is validated in parallel;
+``validate_many`` does the same for files on disk.
+"""
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from xmlgen import metrics
+
+MAX_ERRORS = 50  # Per report; a document that is off-schema can otherwise produce thousands
+
+_config = {
+    "enabled": True,
+    "combined_schema": os.environ.get("XMLGEN_JATS_SCHEMA") or None,
+    "processed_schema": None,
+}
+
+
+def configure(**options):
+    """Override validation settings (enabled, combined_schema, processed_schema)"""
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise TypeError(f"Unknown validation option(s): {', '.join(sorted(unknown))}")
+    _config.update({k: v for k, v in options.items() if v is not None})
+
+
+def enabled():
+    return _config["enabled"]
+
+
+def settings():
+    """The settings in effect: ``configure`` overrides on top of the environment defaults"""
+    return dict(_config)
+
+
+def _lxml():
+    try:
+        from lxml import etree
+    except ImportError:
+        return None
+    return etree
+
+
+@lru_cache(maxsize=8)
+def _compile(path, size, mtime_ns):
+    etree = _lxml()
+    if path.lower().endswith(".xsd"):
+        parser = etree.XMLParser(no_network=True, resolve_entities=False)
+        return "xsd", etree.XMLSchema(etree.parse(path, parser))
+    return "dtd", etree.DTD(path)
+
+
+def load_schema(path):
+    """("dtd" | "xsd", compiled schema); recompiled only when the file changes"""
+    stat = os.stat(path)
+    with metrics.span("schema_load"):
+        return _compile(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _error(line, column, message):
+    return {"line": line, "column": column, "message": message}
+
+
+def validate_bytes(data, kind="combined", name=None, schema=None):
+    """Report for one document given as bytes or str; ``schema`` overrides the configured one"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    schema = schema or _config[f"{kind}_schema"]
+    report = {"file": name, "kind": kind, "valid": True, "checks": ["well-formed"], "errors": [], "warnings": []}
+    with metrics.span("validate", kind=kind):
+        etree = _lxml()
+        if etree is None:
+            try:
+                ET.fromstring(data)
+            except ET.ParseError as e:
+                line, column = e.position
+                report["errors"].append(_error(line, column, str(e)))
+            if schema:
+                report["warnings"].append(f"lxml is not installed; {schema} was not checked")
+        else:
+            parser = etree.XMLParser(no_network=True, resolve_entities=False, load_dtd=False, huge_tree=True)
+            try:
+                root = etree.fromstring(data, parser)
+            except etree.XMLSyntaxError as e:
+                root = None
+                # The parser's own log: the exception's copy of the global log can hold earlier documents' errors
+                report["errors"] += [_error(err.line, err.column, err.message) for err in parser.error_log] or [
+                    _error(*(e.position or (None, None)), str(e))]
+            if root is not None and schema:
+                try:
+                    schema_type, compiled = load_schema(schema)
+                except (OSError, etree.LxmlError) as e:
+                    report["errors"].append(_error(None, None, f"Could not load schema {schema}: {e}"))
+                else:
+                    report["checks"].append(schema_type)
+                    if not compiled.validate(root):
+                        report["errors"] += [_error(err.line, err.column, err.message) for err in compiled.error_log]
+    if len(report["errors"]) > MAX_ERRORS:
+        report["warnings"].append(f"{len(report['errors']) - MAX_ERRORS} more errors not shown")
+        del report["errors"][MAX_ERRORS:]
+    report["valid"] = not report["errors"]
+    metrics.count("validation", kind=kind, result="valid" if report["valid"] else "invalid")
+    return report
+
+
+def validate_file(path, kind="combined", schema=None):
+    with open(path, "rb") as f:
+        return validate_bytes(f.read(), kind, str(path), schema)
+
+
+def _init_worker(options):
+    configure(**options)
+
+
+def validate_many(items, workers=None):
+    """Reports for ``(path, kind)`` pairs, validated across a process pool, in input order"""
+    items = list(items)
+    if workers == 1 or len(items) < 2:
+        return [validate_file(path, kind) for path, kind in items]
+    options = {k: v for k, v in _config.items() if v is not None}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,)) as pool:
+        return list(pool.map(validate_file, [str(path) for path, _ in items], [kind for _, kind in items],
+                             chunksize=8))
+
+
+def format_report(report):
+    """One line per problem, for the command line"""
+    status = "VALID  " if report["valid"] else "INVALID"
+    lines = [f"{status} {report['file']} ({report['kind']}; {', '.join(report['checks'])})"]
+    for err in report["errors"]:
+        where = f"line {err['line']}, column {err['column']}: " if err["line"] is not None else ""
+        lines.append(f"        {where}{err['message']}")
+    for warning in report["warnings"]:
+        lines.append(f"        warning: {warning}")
+    return "\n".join(lines)
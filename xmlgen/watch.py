@@ -0,0 +1,244 @@
+"""Watch-folder daemon: processes article sets as they are dropped into an inbox.
+
+An article set is three files with the same stem in the inbox directory:
+
+    <stem>.pdf   the article PDF
+    <stem>.xml   the input Article XML
+    <stem>.url   the article page URL on its first line, then optional
+                 ``pdf_link=...``, ``received=...`` and ``accepted=...`` lines
+                 (the batch manifest columns)
+
+A set is picked up once none of its files has changed for ``settle`` seconds,
+so files still being copied in are left alone. It is claimed by creating
+``<inbox>/.processing/<stem>/`` and renaming its files into it, so two daemons
+on one inbox never take the same set, and the set is then run through
+``batch.process_row`` on a pool of ``workers`` processes. At most ``workers``
+sets are claimed at a time; the rest wait in the inbox.
+
+Outputs are written to ``<outbox>/.staging`` and renamed into
+``<outbox>/<filename>`` (and ``<outbox>/combined/<filename>`` with a template)
+only when complete. A set that fails, or whose output doesn't validate, gets a
+JSON report in ``<outbox>/failed/<stem>.json`` instead. Either way its inputs
+are then moved in one rename to ``<inbox>/processed/`` or ``<inbox>/failed/``
+(as ``<stem>.<timestamp>/``). Sets left in ``.processing`` by a daemon that
+died are put back in the inbox on start-up.
+"""
+import json
+import os
+import shutil
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from xmlgen import batch, crossref, fetch, metrics, pdfcache, validate
+
+SUFFIXES = (".pdf", ".xml", ".url")
+PROCESSING = ".processing"
+STAGING = ".staging"
+SIDECAR_FIELDS = ("pdf_link", "received", "accepted")
+
+
+def read_sidecar(path):
+    """Batch row fields from a ``.url`` sidecar"""
+    lines = [line.strip() for line in Path(path).read_text(encoding="utf-8").splitlines()]
+    lines = [line for line in lines if line and not line.startswith("#")]
+    if not lines or "=" in lines[0]:
+        raise ValueError(f"{Path(path).name} has no article URL on its first line")
+    row = {"article_url": lines[0]}
+    for line in lines[1:]:
+        key, sep, value = line.partition("=")
+        if not sep or key.strip() not in SIDECAR_FIELDS:
+            raise ValueError(f"{Path(path).name}: unknown line {line!r}")
+        row[key.strip()] = value.strip()
+    return row
+
+
+def _init_worker(*options):
+    # Ctrl-C reaches the whole process group; only the daemon acts on it, finishing the sets in flight
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    batch._init_worker(*options)
+
+
+def _unique(path):
+    """``path``, or ``path.2``, ``path.3``, ... if that is taken"""
+    candidate, n = path, 2
+    while candidate.exists():
+        candidate = path.with_name(f"{path.name}.{n}")
+        n += 1
+    return candidate
+
+
+class Watcher:
+    def __init__(self, inbox, outbox, template_path=None, workers=2, poll=1.0, settle=2.0, page_budget=None,
+                 fetch_options=None, pdf_cache_options=None, validate_options=None, metadata_options=None,
+                 log=print):
+        self.inbox = Path(inbox)
+        self.outbox = Path(outbox)
+        self.template_path = template_path
+        self.workers = workers
+        self.poll = poll
+        self.settle = settle
+        self.page_budget = page_budget
+        self.options = (fetch_options or {}, pdf_cache_options or {}, validate_options or {}, metadata_options or {})
+        self.log = log
+        self.processing = self.inbox / PROCESSING
+        self.staging = self.outbox / STAGING
+        for directory in (self.processing, self.inbox / "processed", self.inbox / "failed",
+                          self.staging, self.outbox / "failed"):
+            directory.mkdir(parents=True, exist_ok=True)
+        if template_path:
+            (self.outbox / "combined").mkdir(exist_ok=True)
+
+    def recover(self):
+        """Put sets a dead daemon left half-processed back into the inbox"""
+        for claimed in self.processing.iterdir():
+            if any((self.inbox / path.name).exists() for path in claimed.iterdir()):
+                # The set has been dropped again since; keep the stranded copy aside rather than lose either
+                target = _unique(self.inbox / "failed" / f"{claimed.name}.{time.strftime('%Y%m%d-%H%M%S')}")
+                os.replace(claimed, target)
+                self.log(f"RECOVERED {claimed.name}: moved to {target}, a newer copy is in the inbox")
+                continue
+            for path in claimed.iterdir():
+                os.replace(path, self.inbox / path.name)
+            claimed.rmdir()
+            self.log(f"RECOVERED {claimed.name}: returned to the inbox")
+
+    def _sets(self):
+        """{stem: {suffix: path}} for the set files in the inbox"""
+        sets = {}
+        for path in self.inbox.iterdir():
+            if path.suffix.lower() in SUFFIXES and not path.name.startswith(".") and path.is_file():
+                sets.setdefault(path.stem, {})[path.suffix.lower()] = path
+        return {stem: files for stem, files in sets.items() if len(files) == len(SUFFIXES)}
+
+    def ready(self):
+        """[(stem, {suffix: path})] for the complete sets whose files have all settled, oldest first"""
+        now = time.time()
+        ready = []
+        for stem, files in self._sets().items():
+            try:
+                changed = max(path.stat().st_mtime for path in files.values())
+            except FileNotFoundError:
+                continue
+            if now - changed >= self.settle:
+                ready.append((changed, stem, files))
+        return [(stem, files) for _, stem, files in sorted(ready)]
+
+    def claim(self, stem, files):
+        """Move a set into its own processing directory; None when another daemon got there first"""
+        claimed = self.processing / stem
+        try:
+            claimed.mkdir()
+        except FileExistsError:
+            return None
+        moved = []
+        try:
+            for suffix, source in files.items():
+                os.replace(source, claimed / f"{stem}{suffix}")
+                moved.append((source, claimed / f"{stem}{suffix}"))
+        except OSError:
+            for source, target in moved:
+                os.replace(target, source)
+            shutil.rmtree(claimed, ignore_errors=True)
+            return None
+        return claimed
+
+    def _row(self, claimed, stem):
+        row = read_sidecar(claimed / f"{stem}.url")
+        row.update(pdf=str(claimed / f"{stem}.pdf"), xml=str(claimed / f"{stem}.xml"))
+        return row
+
+    def submit(self, pool, claimed):
+        stem = claimed.name
+        staging = self.staging / stem
+        shutil.rmtree(staging, ignore_errors=True)
+        (staging / "combined").mkdir(parents=True)
+        try:
+            row = self._row(claimed, stem)
+        except (OSError, ValueError) as e:
+            return None, batch.failed_result({"pdf": str(claimed / f"{stem}.pdf")}, str(e))
+        work = crossref.lookup(crossref.row_doi(row)) if crossref.enabled() else None
+        return pool.submit(batch.process_row, row, str(staging), self.template_path, None, self.page_budget,
+                           work), None
+
+    def finish(self, claimed, result, started):
+        """Deliver or report one set's result and move its inputs out of the way"""
+        stem = claimed.name
+        staging = self.staging / stem
+        if result.get("metrics") is not None:
+            metrics.current().merge(result["metrics"])
+        status = "ok" if batch.passed(result) else "invalid" if result["ok"] else "failed"
+        target = _unique(self.inbox / ("processed" if status == "ok" else "failed")
+                         / f"{stem}.{time.strftime('%Y%m%d-%H%M%S')}")
+        if status == "ok":
+            os.replace(staging / result["filename"], self.outbox / result["filename"])
+            if self.template_path:
+                os.replace(staging / "combined" / result["filename"], self.outbox / "combined" / result["filename"])
+        else:
+            report = {
+                "set": stem, "status": status, "filename": result["filename"], "error": result["error"],
+                "history": result["history"], "validation": result["validation"],
+                "messages": [f"{level}: {message}" for level, message in result["messages"]],
+                "inputs": str(target), "seconds": round(time.monotonic() - started, 3),
+            }
+            path = self.outbox / "failed" / f"{stem}.json"
+            path.with_suffix(".tmp").write_text(json.dumps(report, indent=2), encoding="utf-8")
+            os.replace(path.with_suffix(".tmp"), path)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.replace(claimed, target)
+        metrics.count("watch_sets", result=status)
+        seconds = time.monotonic() - started
+        if status == "ok":
+            self.log(f"OK      {stem}: {result['filename']} ({seconds:.1f} s)")
+        elif status == "invalid":
+            self.log(f"INVALID {stem}: {result['filename']}; see {self.outbox / 'failed' / (stem + '.json')}")
+        else:
+            self.log(f"FAILED  {stem}: {result['error']}")
+
+    def run(self, once=False, stop=None):
+        """Process sets until ``stop`` (a threading.Event) is set, or with ``once`` until the inbox has no complete set
+
+        Returns the number of sets that failed.
+        """
+        fetch.configure(**self.options[0])
+        pdfcache.configure(**self.options[1])
+        validate.configure(**self.options[2])
+        crossref.configure(**self.options[3])
+        self.recover()
+        failures = 0
+        pending = {}  # future -> (claimed directory, start time)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=self.options) as pool:
+            while True:
+                stopping = stop is not None and stop.is_set()
+                if not stopping:
+                    for stem, files in self.ready()[:self.workers - len(pending)]:
+                        claimed = self.claim(stem, files)
+                        if claimed is None:
+                            continue
+                        started = time.monotonic()
+                        future, result = self.submit(pool, claimed)
+                        if future is not None:
+                            pending[future] = (claimed, started)
+                        else:
+                            self.finish(claimed, result, started)
+                            failures += 1
+                if not pending:
+                    # Unsettled sets keep a --once run going until they can be taken
+                    if stopping or (once and not self._sets()):
+                        return failures
+                    if stop is not None:
+                        stop.wait(self.poll)
+                    else:
+                        time.sleep(self.poll)
+                    continue
+                for future in wait(pending, timeout=self.poll, return_when=FIRST_COMPLETED).done:
+                    claimed, started = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # A worker that died (e.g. inside PyMuPDF) only fails its own set
+                        result = batch.failed_result({"pdf": str(claimed)}, f"Worker failed: {e}")
+                    self.finish(claimed, result, started)
+                    failures += not batch.passed(result)